@@ -23,6 +23,7 @@ def get_requirements():
 def get_test_requirements():
     requirements = [
         'gtts',
+        'numpy',
     ]
     return requirements
 
@@ -47,6 +48,11 @@ setup(
 
     # Scripts
     scripts=[],
+    entry_points={
+        'console_scripts': [
+            'talkey = talkey.cli:main',
+        ],
+    },
 
     # Classifiers
     classifiers=[
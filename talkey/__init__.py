@@ -1,6 +1,6 @@
 '''
 Simple Test-To-Speech (TTS) interface library with multi-language and multi-engine support.
 '''
-from .tts import Talkey, enumerate_engines, create_engine, TTSError
+from .tts import Talkey, enumerate_engines, create_engine, TTSError, TTSRequestError, TTSCancelled
 
 __version__ = '0.1.2'
@@ -0,0 +1,297 @@
+'''
+PCM audio buffers and post-synthesis processing.
+'''
+import wave
+import struct
+import contextlib
+
+import audioread
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+POSTPROCESS_OPTIONS = {
+    'trim_silence': {
+        'description': 'Trim leading and trailing silence',
+        'type': 'bool',
+        'default': False,
+    },
+    'silence_threshold': {
+        'description': 'Level (dBFS) below which audio is considered silent',
+        'type': 'float',
+        'default': -50.0,
+        'max': 0.0,
+    },
+    'silence_padding': {
+        'description': 'Seconds of silence to keep at either end when trimming',
+        'type': 'float',
+        'default': 0.02,
+        'min': 0.0,
+    },
+    'normalize': {
+        'description': 'Normalize loudness',
+        'type': 'bool',
+        'default': False,
+    },
+    'target_level': {
+        'description': 'Target RMS loudness (dBFS) when normalizing',
+        'type': 'float',
+        'default': -20.0,
+        'max': 0.0,
+    },
+}
+
+
+# Data length declared in WAV headers of streams of unknown length
+STREAM_LENGTH = 0xFFFFFFFF - 36
+
+
+class Audio(object):
+    '''
+    A block of decoded, interleaved PCM audio.
+
+    :frames: The raw PCM data
+    :nchannels: Number of channels
+    :sampwidth: Sample width in bytes
+    :framerate: Frames per second
+    '''
+    __slots__ = ('frames', 'nchannels', 'sampwidth', 'framerate')
+
+    def __init__(self, frames, nchannels=1, sampwidth=2, framerate=22050):
+        self.frames = frames
+        self.nchannels = nchannels
+        self.sampwidth = sampwidth
+        self.framerate = framerate
+
+    @classmethod
+    def from_file(cls, filename):
+        '''
+        Reads an audio file (WAV files may also be a file object). WAV files are read directly, anything else is decoded through audioread.
+        '''
+        try:
+            with contextlib.closing(wave.open(filename, 'rb')) as f:
+                return cls(f.readframes(f.getnframes()), f.getnchannels(), f.getsampwidth(), f.getframerate())
+        except (wave.Error, EOFError):
+            pass
+        with audioread.audio_open(filename) as f:
+            return cls(b''.join(f), f.channels, 2, f.samplerate)
+
+    def write(self, filename):
+        '''
+        Writes the audio as a WAV file, to a filename or file object.
+        '''
+        with contextlib.closing(wave.open(filename, 'wb')) as f:
+            f.setnchannels(self.nchannels)
+            f.setsampwidth(self.sampwidth)
+            f.setframerate(self.framerate)
+            f.writeframes(self.frames)
+
+    @property
+    def framesize(self):
+        'Size of a single frame in bytes'
+        return self.nchannels * self.sampwidth
+
+    @property
+    def nframes(self):
+        'Number of frames'
+        return len(self.frames) // self.framesize
+
+    @property
+    def duration(self):
+        'Duration in seconds'
+        return float(self.nframes) / self.framerate
+
+    def wav_header(self, datalen=None):
+        '''
+        Returns the WAV file header of the audio, so the frames can be streamed after it without copying.
+
+        :datalen: The data length to declare instead of that of the audio, e.g. ``STREAM_LENGTH``
+        '''
+        if datalen is None:
+            datalen = self.nframes * self.framesize
+        return struct.pack(
+            '<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + datalen, b'WAVE', b'fmt ', 16, 1, self.nchannels,
+            self.framerate, self.framerate * self.framesize, self.framesize, self.sampwidth * 8, b'data', datalen
+        )
+
+    def copy(self, frames):
+        '''
+        Returns new Audio in the same format, with the provided frames.
+        '''
+        return Audio(frames, self.nchannels, self.sampwidth, self.framerate)
+
+
+_DTYPES = {1: 'u1', 2: '<i2', 4: '<i4'}
+
+
+def _to_float(audio):
+    'Returns samples as a (nframes, nchannels) float array in range [-1, 1]'
+    if audio.sampwidth not in _DTYPES:
+        raise ValueError('Unsupported sample width: %s' % audio.sampwidth)
+    data = numpy.frombuffer(audio.frames, dtype=_DTYPES[audio.sampwidth], count=audio.nframes * audio.nchannels)
+    data = data.astype(numpy.float32)
+    if audio.sampwidth == 1:
+        data -= 128.0
+    data /= float(2 ** (audio.sampwidth * 8 - 1))
+    return data.reshape(-1, audio.nchannels)
+
+
+def _from_float(audio, data):
+    'Converts a float array back into Audio of the same format'
+    scale = float(2 ** (audio.sampwidth * 8 - 1))
+    data = numpy.clip(data * scale, -scale, scale - 1)
+    if audio.sampwidth == 1:
+        data += 128.0
+    return audio.copy(numpy.rint(data).astype(_DTYPES[audio.sampwidth]).tobytes())
+
+
+def _db_to_linear(level):
+    return 10.0 ** (level / 20.0)
+
+
+def trim_silence(audio, threshold=-50.0, padding=0.02):
+    '''
+    Removes leading and trailing silence.
+
+    :threshold: Level in dBFS below which a frame is considered silent
+    :padding: Seconds of silence to keep at either end
+    '''
+    if not audio.nframes:
+        return audio
+    peaks = numpy.abs(_to_float(audio)).max(axis=1)
+    loud = numpy.flatnonzero(peaks > _db_to_linear(threshold))
+    if not len(loud):
+        return audio.copy(b'')
+    pad = int(padding * audio.framerate)
+    start = max(int(loud[0]) - pad, 0)
+    end = min(int(loud[-1]) + 1 + pad, audio.nframes)
+    return audio.copy(audio.frames[start * audio.framesize:end * audio.framesize])
+
+
+def normalize_loudness(audio, level=-20.0):
+    '''
+    Scales the audio to the target RMS level, without clipping peaks.
+
+    :level: Target RMS level in dBFS
+    '''
+    if not audio.nframes:
+        return audio
+    data = _to_float(audio)
+    rms = float(numpy.sqrt(numpy.mean(numpy.square(data, dtype=numpy.float64))))
+    peak = float(numpy.abs(data).max())
+    if not rms:
+        return audio
+    gain = min(_db_to_linear(level) / rms, 1.0 / peak)
+    return _from_float(audio, data * gain)
+
+
+def postprocess(audio, options):
+    '''
+    Applies post-processing to audio, as per a processed set of ``POSTPROCESS_OPTIONS``.
+    '''
+    if options['trim_silence']:
+        audio = trim_silence(audio, options['silence_threshold'], options['silence_padding'])
+    if options['normalize']:
+        audio = normalize_loudness(audio, options['target_level'])
+    return audio
+
+
+def postprocess_enabled(options):
+    '''
+    Checks if the processed set of ``POSTPROCESS_OPTIONS`` would do anything.
+    '''
+    return bool(options) and (options['trim_silence'] or options['normalize'])
+
+
+def silence(seconds, like):
+    '''
+    Returns seconds of silence, in the format of the ``like`` audio.
+    '''
+    sample = b'\x80' if like.sampwidth == 1 else b'\x00' * like.sampwidth
+    return like.copy(sample * (int(seconds * like.framerate) * like.nchannels))
+
+
+def resample(audio, framerate):
+    '''
+    Resamples audio to the framerate, by linear interpolation.
+    '''
+    if audio.framerate == framerate or not audio.nframes:
+        return Audio(audio.frames, audio.nchannels, audio.sampwidth, framerate)
+    data = _to_float(audio)
+    nframes = int(round(audio.nframes * float(framerate) / audio.framerate))
+    old = numpy.arange(audio.nframes) / float(audio.framerate)
+    new = numpy.arange(nframes) / float(framerate)
+    data = numpy.stack([numpy.interp(new, old, data[:, chan]) for chan in range(audio.nchannels)], axis=1)
+    return _from_float(Audio(b'', audio.nchannels, audio.sampwidth, framerate), data)
+
+
+def concatenate(parts):
+    '''
+    Concatenates audio, and pauses given as seconds, into a single Audio in the format of the first audio.
+    Audio of other framerates is resampled, which requires numpy.
+
+    Raises ValueError if the audio can not be converted.
+    '''
+    audios = [part for part in parts if isinstance(part, Audio)]
+    like = audios[0] if audios else Audio(b'')
+    frames = []
+    for part in parts:
+        if not isinstance(part, Audio):
+            part = silence(part, like)
+        if (part.nchannels, part.sampwidth) != (like.nchannels, like.sampwidth):
+            raise ValueError('Can not concatenate %d-channel %d-byte audio to %d-channel %d-byte audio' % (
+                part.nchannels, part.sampwidth, like.nchannels, like.sampwidth
+            ))
+        if part.framerate != like.framerate:
+            if numpy is None:
+                raise ValueError('Resampling requires numpy')  # pragma: no cover
+            part = resample(part, like.framerate)
+        frames.append(part.frames)
+    return like.copy(b''.join(frames))
+
+
+def _read_exact(stream, size):
+    data = b''
+    while len(data) < size:
+        block = stream.read(size - len(data))
+        if not block:
+            raise ValueError('Truncated WAV stream')
+        data += block
+    return data
+
+
+def read_wav_stream(stream, chunk_size=4096):
+    '''
+    Reads PCM WAV from a file object progressively, e.g. the stdout of a process or an HTTP response,
+    yielding Audio chunks of whole frames as they arrive, until the end of the stream.
+
+    Raises ValueError if it is not a PCM WAV stream.
+    '''
+    riff, _, wave_id = struct.unpack('<4sI4s', _read_exact(stream, 12))
+    if riff != b'RIFF' or wave_id != b'WAVE':
+        raise ValueError('Not a WAV stream')
+    fmt = None
+    while True:
+        chunk_id, size = struct.unpack('<4sI', _read_exact(stream, 8))
+        if chunk_id == b'data':
+            break
+        body = _read_exact(stream, size + (size & 1))
+        if chunk_id == b'fmt ' and size >= 16:
+            fmt = struct.unpack('<HHIIHH', body[:16])
+    if fmt is None or fmt[0] != 1:
+        raise ValueError('Not a PCM WAV stream')
+    like = Audio(b'', fmt[1], fmt[5] // 8, fmt[2])
+    # Takes what is available, rather than waiting for a full chunk
+    read = getattr(stream, 'read1', stream.read)
+    pending = b''
+    while True:
+        block = read(chunk_size)
+        if not block:
+            break
+        pending += block
+        usable = len(pending) - len(pending) % like.framesize
+        if usable:
+            yield like.copy(pending[:usable])
+            pending = pending[usable:]
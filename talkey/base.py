@@ -2,6 +2,8 @@ import os
 import pipes
 import logging
 import tempfile
+import threading
+import time
 from abc import ABCMeta, abstractmethod
 
 try:
@@ -15,6 +17,12 @@ except ImportError:
     winsound = None
 
 from talkey.utils import process_options, check_executable
+from talkey.audio import (
+    Audio, POSTPROCESS_OPTIONS, STREAM_LENGTH, postprocess, postprocess_enabled, concatenate, read_wav_stream, numpy
+)
+from talkey.cache import SingleFlight
+from talkey.metrics import Instrumentation, Event
+from talkey.voices import VoiceRegistry
 
 import langid
 import contextlib
@@ -63,6 +71,18 @@ class TTSError(Exception):
             return self.error
 
 
+class TTSRequestError(TTSError):
+    '''
+    The TTSError for a bad request, e.g. a bad voice, option or markup, that is not a failure of the engine.
+    '''
+
+
+class TTSCancelled(TTSError):
+    '''
+    The TTSError for synthesis or playback stopped by ``cancel()``, or by ``stop()`` of a sink.
+    '''
+
+
 class AbstractTTSEngine(object):
     """
     Generic parent class for all speakers
@@ -70,6 +90,10 @@ class AbstractTTSEngine(object):
     __metaclass__ = ABCMeta
     SLUG = None
     'The SLUG is used to identify the engine as text'
+    AUDIO_SUFFIX = '.wav'
+    'The file suffix of audio rendered by _synthesize()'
+    PROSODY_OPTIONS = {}
+    'Voice options that SSML prosody ``rate`` and ``pitch`` scale, e.g. ``{\'rate\': \'words_per_minute\'}``'
 
     # Define these in your engine
     @classmethod
@@ -93,10 +117,65 @@ class AbstractTTSEngine(object):
         'AbstractMethod: Returns dict of supported languages and voices'
         pass  # pragma: no cover
 
-    @abstractmethod
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, filename):
+        '''
+        Renders the phrase to an audio file of type AUDIO_SUFFIX.
+        Engines that can render to a file should implement this instead of _say()
+
+        :phrase: The text phrase to say
+        :language: The requested language
+        :voice: The requested voice
+        :voiceinfo: Data about the requested voice
+        :options: Extra options
+        :filename: The file to render to
+        '''
+        raise NotImplementedError  # pragma: no cover
+
+    def _synthesize_audio(self, phrase, language, voice, voiceinfo, options):
+        '''
+        Renders the phrase, returning a ``talkey.audio.Audio`` instance.
+        Engines that synthesize in-process should implement this instead of _synthesize()
+
+        :phrase: The text phrase to say
+        :language: The requested language
+        :voice: The requested voice
+        :voiceinfo: Data about the requested voice
+        :options: Extra options
+        '''
+        raise NotImplementedError  # pragma: no cover
+
+    def _synthesize_stream(self, phrase, language, voice, voiceinfo, options):
+        '''
+        Renders the phrase progressively, yielding ``talkey.audio.Audio`` chunks as they are produced.
+        Engines that produce audio progressively should implement this as well.
+
+        :phrase: The text phrase to say
+        :language: The requested language
+        :voice: The requested voice
+        :voiceinfo: Data about the requested voice
+        :options: Extra options
+        '''
+        raise NotImplementedError  # pragma: no cover
+
+    def _synthesize_ssml(self, markup, language, voice, voiceinfo, options, filename):
+        '''
+        Renders SSML markup to an audio file of type AUDIO_SUFFIX.
+        Engines that support SSML natively should implement this,
+        otherwise SSML segments are rendered separately and concatenated.
+
+        :markup: The SSML, as generated by ``talkey.ssml.to_ssml()``
+        :language: The language of the first segment
+        :voice: The voice of the first segment
+        :voiceinfo: Data about the voice
+        :options: Extra options
+        :filename: The file to render to
+        '''
+        raise NotImplementedError  # pragma: no cover
+
     def _say(self, phrase, language, voice, voiceinfo, options):
         '''
-        AbstractMethod: Let engin actually says the phrase
+        Let engine actually says the phrase.
+        Engines that can not render audio must override this.
 
         :phrase: The text phrase to say
         :language: The requested language
@@ -104,7 +183,17 @@ class AbstractTTSEngine(object):
         :voiceinfo: Data about the requested voice
         :options: Extra options
         '''
-        pass  # pragma: no cover
+        if self._synthesizes_audio():
+            self.play_audio(self._timed_synthesize(phrase, language, voice, voiceinfo, options))
+            return
+        with tempfile.NamedTemporaryFile(suffix=self.AUDIO_SUFFIX, delete=False) as f:
+            fname = f.name
+        try:
+            self._timed_synthesize(phrase, language, voice, voiceinfo, options, fname)
+            with self.instrumentation.timer('play', engine=self.SLUG):
+                self.play(fname, translate=self.AUDIO_SUFFIX != '.wav')
+        finally:
+            os.remove(fname)
 
     @classmethod
     def get_init_options(cls):
@@ -119,6 +208,12 @@ class AbstractTTSEngine(object):
                 'type': 'bool',
                 'default': True
             },
+            'timeout': {
+                'description': 'Synthesis deadline in seconds, 0 for none',
+                'type': 'float',
+                'default': 0.0,
+                'min': 0.0,
+            },
         }
         options.update(cls._get_init_options())
         return options
@@ -134,11 +229,65 @@ class AbstractTTSEngine(object):
         self.default_options = {}
         self.optionspec = None
         self.languages = None
-        self.available = self.is_available()
-        if self.available:
-            self.optionspec = self.get_options()
-            self.languages = self.get_languages()
-            self.configure_default()
+        self.voices = VoiceRegistry()
+        self.cache = None
+        self.coalesce = False
+        self.stream = False
+        self.health = None
+        self.sink = None
+        self.instrumentation = Instrumentation()
+        self.postprocess_options = {}
+        self._inflight = SingleFlight()
+        self._procs = set()
+        self._cancelled = set()
+        self._procs_lock = threading.Lock()
+        self._config_lock = threading.Lock()
+        self._availability_lock = threading.RLock()
+        self._availability_listeners = []
+        self._deferred = []
+        with self._availability_lock:
+            # None means the availability check is pending in the background
+            self.available = self.is_available()
+            self.pending = self.available is None
+            if self.available:
+                self._load()
+
+    def _load(self):
+        self.optionspec = self.get_options()
+        self.languages = self.get_languages()
+        self.voices = VoiceRegistry.from_languages(self.SLUG, self.languages)
+        self.configure_default()
+
+    def _availability_changed(self, available):
+        '''
+        Called by background availability checks, finishes loading a pending engine.
+        '''
+        with self._availability_lock:
+            available = bool(available and self.ioptions['enabled'] and self.sound_available())
+            if not self.pending and available == bool(self.available):
+                return
+            self.available = available
+            self.pending = False
+            try:
+                if available and self.languages is None:
+                    self._load()
+                    for method, options in self._deferred:
+                        getattr(self, method)(**options)
+            except TTSError as e:
+                self._logger.warning("Engine '%s' failed to load: %s", self.SLUG, e)
+                self.available = False
+            self._deferred = []
+            available = self.available
+        self._logger.info("Engine '%s' is now %s", self.SLUG, 'available' if available else 'unavailable')
+        for listener in list(self._availability_listeners):
+            listener(self, available)
+
+    def add_availability_listener(self, listener):
+        '''
+        Registers ``listener(engine, available)`` to be called when the engine availability changes,
+        e.g. once a pending background availability check completes.
+        '''
+        self._availability_listeners.append(listener)
 
     def sound_available(self):
         return winsound or check_executable('aplay')
@@ -158,6 +307,8 @@ class AbstractTTSEngine(object):
     def _assert_available(self):
         if not self.ioptions['enabled']:
             raise TTSError('Not enabled')
+        if self.pending:
+            raise TTSError('Availability pending')
         if not self.available:
             raise TTSError('Not available')
 
@@ -179,10 +330,124 @@ class AbstractTTSEngine(object):
         self._assert_available()
         return self._get_languages()
 
+    def _call(self, cmd, timeout=None, **kwargs):
+        '''
+        Runs an engine subprocess, killable by cancel().
+
+        :timeout: Deadline in seconds, defaults to the ``timeout`` init option. 0 for none.
+
+        Raises TTSError on timeout, cancellation or a non-zero exit status.
+        '''
+        timeout = self.ioptions['timeout'] if timeout is None else timeout
+        self._logger.debug('Executing %s', ' '.join([pipes.quote(arg) for arg in cmd]))
+        with self.instrumentation.timer('spawn', engine=self.SLUG):
+            proc = subprocess.Popen(cmd, **kwargs)
+        with self._procs_lock:
+            self._procs.add(proc)
+        try:
+            with self.instrumentation.timer('subprocess', engine=self.SLUG, command=os.path.basename(cmd[0])):
+                proc.wait(timeout=timeout or None)
+        except subprocess.TimeoutExpired:
+            raise TTSError('Timed out after %ss: %s' % (timeout, cmd[0]))
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            with self._procs_lock:
+                self._procs.discard(proc)
+                cancelled = proc in self._cancelled
+                self._cancelled.discard(proc)
+        if cancelled:
+            raise TTSCancelled('Cancelled: %s' % cmd[0])
+        if proc.returncode:
+            raise TTSError('%s failed with exit status %s' % (cmd[0], proc.returncode))
+        return proc.returncode
+
+    def _stream_call(self, cmd, chunk_size=4096, timeout=None):
+        '''
+        Runs an engine subprocess that writes WAV to stdout, killable by cancel(),
+        yielding ``talkey.audio.Audio`` chunks as they are written.
+        The subprocess is killed if the chunks are not consumed to the end.
+
+        :timeout: Deadline in seconds, defaults to the ``timeout`` init option. 0 for none.
+            Only time spent waiting for output counts, not that taken by the consumer, e.g. to play it.
+
+        Raises TTSError on timeout, cancellation, bad output or a non-zero exit status.
+        '''
+        timeout = self.ioptions['timeout'] if timeout is None else timeout
+        self._logger.debug('Streaming %s', ' '.join([pipes.quote(arg) for arg in cmd]))
+        with self.instrumentation.timer('spawn', engine=self.SLUG):
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        with self._procs_lock:
+            self._procs.add(proc)
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            try:
+                proc.kill()
+            except OSError:  # pragma: no cover
+                pass
+
+        def wait(func, left):
+            'Calls func, killing the subprocess if it takes more than the time left, returns the time left'
+            timer = threading.Timer(left, expire) if timeout else None
+            start = time.time()
+            if timer is not None:
+                timer.daemon = True
+                timer.start()
+            try:
+                return func(), max(left - (time.time() - start), 0.0)
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+        error = None
+        try:
+            try:
+                chunks, left = read_wav_stream(proc.stdout, chunk_size), timeout
+                while True:
+                    chunk, left = wait(lambda: next(chunks, None), left)
+                    if chunk is None:
+                        break
+                    yield chunk
+            except ValueError as e:
+                error = e
+            wait(proc.wait, left)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            with self._procs_lock:
+                self._procs.discard(proc)
+                cancelled = proc in self._cancelled
+                self._cancelled.discard(proc)
+        if cancelled:
+            raise TTSCancelled('Cancelled: %s' % cmd[0])
+        if timed_out.is_set():
+            raise TTSError('Timed out after %ss: %s' % (timeout, cmd[0]))
+        if proc.returncode:
+            raise TTSError('%s failed with exit status %s' % (cmd[0], proc.returncode))
+        if error is not None:
+            raise TTSError('Could not decode %s output: %s' % (self.SLUG, error))
+
+    def cancel(self):
+        '''
+        Kills all running synthesis and playback subprocesses of this engine.
+        The affected calls raise TTSError, and clean up their temporary files.
+        '''
+        with self._procs_lock:
+            procs = list(self._procs)
+            self._cancelled.update(procs)
+        for proc in procs:
+            try:
+                proc.kill()
+            except OSError:  # pragma: no cover
+                pass
+
     def _get_language_options(self, language):
-        if language in self.languages_options.keys():
-            return self.languages_options[language]
-        return None, {}
+        return self.languages_options.get(language, (None, {}))
 
     def _configure(self, language=None, voice=None, **_options):
         self._assert_available()
@@ -192,44 +457,380 @@ class AbstractTTSEngine(object):
         voice = voice or lang_voice
 
         if language not in self.languages.keys():
-            raise TTSError('Bad language: %s' % language, self.languages.keys())
+            raise TTSRequestError('Bad language: %s' % language, self.languages.keys())
 
         voice = voice if voice else self.languages[language]['default']
         if voice not in self.languages[language]['voices'].keys():
-            raise TTSError('Bad voice: %s' % voice, self.languages[language]['voices'].keys())
+            raise TTSRequestError('Bad voice: %s' % voice, self.languages[language]['voices'].keys())
         voiceinfo = self.languages[language]['voices'][voice]
 
+        # Never mutate the stored configuration, so concurrent calls can't leak options
+        lang_options = dict(lang_options)
         lang_options.update(_options)
-        options = process_options(self.optionspec, lang_options, TTSError)
+        options = process_options(self.optionspec, lang_options, TTSRequestError)
         return language, voice, voiceinfo, options
 
+    def _store_language_options(self, language, voice, options, default=False):
+        # Copy-on-write, readers only ever see a complete configuration
+        with self._config_lock:
+            languages_options = dict(self.languages_options)
+            languages_options[language] = (voice, options)
+            self.languages_options = languages_options
+            if default:
+                self.default_language = language
+                self.default_options = options
+
     def configure_default(self, **_options):
         '''
         Sets default configuration.
+        For an engine pending availability, this is applied once it is available.
 
         Raises TTSError on error.
         '''
+        with self._availability_lock:
+            if self.pending:
+                self._deferred.append(('configure_default', _options))
+                return
         language, voice, voiceinfo, options = self._configure(**_options)
-        self.languages_options[language] = (voice, options)
-        self.default_language = language
-        self.default_options = options
+        self._store_language_options(language, voice, options, default=True)
 
     def configure(self, **_options):
         '''
         Sets language-specific configuration.
+        For an engine pending availability, this is applied once it is available.
 
         Raises TTSError on error.
         '''
+        with self._availability_lock:
+            if self.pending:
+                self._deferred.append(('configure', _options))
+                return
         language, voice, voiceinfo, options = self._configure(**_options)
-        self.languages_options[language] = (voice, options)
+        self._store_language_options(language, voice, options)
+
+    def configure_postprocess(self, **_options):
+        '''
+        Sets post-synthesis processing of rendered audio, see ``talkey.audio.POSTPROCESS_OPTIONS``.
+
+        Raises TTSError on error.
+        '''
+        options = process_options(POSTPROCESS_OPTIONS, _options, TTSError)
+        if postprocess_enabled(options) and numpy is None:
+            raise TTSError('Post-processing requires numpy')  # pragma: no cover
+        self.postprocess_options = options
+
+    def can_synthesize(self):
+        '''
+        Boolean on if engine can render to audio, instead of only saying directly.
+        '''
+        return type(self)._synthesize != AbstractTTSEngine._synthesize or self._synthesizes_audio()
+
+    def _synthesizes_audio(self):
+        'Boolean on if engine renders to audio in-process'
+        return type(self)._synthesize_audio != AbstractTTSEngine._synthesize_audio
+
+    def _renders(self):
+        'Boolean on if say() should go through _render()'
+        return self.can_synthesize() and (
+            self.coalesce
+            or self.sink is not None
+            or self.cache is not None
+            or postprocess_enabled(self.postprocess_options)
+        )
+
+    def _streams(self):
+        'Boolean on if engine renders progressively'
+        return type(self)._synthesize_stream != AbstractTTSEngine._synthesize_stream
+
+    def _synthesizes_ssml(self):
+        'Boolean on if engine renders SSML natively'
+        return type(self)._synthesize_ssml != AbstractTTSEngine._synthesize_ssml
+
+    def _timed_synthesize(self, phrase, language, voice, voiceinfo, options, fname=None, ssml=False):
+        'Renders to fname, or without a fname in-process to the returned audio'
+        start = time.time()
+        with self.instrumentation.timer('synthesize', engine=self.SLUG):
+            if ssml:
+                ret = self._synthesize_ssml(phrase, language, voice, voiceinfo, options, fname)
+            elif fname is None:
+                ret = self._synthesize_audio(phrase, language, voice, voiceinfo, options)
+            else:
+                ret = self._synthesize(phrase, language, voice, voiceinfo, options, fname)
+        if self.health is not None:
+            self.health.record_latency(time.time() - start, len(phrase))
+        return ret
+
+    def _cache_key(self, phrase, language, voice, options, ssml=False):
+        return (
+            self.SLUG, language, voice, tuple(sorted(options.items())),
+            tuple(sorted(self.postprocess_options.items())), phrase, ssml
+        )
+
+    def _render(self, phrase, language, voice, voiceinfo, options, ssml=False):
+        key = self._cache_key(phrase, language, voice, options, ssml)
+        if self.cache is not None:
+            audio = self.cache.get(key)
+            if audio is not None:
+                self.instrumentation.count('cache_hit', engine=self.SLUG)
+                return audio
+            self.instrumentation.count('cache_miss', engine=self.SLUG)
+        # Concurrent identical requests share a single render
+        return self._inflight.do(key, self._render_uncached, key, phrase, language, voice, voiceinfo, options, ssml)
+
+    def _render_file(self, phrase, language, voice, voiceinfo, options, ssml=False):
+        with tempfile.NamedTemporaryFile(suffix=self.AUDIO_SUFFIX, delete=False) as f:
+            fname = f.name
+        try:
+            self._timed_synthesize(phrase, language, voice, voiceinfo, options, fname, ssml)
+            try:
+                with self.instrumentation.timer('decode', engine=self.SLUG):
+                    return Audio.from_file(fname)
+            except (EOFError, IOError, OSError, wave.Error, audioread.DecodeError) as e:
+                raise TTSError('Could not decode %s output: %s' % (self.SLUG, e or type(e).__name__))
+        finally:
+            os.remove(fname)
+
+    def _render_uncached(self, key, phrase, language, voice, voiceinfo, options, ssml=False):
+        if self._synthesizes_audio() and not ssml:
+            audio = self._timed_synthesize(phrase, language, voice, voiceinfo, options)
+        else:
+            audio = self._render_file(phrase, language, voice, voiceinfo, options, ssml)
+        self.instrumentation.count('bytes', len(audio.frames), engine=self.SLUG)
+
+        if postprocess_enabled(self.postprocess_options):
+            with self.instrumentation.timer('postprocess', engine=self.SLUG):
+                audio = postprocess(audio, self.postprocess_options)
+        if self.cache is not None:
+            self.cache.put(key, audio)
+        return audio
+
+    def synthesize(self, phrase, **_options):
+        '''
+        Renders the phrase to audio, optionally allows to select/override any voice options.
+        Rendered audio is post-processed and cached once, as configured.
+
+        Returns a ``talkey.audio.Audio`` instance.
+        Raises TTSError if the engine can not render to audio.
+        '''
+        if not self.can_synthesize():
+            raise TTSError('Synthesis not supported by %s' % self.SLUG)
+        with self.instrumentation.timer('configure', engine=self.SLUG):
+            language, voice, voiceinfo, options = self._configure(**_options)
+        return self._render(phrase, language, voice, voiceinfo, options)
+
+    def _stream(self, phrase, language, voice, voiceinfo, options):
+        'Yields rendered audio chunks, streamed if the engine can, and caches the whole once complete'
+        if not self._streams() or postprocess_enabled(self.postprocess_options):
+            # Post-processing needs the whole audio
+            yield self._render(phrase, language, voice, voiceinfo, options)
+            return
+        key = self._cache_key(phrase, language, voice, options)
+        if self.cache is not None:
+            audio = self.cache.get(key)
+            if audio is not None:
+                self.instrumentation.count('cache_hit', engine=self.SLUG)
+                yield audio
+                return
+            self.instrumentation.count('cache_miss', engine=self.SLUG)
+        start = time.time()
+        chunks = []
+        for chunk in self._synthesize_stream(phrase, language, voice, voiceinfo, options):
+            if not chunks and self.instrumentation.enabled:
+                self.instrumentation.emit(Event('timing', 'first_audio', time.time() - start, {'engine': self.SLUG}))
+            chunks.append(chunk)
+            yield chunk
+        self.instrumentation.count('bytes', sum(len(chunk.frames) for chunk in chunks), engine=self.SLUG)
+        if self.cache is not None and chunks:
+            self.cache.put(key, concatenate(chunks))
+
+    def synthesize_stream(self, phrase, **_options):
+        '''
+        Renders the phrase progressively, optionally allows to select/override any voice options.
+
+        Returns an iterator of ``talkey.audio.Audio`` chunks, yielded as the engine produces them,
+        so playback can start before rendering completes.
+        Engines that can not stream, or with post-processing configured, yield the whole audio as one chunk.
+        Streamed audio is cached once complete, as configured.
+
+        Raises TTSError if the engine can not render to audio.
+        '''
+        if not self.can_synthesize():
+            raise TTSError('Synthesis not supported by %s' % self.SLUG)
+        with self.instrumentation.timer('configure', engine=self.SLUG):
+            language, voice, voiceinfo, options = self._configure(**_options)
+        return self._stream(phrase, language, voice, voiceinfo, options)
 
     def say(self, phrase, **_options):
         '''
         Says the phrase, optionally allows to select/override any voice options.
         '''
-        language, voice, voiceinfo, options = self._configure(**_options)
+        with self.instrumentation.timer('configure', engine=self.SLUG):
+            language, voice, voiceinfo, options = self._configure(**_options)
         self._logger.debug("Saying '%s' with '%s'", phrase, self.SLUG)
-        self._say(phrase, language, voice, voiceinfo, options)
+        if self.stream and self._streams() and not self.coalesce:
+            self.play_stream(self._stream(phrase, language, voice, voiceinfo, options))
+        elif self._renders():
+            self.play_audio(self._render(phrase, language, voice, voiceinfo, options))
+        else:
+            self._say(phrase, language, voice, voiceinfo, options)
+
+    def _configure_segment(self, segment, _options):
+        'Configures a SSML segment, returns (language, voice, voiceinfo, options)'
+        _options = dict(_options)
+        if segment.language:
+            if segment.language != _options.get('language'):
+                # The voice requested for the whole phrase is of another language
+                _options.pop('voice', None)
+            _options['language'] = segment.language
+        if segment.voice:
+            _options['voice'] = segment.voice
+        language, voice, voiceinfo, options = self._configure(**_options)
+        for attr, factor in [('rate', segment.rate), ('pitch', segment.pitch)]:
+            name = self.PROSODY_OPTIONS.get(attr)
+            if factor != 1.0 and name in options:
+                spec = self.optionspec[name]
+                value = int(round(options[name] * factor))
+                options[name] = min(max(value, spec.get('min', value)), spec.get('max', value))
+        return language, voice, voiceinfo, options
+
+    def _render_ssml(self, segments, _options):
+        from talkey.ssml import to_ssml  # talkey.ssml depends on this module
+        with self.instrumentation.timer('configure', engine=self.SLUG):
+            configured = [None if seg.pause else self._configure_segment(seg, _options) for seg in segments]
+        if not any(configured):
+            raise TTSRequestError('No text in SSML')
+        first = [conf for conf in configured if conf][0]
+
+        if self._synthesizes_ssml():
+            # Native markup, with the prosody left to the engine
+            markup = to_ssml([
+                seg if conf is None else seg._replace(voice=conf[1])
+                for seg, conf in zip(segments, configured)
+            ])
+            return self._render(markup, *first, ssml=True)
+
+        parts = [
+            seg.pause if conf is None else self._render(seg.text, *conf)
+            for seg, conf in zip(segments, configured)
+        ]
+        try:
+            return concatenate(parts)
+        except ValueError as e:
+            raise TTSError('Could not concatenate %s output: %s' % (self.SLUG, e))
+
+    def synthesize_ssml(self, markup, **_options):
+        '''
+        Renders SSML markup to audio, optionally allows to select/override any voice options.
+        See ``talkey.ssml`` for the supported subset.
+
+        Engines with native SSML support render it in one go,
+        otherwise each segment is rendered (and cached) separately and concatenated.
+
+        Returns a ``talkey.audio.Audio`` instance.
+        Raises TTSError if the engine can not render to audio, or on bad markup.
+        '''
+        from talkey.ssml import parse
+        if not self.can_synthesize():
+            raise TTSError('Synthesis not supported by %s' % self.SLUG)
+        return self._render_ssml(parse(markup), _options)
+
+    def say_ssml(self, markup, **_options):
+        '''
+        Says SSML markup, optionally allows to select/override any voice options.
+        See ``talkey.ssml`` for the supported subset.
+        '''
+        from talkey.ssml import parse
+        segments = parse(markup)
+        if self.can_synthesize():
+            self.play_audio(self._render_ssml(segments, _options))
+            return
+        # Engines that can only speak, speak segment by segment
+        configured = [None if seg.pause else self._configure_segment(seg, _options) for seg in segments]
+        for seg, conf in zip(segments, configured):
+            if conf is None:
+                time.sleep(seg.pause)
+            else:
+                self._say(seg.text, *conf)
+
+    def play_audio(self, audio):
+        '''
+        Plays the audio, or writes it to the engine sink if one is set.
+
+        :audio: A ``talkey.audio.Audio`` instance
+        '''
+        if self.sink is not None:
+            with self.instrumentation.timer('play', engine=self.SLUG):
+                self.sink.write(audio)
+            return
+        filename = getattr(audio, 'filename', None)
+        if filename is not None and os.path.isfile(filename):
+            # Audio from the disk cache is played from its file, unless it was evicted meanwhile
+            with self.instrumentation.timer('play', engine=self.SLUG):
+                self.play(filename)
+            return
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            fname = f.name
+        try:
+            audio.write(fname)
+            with self.instrumentation.timer('play', engine=self.SLUG):
+                self.play(fname)
+        finally:
+            os.remove(fname)
+
+    def play_stream(self, chunks):
+        '''
+        Plays audio as it is rendered, or writes it to the engine sink if one is set.
+
+        :chunks: Iterable of ``talkey.audio.Audio`` instances of the same format
+        '''
+        if self.sink is None and winsound:  # pragma: no cover
+            # winsound only plays whole files
+            self.play_audio(concatenate(list(chunks)))
+            return
+        with self.instrumentation.timer('play', engine=self.SLUG):
+            if self.sink is not None:
+                self.sink.write_stream(chunks)
+            else:
+                self._play_pipe(chunks)
+
+    def _play_pipe(self, chunks, cmd=None):
+        'Streams the chunks as WAV to the stdin of a player, killable by cancel()'
+        cmd = cmd or ['aplay', '-q', '-']
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            return
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        with self._procs_lock:
+            self._procs.add(proc)
+        try:
+            try:
+                proc.stdin.write(first.wav_header(STREAM_LENGTH))
+                proc.stdin.write(memoryview(first.frames))
+                proc.stdin.flush()
+                for chunk in chunks:
+                    proc.stdin.write(memoryview(chunk.frames))
+                    proc.stdin.flush()
+                proc.stdin.close()
+            except (IOError, OSError):
+                # The player died, or was killed
+                pass
+            proc.wait()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            if hasattr(chunks, 'close'):
+                # Stops rendering that is no longer played
+                chunks.close()
+            with self._procs_lock:
+                self._procs.discard(proc)
+                cancelled = proc in self._cancelled
+                self._cancelled.discard(proc)
+        if cancelled:
+            raise TTSCancelled('Cancelled: %s' % cmd[0])
+        if proc.returncode:
+            raise TTSError('%s failed with exit status %s' % (cmd[0], proc.returncode))
 
     def play(self, filename, translate=False):  # pragma: no cover
         '''
@@ -241,24 +842,25 @@ class AbstractTTSEngine(object):
         # FIXME: Use platform-independent and async audio-output here
         # PyAudio looks most promising, too bad about:
         #  --allow-external PyAudio --allow-unverified PyAudio
-        if translate:
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-                fname = f.name
-            with audioread.audio_open(filename) as f:
-                with contextlib.closing(wave.open(fname, 'w')) as of:
-                    of.setnchannels(f.channels)
-                    of.setframerate(f.samplerate)
-                    of.setsampwidth(2)
-                    for buf in f:
-                        of.writeframes(buf)
-            filename = fname
-
-        if winsound:
-            winsound.PlaySound(str(filename), winsound.SND_FILENAME)
-        else:
-            cmd = ['aplay', str(filename)]
-            self._logger.debug('Executing %s', ' '.join([pipes.quote(arg) for arg in cmd]))
-            subprocess.call(cmd)
-
-        if translate:
-            os.remove(fname)
+        fname = None
+        try:
+            if translate:
+                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+                    fname = f.name
+                with audioread.audio_open(filename) as f:
+                    with contextlib.closing(wave.open(fname, 'w')) as of:
+                        of.setnchannels(f.channels)
+                        of.setframerate(f.samplerate)
+                        of.setsampwidth(2)
+                        for buf in f:
+                            of.writeframes(buf)
+                filename = fname
+
+            if winsound:
+                winsound.PlaySound(str(filename), winsound.SND_FILENAME)
+            else:
+                # Playback is cancellable, but not bound by the synthesis deadline
+                self._call(['aplay', str(filename)], timeout=0)
+        finally:
+            if fname:
+                os.remove(fname)
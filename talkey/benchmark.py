@@ -0,0 +1,197 @@
+'''
+Benchmarks of the engines and the Talkey pipeline.
+
+Runs without audio hardware, using a dummy engine and a fake subprocess engine, e.g.::
+
+    python -m talkey.benchmark --repeat 20 --output bench.json
+'''
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess as _subprocess
+
+from talkey import __version__
+from talkey.base import TTSError
+from talkey.engines import DummyTTS, _ENGINE_MAP
+from talkey.tts import Talkey
+from talkey.utils import process_options
+
+PHRASES = {
+    'short': 'Cows go moo',
+    'medium': 'Old McDonald had a farm, and on that farm he had some cows.',
+    'long': ' '.join(['Old McDonald had a farm, and on that farm he had some cows, with a moo moo here.'] * 8),
+}
+
+CLASSIFY_TEXTS = [
+    'Cows go moo',
+    'Old McDonald had a farm',
+    "Ou boer McDonald het 'n plaas gehad",
+    'Le vieux McDonald avait une ferme',
+    'Der alte McDonald hatte eine Farm',
+]
+
+# Writes a silent WAV of the requested duration, standing in for an engine process
+FAKE_ENGINE = '''
+import sys, wave
+f = wave.open(sys.argv[1], 'wb')
+f.setnchannels(1)
+f.setsampwidth(2)
+f.setframerate(16000)
+f.writeframes(b'\\x00\\x00' * int(16000 * float(sys.argv[2])))
+f.close()
+'''
+
+
+class BenchDummyTTS(DummyTTS):
+    'Dummy engine that needs no sound output'
+    SLUG = 'bench-dummy'
+
+    def sound_available(self):
+        return True
+
+
+class FakeSubprocessTTS(BenchDummyTTS):
+    '''
+    Engine that runs a fake engine subprocess, producing 60ms of silence per character.
+    '''
+    SLUG = 'bench-subprocess'
+    SECONDS_PER_CHAR = 0.06
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        self._call([sys.executable, '-c', FAKE_ENGINE, fname, str(len(phrase) * self.SECONDS_PER_CHAR)])
+
+    def play(self, filename, translate=False):
+        pass
+
+
+def _timeit(func, repeat):
+    'Returns dict of timing stats (seconds) of repeated calls'
+    samples = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        samples.append(time.time() - start)
+    samples.sort()
+    return {
+        'min': samples[0],
+        'median': samples[len(samples) // 2],
+        'max': samples[-1],
+        'repeat': repeat,
+    }
+
+
+def bench_import(repeat):
+    'Import time of talkey, in a fresh interpreter'
+    cmd = [sys.executable, '-c', 'import talkey']
+    return _timeit(lambda: _subprocess.check_call(cmd), repeat)
+
+
+def _talkey():
+    return Talkey(
+        engine_preference=[BenchDummyTTS.SLUG, FakeSubprocessTTS.SLUG],
+        **dict((slug, {'options': {'enabled': True}}) for slug in [BenchDummyTTS.SLUG, FakeSubprocessTTS.SLUG])
+    )
+
+
+def bench_construct(repeat):
+    'Talkey() construction'
+    return _timeit(_talkey, repeat)
+
+
+def bench_classify(repeat):
+    'classify() throughput'
+    tts = _talkey()
+    stats = _timeit(lambda: [tts.classify(txt) for txt in CLASSIFY_TEXTS], repeat)
+    stats['texts_per_second'] = len(CLASSIFY_TEXTS) / stats['median']
+    return stats
+
+
+def bench_process_options(repeat):
+    'process_options() cost, per call'
+    spec = {
+        'variant': {'type': 'enum', 'values': ['', 'f1', 'm3'], 'default': 'm3'},
+        'pitch_adjustment': {'type': 'int', 'min': 0, 'max': 99, 'default': 50},
+        'words_per_minute': {'type': 'int', 'min': 80, 'max': 450, 'default': 150},
+    }
+    calls = 1000
+    stats = _timeit(lambda: [process_options(spec, {'words_per_minute': 130}, TTSError) for _ in range(calls)], repeat)
+    return dict((key, val / calls if key != 'repeat' else val) for key, val in stats.items())
+
+
+def bench_synthesis(repeat):
+    'Per-engine synthesis latency and real-time factor, by phrase length'
+    eng = FakeSubprocessTTS(enabled=True)
+    results = {}
+    for name, phrase in sorted(PHRASES.items()):
+        duration = [0.0]
+
+        def run():
+            duration[0] = eng.synthesize(phrase).duration
+
+        stats = _timeit(run, repeat)
+        stats['audio_seconds'] = duration[0]
+        stats['real_time_factor'] = stats['median'] / duration[0]
+        results[name] = stats
+    return {eng.SLUG: results}
+
+
+BENCHMARKS = [
+    ('import', bench_import),
+    ('construct', bench_construct),
+    ('classify', bench_classify),
+    ('process_options', bench_process_options),
+    ('synthesis', bench_synthesis),
+]
+
+
+def run(repeat=10, only=None):
+    '''
+    Runs the benchmarks, returns dict of results.
+
+    :repeat: Number of repetitions of each benchmark
+    :only: List of benchmark names to run, defaults to all
+    '''
+    registered = dict((cls.SLUG, cls) for cls in [BenchDummyTTS, FakeSubprocessTTS])
+    _ENGINE_MAP.update(registered)
+    try:
+        results = dict(
+            (name, func(repeat))
+            for name, func in BENCHMARKS
+            if not only or name in only
+        )
+    finally:
+        for slug in registered:
+            _ENGINE_MAP.pop(slug, None)
+    return {
+        'meta': {
+            'talkey': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.time(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks talkey')
+    parser.add_argument('--repeat', type=int, default=10, help='Repetitions of each benchmark')
+    parser.add_argument('--only', action='append', choices=[name for name, func in BENCHMARKS],
+                        help='Only run the named benchmark, may be repeated')
+    parser.add_argument('--output', help='Write JSON results to this file, instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+'''
+Caching of synthesized audio.
+'''
+import os
+import json
+import mmap
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from talkey.audio import Audio
+
+
+class AudioCache(object):
+    '''
+    Thread-safe LRU cache of synthesized (and post-processed) audio.
+
+    :maxsize: Maximum number of entries kept
+    '''
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''
+        Returns cached audio for key, or None.
+        '''
+        with self._lock:
+            audio = self._data.pop(key, None)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._data[key] = audio
+            self.hits += 1
+            return audio
+
+    def put(self, key, audio):
+        '''
+        Stores audio for key, evicting the least recently used entries.
+        '''
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = audio
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+class MappedAudio(Audio):
+    '''
+    Audio whose frames are a ``memoryview`` of a memory-mapped WAV file, as returned by ``DiskAudioCache``.
+
+    :filename: The WAV file
+    '''
+    __slots__ = ('filename',)
+
+    def __init__(self, filename, frames, nchannels=1, sampwidth=2, framerate=22050):
+        Audio.__init__(self, frames, nchannels, sampwidth, framerate)
+        self.filename = filename
+
+
+class DiskAudioCache(object):
+    '''
+    Thread-safe LRU cache of synthesized audio, stored as WAV files in a directory, that persists across runs.
+
+    Entries are read by memory-mapping their file, so the audio is paged in by the OS on use and shared with the
+    page cache, rather than copied into Python memory. The format and data offset of every file is kept in an
+    index, so no WAV header is parsed on reads. The most recently read entries stay mapped.
+
+    :directory: The directory to keep files and the index in, created if missing
+    :maxsize: Maximum number of entries kept
+    :mapped: Maximum number of entries kept mapped
+    '''
+    INDEX = 'index.json'
+
+    def __init__(self, directory, maxsize=1024, mapped=64):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.mapped = mapped
+        self.hits = 0
+        self.misses = 0
+        self._index = OrderedDict()
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        try:
+            with open(os.path.join(directory, self.INDEX)) as f:
+                entries = json.load(f)['entries']
+        except (IOError, OSError, ValueError, KeyError):
+            entries = []
+        for entry in entries:
+            if os.path.isfile(self._path(entry[0])):
+                self._index[entry[0]] = tuple(entry[1:])
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest + '.wav')
+
+    def _save_index(self):
+        'Writes the index atomically, so a crash never leaves a partial index'
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'entries': [[digest] + list(entry) for digest, entry in self._index.items()]}, f)
+        os.rename(tmp, os.path.join(self.directory, self.INDEX))
+
+    def _map(self, digest, entry):
+        'Returns audio of an entry, mapped from its file'
+        offset, length, nchannels, sampwidth, framerate = entry
+        fname = self._path(digest)
+        with open(fname, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            frames = memoryview(data)[offset:offset + length]
+        except TypeError:  # pragma: no cover
+            # Python 2 mmap has no memoryview support
+            frames = data[offset:offset + length]
+        return MappedAudio(fname, frames, nchannels, sampwidth, framerate)
+
+    def get(self, key):
+        '''
+        Returns cached audio for key, or None.
+        '''
+        digest = self._digest(key)
+        with self._lock:
+            entry = self._index.pop(digest, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index[digest] = entry
+            self.hits += 1
+            audio = self._maps.pop(digest, None)
+            if audio is None:
+                try:
+                    audio = self._map(digest, entry)
+                except (IOError, OSError, ValueError):
+                    # The file is gone or truncated
+                    del self._index[digest]
+                    self.hits -= 1
+                    self.misses += 1
+                    return None
+            self._maps[digest] = audio
+            while len(self._maps) > self.mapped:
+                # Mappings are released once no audio refers to them
+                self._maps.popitem(last=False)
+            return audio
+
+    def put(self, key, audio):
+        '''
+        Stores audio for key, evicting the least recently used entries.
+        '''
+        digest = self._digest(key)
+        header = audio.wav_header()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(memoryview(audio.frames))
+        with self._lock:
+            os.rename(tmp, self._path(digest))
+            self._index.pop(digest, None)
+            self._maps.pop(digest, None)
+            self._index[digest] = (len(header), len(audio.frames), audio.nchannels, audio.sampwidth, audio.framerate)
+            while len(self._index) > self.maxsize:
+                self._evict(next(iter(self._index)))
+            self._save_index()
+
+    def _evict(self, digest):
+        del self._index[digest]
+        self._maps.pop(digest, None)
+        try:
+            # Mapped audio stays readable after the file is removed
+            os.remove(self._path(digest))
+        except OSError:  # pragma: no cover
+            pass
+
+    def clear(self):
+        with self._lock:
+            for digest in list(self._index):
+                self._evict(digest)
+            self._save_index()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return self._digest(key) in self._index
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    '''
+    Deduplicates concurrent calls with the same key:
+    the first caller does the work, and concurrent callers wait for and share its result.
+    '''
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        '''
+        Returns ``func(*args, **kwargs)``, or the result of an identical in-flight call.
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:  # pylint: disable=W0703
+            # Followers must never see a result-less call, even on KeyboardInterrupt
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
@@ -0,0 +1,123 @@
+'''
+Language classifiers restricted to a set of languages, without touching the global langid identifier.
+'''
+import threading
+import weakref
+
+import numpy
+import langid
+import langid.langid
+from langid.langid import LanguageIdentifier
+
+_LOCK = threading.Lock()
+_FULL_MODEL = None
+_CLASSIFIERS = {}
+
+
+def _full_model():
+    'Returns (identifier, (nb_ptc, nb_pc, nb_classes)) of the full langid model, loaded once'
+    global _FULL_MODEL
+    if _FULL_MODEL is None:
+        if langid.langid.identifier is None:
+            langid.langid.load_model()
+        ident = langid.langid.identifier
+        # The global identifier keeps the full model, even if someone restricted its languages
+        model = getattr(ident, '_LanguageIdentifier__full_model', None)
+        if model is None:  # pragma: no cover
+            ident = LanguageIdentifier.from_modelstring(langid.langid.model, norm_probs=False)
+            model = (ident.nb_ptc, ident.nb_pc, ident.nb_classes)
+        _FULL_MODEL = (ident, model)
+    return _FULL_MODEL
+
+
+def get_classifier(languages=None):
+    '''
+    Returns a ``langid`` ``LanguageIdentifier`` restricted to the languages the model knows of ``languages``,
+    or of all languages if None (or none are known).
+
+    Classifiers are built once per language set and shared, and share the tokenizer tables of the global
+    identifier, whose state is left alone.
+    '''
+    key = frozenset(languages) if languages is not None else None
+    with _LOCK:
+        classifier = _CLASSIFIERS.get(key)
+        if classifier is not None:
+            return classifier
+        ident, (nb_ptc, nb_pc, nb_classes) = _full_model()
+        mask = numpy.array([key is None or lang in key for lang in nb_classes], dtype=bool)
+        if not mask.any():
+            mask[:] = True
+        classifier = _CLASSIFIERS[key] = LanguageIdentifier(
+            nb_ptc[:, mask], nb_pc[mask], ident.nb_numfeats,
+            [lang for lang, keep in zip(nb_classes, mask) if keep],
+            ident.tk_nextmove, ident.tk_output, norm_probs=langid.langid.NORM_PROBS
+        )
+        return classifier
+
+
+
+_TABLES = weakref.WeakKeyDictionary()
+
+
+def _tables(classifier):
+    '''
+    Returns the tokenizer transitions of a classifier as an array, and the summed scores of the output features
+    of each tokenizer state, so scoring a text is summing the rows of the states it visits.
+    '''
+    tables = _TABLES.get(classifier)
+    if tables is None:
+        nextmove = numpy.asarray(classifier.tk_nextmove, dtype=numpy.int64)
+        state_ptc = numpy.zeros((len(nextmove) >> 8, len(classifier.nb_classes)), dtype=classifier.nb_ptc.dtype)
+        for state, feats in classifier.tk_output.items():
+            if feats:
+                state_ptc[state] = classifier.nb_ptc[list(feats)].sum(axis=0)
+        tables = _TABLES[classifier] = (nextmove, state_ptc)
+    return tables
+
+
+def _scores(classifier, texts):
+    'Returns the score matrix of encoded texts, stepping the tokenizer of all texts at once'
+    nextmove, state_ptc = _tables(classifier)
+    count = len(texts)
+    lengths = numpy.array([len(text) for text in texts], dtype=numpy.int64)
+    width = int(lengths.max())
+    data = numpy.zeros((count, width), dtype=numpy.int64)
+    for row, text in enumerate(texts):
+        data[row, :len(text)] = numpy.frombuffer(text, dtype=numpy.uint8)
+    states = numpy.zeros((count, width), dtype=numpy.int64)
+    state = numpy.zeros(count, dtype=numpy.int64)
+    for col in range(width):
+        state = nextmove[(state << 8) + data[:, col]]
+        states[:, col] = state
+
+    # Count the states visited by each text, ignoring the padding
+    nstates = len(state_ptc)
+    rows = numpy.repeat(numpy.arange(count), lengths)
+    keys, visits = numpy.unique(rows * nstates + states[numpy.arange(width) < lengths[:, None]], return_counts=True)
+    rows = keys // nstates
+
+    scores = numpy.tile(classifier.nb_pc, (count, 1))
+    if len(keys):
+        # Keys are sorted by text, so the states of each text are a contiguous run
+        starts = numpy.flatnonzero(numpy.r_[True, rows[1:] != rows[:-1]])
+        scores[rows[starts]] += numpy.add.reduceat(visits[:, None] * state_ptc[keys % nstates], starts)
+    return scores
+
+
+def rank_many(classifier, texts, batch_size=256):
+    '''
+    Returns a matrix of the scores of each text for each language of the classifier, in ``nb_classes`` order,
+    as ``classifier.rank()`` scores them one text at a time.
+
+    Texts are tokenized together in batches of similar length, and scored by summing precomputed per-state scores.
+    '''
+    texts = [text.encode('utf-8') if not isinstance(text, bytes) else text for text in texts]
+    scores = numpy.zeros((len(texts), len(classifier.nb_classes)), dtype=classifier.nb_pc.dtype)
+    # Similar lengths batched together need little padding
+    order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]))
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        scores[batch] = _scores(classifier, [texts[idx] for idx in batch])
+    if langid.langid.NORM_PROBS:
+        scores = numpy.array([classifier.norm_probs(row) for row in scores])
+    return scores
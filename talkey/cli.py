@@ -0,0 +1,194 @@
+'''
+The ``talkey`` command line tool.
+
+Speaks or renders text from arguments, files, or line by line from stdin, e.g.::
+
+    talkey say 'Cows go moo'
+    talkey render --file phrases.txt --output-dir out --jobs 4
+    tail -f events.log | talkey say
+    talkey --connect /tmp/talkey.sock say 'Via the daemon'
+    talkey daemon --socket /tmp/talkey.sock
+
+Engines are initialized once per process, and lines read from stdin are handled as they arrive.
+'''
+import os
+import sys
+import json
+import argparse
+import itertools
+from collections import deque
+
+from .base import TTSError
+from .pool import SynthesisPool
+from .tts import Talkey
+
+FORMATS = ['wav', 'raw']
+
+
+def iter_texts(texts, files, stdin):
+    '''
+    Yields the texts to handle, in order: the ``texts`` themselves,
+    then the non-empty lines of each of ``files`` (``-`` is stdin), lazily.
+    '''
+    for txt in texts:
+        yield txt
+    for fname in files:
+        f = stdin if fname == '-' else open(fname)
+        try:
+            # readline() instead of iteration, so lines are not held back by read-ahead buffering
+            for line in iter(f.readline, ''):
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            if f is not stdin:
+                f.close()
+
+
+def parse_address(address):
+    '''
+    Parses a daemon address, either a Unix socket path or ``host:port``.
+    '''
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and os.sep not in address:
+        return (host or '127.0.0.1', int(port))
+    return address
+
+
+def write_audio(audio, fname, fmt):
+    'Writes audio as a WAV file, or as raw PCM'
+    if fmt == 'raw':
+        with open(fname, 'wb') as f:
+            f.write(audio.frames)
+    else:
+        audio.write(fname)
+
+
+def say(tts, texts, lang):
+    '''
+    Says the texts in order, returns the number that failed.
+    '''
+    failed = 0
+    for txt in texts:
+        try:
+            tts.say(txt, lang)
+        except TTSError as e:
+            failed += 1
+            sys.stderr.write('talkey: %s\n' % e)
+    return failed
+
+
+def render(tts, texts, lang, out, output_dir, fmt, jobs):
+    '''
+    Renders the texts to numbered files in ``output_dir``, with ``jobs`` rendered concurrently.
+    Prints the name of each file once written, in order. Returns the number that failed.
+    '''
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    pool = SynthesisPool(jobs)
+    pending = deque()
+    failed = 0
+
+    def complete():
+        num, job = pending.popleft()
+        try:
+            audio = job.result()
+        except TTSError as e:
+            sys.stderr.write('talkey: %s\n' % e)
+            return 1
+        fname = os.path.join(output_dir, '%05d.%s' % (num, fmt))
+        write_audio(audio, fname, fmt)
+        out.write(fname + '\n')
+        out.flush()
+        return 0
+
+    try:
+        for num, txt in zip(itertools.count(1), texts):
+            pending.append((num, pool.submit(tts.synthesize, txt, lang, caller='cli')))
+            # Bound the work in flight, so streaming input is not read ahead without limit
+            while len(pending) > 2 * jobs or (pending and pending[0][1].done()):
+                failed += complete()
+        while pending:
+            failed += complete()
+    finally:
+        pool.shutdown()
+    return failed
+
+
+def load_talkey(args):
+    'Creates the Talkey, or the daemon client, that requests go to'
+    if args.connect:
+        from .daemon import TalkeyClient
+        return TalkeyClient(parse_address(args.connect))
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    if args.engine:
+        config['engine_preference'] = args.engine
+    return Talkey(**config)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='talkey', description='Speaks or renders text, in many languages')
+    parser.add_argument('--config', help='JSON file of Talkey() keyword arguments')
+    parser.add_argument('--engine', action='append', help='Preferred engine, may be repeated')
+    parser.add_argument('--connect', metavar='ADDRESS', help='Use the talkey daemon at this socket path or host:port')
+    parser.add_argument('--lang', help='Language of the text, detected if not given')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    def add_inputs(cmd):
+        cmd.add_argument('text', nargs='*', help='Text to handle, if none is given, reads lines from stdin')
+        cmd.add_argument('--file', action='append', default=[], help="Handle the lines of a file, '-' for stdin")
+
+    add_inputs(commands.add_parser('say', help='Speak text'))
+    cmd = commands.add_parser('render', help='Render text to audio files')
+    add_inputs(cmd)
+    cmd.add_argument('--output-dir', '-o', default='.', help='Directory to write numbered audio files to')
+    cmd.add_argument('--format', choices=FORMATS, default='wav', help='Audio file format')
+    cmd.add_argument('--jobs', '-j', type=int, default=1, help='Number of texts rendered concurrently')
+    commands.add_parser('languages', help='List supported languages')
+    commands.add_parser('daemon', help='Run the talkey daemon, see: talkey daemon --help', add_help=False)
+    return parser
+
+
+def main(argv=None, out=None, stdin=None):
+    argv = sys.argv[1:] if argv is None else argv
+    out = out or sys.stdout
+    parser = get_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'daemon':
+        # The daemon parses its own arguments
+        if args.connect or args.engine or args.lang:
+            parser.error('--connect, --engine and --lang do not apply to daemon')
+        from .daemon import main as daemon_main
+        return daemon_main((['--config', args.config] if args.config else []) + extra)
+    if extra:
+        parser.error('unrecognized arguments: %s' % ' '.join(extra))
+    try:
+        tts = load_talkey(args)
+    except (TTSError, IOError, ValueError) as e:
+        sys.stderr.write('talkey: %s\n' % e)
+        return 1
+
+    try:
+        if args.command == 'languages':
+            out.write('\n'.join(sorted(tts.languages)) + '\n')
+            return 0
+        files = args.file or ([] if args.text else ['-'])
+        texts = iter_texts(args.text, files, stdin or sys.stdin)
+        if args.command == 'say':
+            failed = say(tts, texts, args.lang)
+        else:
+            failed = render(tts, texts, args.lang, out, args.output_dir, args.format, max(args.jobs, 1))
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if hasattr(tts, 'close'):
+            tts.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
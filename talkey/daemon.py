@@ -0,0 +1,359 @@
+'''
+Long-running TTS daemon, serving a ``Talkey`` over a local HTTP API.
+
+It owns the engines, caches and the audio device, so clients need not discover engines themselves, e.g.::
+
+    python -m talkey.daemon --socket /tmp/talkey.sock --config talkey.json
+
+API, all request and response bodies are JSON unless noted:
+
+``POST /say``
+    ``{"text": ..., "lang": null, "priority": 0, "wait": true}``.
+    Utterances are played one at a time, highest priority first.
+    Returns ``{"queued": true}`` without waiting if ``wait`` is false.
+``POST /synthesize``
+    ``{"text": ..., "lang": null, "priority": 0}``, returns the rendered audio as ``audio/wav``.
+``POST /classify``
+    ``{"text": ...}``, returns ``{"lang": ...}``.
+``GET /languages``
+    Returns ``{"languages": [...]}``.
+``GET /stats``
+    Returns queue and engine health statistics.
+``GET /metrics``
+    Returns per-stage metrics in the Prometheus text format.
+
+Errors are returned as ``{"error": ...}`` with status 400 for bad requests, and 500 for synthesis failures.
+'''
+import io
+import os
+import sys
+import json
+import socket
+import logging
+import argparse
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn, UnixStreamServer
+    import http.client as httplib
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # pylint: disable=F0401
+    from SocketServer import ThreadingMixIn, UnixStreamServer  # pylint: disable=F0401
+    import httplib  # pylint: disable=F0401
+
+from .audio import Audio
+from .base import TTSError
+from .metrics import MetricsCollector
+from .pool import SynthesisPool
+from .tts import Talkey
+
+DEFAULT_PORT = 8128
+
+# Engine-limits key of say() jobs, so only one plays on the audio device at a time
+AUDIO_DEVICE = 'audio-device'
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        self.server.talkey_daemon._logger.debug(format, *args)  # pylint: disable=W0212
+
+    def _send(self, status, body, content_type='application/json'):
+        if content_type == 'application/json':
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _caller(self):
+        return self.headers.get('X-Talkey-Caller') or str(self.client_address)
+
+    def do_GET(self):
+        self._handle(self.server.talkey_daemon.get_routes)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object')
+        except ValueError as e:
+            self._send(400, {'error': 'Bad request: %s' % e})
+            return
+        self._handle(self.server.talkey_daemon.post_routes, request)
+
+    def _handle(self, routes, *args):
+        route = routes.get(self.path.split('?')[0])
+        if route is None:
+            self._send(404, {'error': 'Unknown path %s' % self.path})
+            return
+        try:
+            self._send(*route(self._caller(), *args))
+        except (KeyError, TypeError, ValueError) as e:
+            self._send(400, {'error': 'Bad request: %s' % e})
+        except Exception as e:  # pylint: disable=W0703
+            self._send(500, {'error': str(e)})
+
+
+class _TCPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+class TalkeyDaemon(object):
+    '''
+    Serves a ``Talkey`` over HTTP on a Unix socket or a local TCP port.
+
+    Requests are queued on a ``talkey.pool.SynthesisPool``, by priority and fairly across clients.
+
+    ``talkey``
+        The ``Talkey`` instance to serve
+    ``address``
+        Path of a Unix socket, or a ``(host, port)`` tuple
+    ``workers``
+        Number of concurrent synthesis jobs, defaults to the number of cores
+    ``engine_limits``
+        Dict of engine SLUG to maximum concurrent synthesis jobs of that engine
+    '''
+
+    def __init__(self, talkey, address, workers=None, engine_limits=None):
+        self._logger = logging.getLogger(__name__)
+        self.talkey = talkey
+        self.address = address
+        self.metrics = MetricsCollector()
+        talkey.instrumentation.add_listener(self.metrics)
+        self.pool = SynthesisPool(workers, dict(engine_limits or {}, **{AUDIO_DEVICE: 1}))
+        self.get_routes = {
+            '/languages': self.languages,
+            '/stats': self.stats,
+            '/metrics': self.prometheus,
+        }
+        self.post_routes = {
+            '/say': self.say,
+            '/synthesize': self.synthesize,
+            '/classify': self.classify,
+        }
+        if isinstance(address, tuple):
+            self.server = _TCPServer(address, _RequestHandler)
+            self.address = self.server.server_address[:2]
+        else:
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = _UnixServer(address, _RequestHandler)
+        self.server.talkey_daemon = self
+        self._thread = None
+
+    def _lang(self, request):
+        return request.get('lang') or self.talkey.classify(request['text'])
+
+    def say(self, caller, request):
+        lang = self._lang(request)
+        job = self.pool.submit(
+            self.talkey.say, request['text'], lang,
+            engine=AUDIO_DEVICE, caller=caller, priority=int(request.get('priority', 0))
+        )
+        if not request.get('wait', True):
+            return 202, {'queued': True}
+        job.result()
+        return 200, {'lang': lang}
+
+    def synthesize(self, caller, request):
+        lang = self._lang(request)
+        eng = self.talkey.get_engine_for_lang(lang, len(request['text']))
+        audio = self.pool.submit(
+            self.talkey.synthesize, request['text'], lang,
+            engine=eng.SLUG, caller=caller, priority=int(request.get('priority', 0))
+        ).result()
+        buf = io.BytesIO()
+        audio.write(buf)
+        return 200, buf.getvalue(), 'audio/wav'
+
+    def classify(self, caller, request):
+        return 200, {'lang': self.talkey.classify(request['text'])}
+
+    def languages(self, caller):
+        return 200, {'languages': sorted(self.talkey.languages)}
+
+    def stats(self, caller):
+        stats = self.pool.stats()
+        stats['callers'] = len(stats['callers'])
+        stats['engines'] = dict((slug, health.stats()) for slug, health in self.talkey.health.items())
+        return 200, stats
+
+    def prometheus(self, caller):
+        return 200, self.metrics.prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+
+    def serve_forever(self):
+        '''
+        Serves requests until ``shutdown()``.
+        '''
+        self._logger.info('Serving on %s', self.address)
+        self.server.serve_forever()
+
+    def start(self):
+        '''
+        Serves requests in a background thread.
+        '''
+        self._thread = threading.Thread(target=self.serve_forever, name='talkey-daemon')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def shutdown(self):
+        '''
+        Stops serving, and waits for queued requests to complete.
+        '''
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self.pool.shutdown()
+        self.talkey.instrumentation.remove_listener(self.metrics)
+        if not isinstance(self.address, tuple) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+class _UnixHTTPConnection(httplib.HTTPConnection):
+
+    def __init__(self, path, timeout=None):
+        httplib.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class TalkeyClient(object):
+    '''
+    Client of a ``TalkeyDaemon``, with the same API as ``Talkey``.
+
+    ``address``
+        Path of the daemon Unix socket, or a ``(host, port)`` tuple
+    ``caller``
+        Identifies this client for fair scheduling, defaults to the process id
+    ``timeout``
+        Seconds to wait for a response, ``None`` for no limit
+    '''
+
+    def __init__(self, address, caller=None, timeout=None):
+        self.address = address
+        self.caller = caller or 'pid-%d' % os.getpid()
+        self.timeout = timeout
+
+    def _connection(self):
+        if isinstance(self.address, tuple):
+            return httplib.HTTPConnection(self.address[0], self.address[1], timeout=self.timeout)
+        return _UnixHTTPConnection(self.address, timeout=self.timeout)
+
+    def _request(self, method, path, request=None):
+        conn = self._connection()
+        try:
+            body = json.dumps(request).encode('utf-8') if request is not None else None
+            headers = {'X-Talkey-Caller': self.caller}
+            if body is not None:
+                headers['Content-Type'] = 'application/json'
+            try:
+                conn.request(method, path, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (IOError, OSError, httplib.HTTPException) as e:
+                raise TTSError('Could not reach talkey daemon at %s: %s' % (self.address, e))
+            if resp.status >= 400:
+                raise TTSError(json.loads(data.decode('utf-8'))['error'])
+            if resp.getheader('Content-Type') == 'application/json':
+                return json.loads(data.decode('utf-8'))
+            return data
+        finally:
+            conn.close()
+
+    @property
+    def languages(self):
+        return set(self._request('GET', '/languages')['languages'])
+
+    def classify(self, txt):
+        '''
+        Classifies text by language.
+        '''
+        return self._request('POST', '/classify', {'text': txt})['lang']
+
+    def say(self, txt, lang=None, priority=0, wait=True):
+        '''
+        Says the text on the daemon audio device.
+
+        Requests of higher ``priority`` are played first.
+        If ``wait`` is false, returns once the request is queued.
+        '''
+        self._request('POST', '/say', {'text': txt, 'lang': lang, 'priority': priority, 'wait': wait})
+
+    def synthesize(self, txt, lang=None, priority=0):
+        '''
+        Renders the text to audio, returns a ``talkey.audio.Audio`` instance.
+        '''
+        data = self._request('POST', '/synthesize', {'text': txt, 'lang': lang, 'priority': priority})
+        return Audio.from_file(io.BytesIO(data))
+
+    def stats(self):
+        '''
+        Returns dict of daemon queue and engine health statistics.
+        '''
+        return self._request('GET', '/stats')
+
+    def metrics(self):
+        '''
+        Returns daemon metrics in the Prometheus text format.
+        '''
+        return self._request('GET', '/metrics').decode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the talkey daemon')
+    parser.add_argument('--socket', help='Serve on this Unix socket path')
+    parser.add_argument('--host', default='127.0.0.1', help='Serve on this host, if no socket is given')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Serve on this port, if no socket is given')
+    parser.add_argument('--config', help='JSON file of Talkey() keyword arguments')
+    parser.add_argument('--workers', type=int, help='Number of concurrent synthesis jobs')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log requests')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    workers = args.workers or config.pop('workers', None)
+    engine_limits = config.pop('engine_limits', None)
+    try:
+        tts = Talkey(**config)
+    except TTSError as e:
+        sys.stderr.write('talkey: %s\n' % e)
+        return 1
+
+    daemon = TalkeyDaemon(tts, args.socket or (args.host, args.port), workers, engine_limits)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+        tts.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
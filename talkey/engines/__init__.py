@@ -6,6 +6,7 @@ from .google import GoogleTTS
 from .mary import MaryTTS
 from .pico import PicoTTS
 from .say import SayTTS
+from .synthetic import SyntheticTTS
 
 _ENGINE_MAP = {
     'dummy': DummyTTS,
@@ -16,6 +17,7 @@ _ENGINE_MAP = {
     'mary': MaryTTS,
     'pico': PicoTTS,
     'say': SayTTS,
+    'synthetic': SyntheticTTS,
 }
 
-_ENGINE_ORDER = ['google', 'mary', 'espeak', 'festival', 'pico', 'flite', 'say', 'dummy']
+_ENGINE_ORDER = ['google', 'mary', 'espeak', 'festival', 'pico', 'flite', 'say', 'dummy', 'synthetic']
@@ -1,5 +1,11 @@
 from talkey.base import AbstractTTSEngine, DETECTABLE_LANGS
 
+# Every detectable language, shared by all instances
+LANGUAGES = dict([
+    (lang, {'default': lang, 'voices': {lang: {}}})
+    for lang in DETECTABLE_LANGS
+])
+
 
 class DummyTTS(AbstractTTSEngine):
     """
@@ -26,10 +32,7 @@ class DummyTTS(AbstractTTSEngine):
         return {}
 
     def _get_languages(self):
-        return dict([
-            (lang, {'default': lang, 'voices': {lang: {}}})
-            for lang in DETECTABLE_LANGS
-        ])
+        return LANGUAGES
 
     def _say(self, phrase, language, voice, voiceinfo, options):
         self._logger.info('%s: %s' % (language, phrase))
@@ -1,7 +1,6 @@
 import os
-import tempfile
-import pipes
 from talkey.base import AbstractTTSEngine, subprocess, register
+from talkey.native import load_espeak
 
 
 @register
@@ -10,9 +9,13 @@ class EspeakTTS(AbstractTTSEngine):
     Uses the eSpeak speech synthesizer.
 
     Requires ``espeak`` and optionally ``mbrola`` to be available.
+
+    With the ``in_process`` option it synthesizes through ``libespeak-ng`` in-process, if the library is found,
+    and runs ``espeak`` otherwise. Both stream audio as it is rendered.
     """
 
     SLUG = "espeak"
+    PROSODY_OPTIONS = {'rate': 'words_per_minute', 'pitch': 'pitch_adjustment'}
     # http://espeak.sourceforge.net/languages.html
     QUALITY_LANGS = [
         'en', 'af', 'bs', 'ca', 'cs', 'da', 'de', 'el', 'eo', 'es',
@@ -45,9 +48,30 @@ class EspeakTTS(AbstractTTSEngine):
                 'description': 'Only allow languages of passable quality, as per http://espeak.sourceforge.net/languages.html',
                 'type': 'bool',
                 'default': True
-            }
+            },
+            'in_process': {
+                'description': 'Synthesize in-process with libespeak-ng, if available',
+                'type': 'bool',
+                'default': False
+            },
+            'library': {
+                'description': 'libespeak-ng library path, found on the library path if not given',
+                'type': 'str',
+                'default': None
+            },
         }
 
+    def __init__(self, **_options):
+        self.library = None
+        super(EspeakTTS, self).__init__(**_options)
+        if self.ioptions['in_process']:
+            self.library = load_espeak(self.ioptions['library'])
+            if self.library is None:
+                self._logger.info('libespeak-ng not available, running espeak')
+
+    def _synthesizes_audio(self):
+        return self.library is not None
+
     def _is_available(self):
         return self.ioptions['espeak'] is not None
 
@@ -86,21 +110,23 @@ class EspeakTTS(AbstractTTSEngine):
                 return voice[:2] + ['-'] + voice[2:]  # pragma: no cover
             return voice
 
+        def parse(output):
+            'Split each row of a voice listing once'
+            return [fix_voice(row.split()) for row in output.split('\n')[1:] if row]
+
         output = subprocess.check_output([self.ioptions['espeak'], '--voices'], universal_newlines=True)
         voices = [
-            ['mbrola' if fix_voice(row.split())[4].startswith('mb') else 'espeak'] + fix_voice(row.split())[:4]
-            for row in output.split('\n')[1:]
-            if row
+            ['mbrola' if fields[4].startswith('mb') else 'espeak'] + fields[:4]
+            for fields in parse(output)
         ]
 
         if self.has_mbrola():
             output = subprocess.check_output([self.ioptions['espeak'], '--voices=mbrola'], universal_newlines=True)
-            mvoices = [fix_voice(row.split())[:5] for row in output.split('\n')[1:] if row]
-            for mvoice in mvoices:
+            for mvoice in parse(output):
                 mbfile = mvoice[4].split('-')[1]
                 mbfile = os.path.join(self.ioptions['mbrola_voices'], mbfile, mbfile)
                 if os.path.isfile(mbfile):
-                    voices.append(['mbrola'] + mvoice)
+                    voices.append(['mbrola'] + mvoice[:5])
 
         langs = set([voice[2].split('-')[0] for voice in voices])
         if self.ioptions['passable_only']:
@@ -109,7 +135,9 @@ class EspeakTTS(AbstractTTSEngine):
         for voice in voices:
             lang = voice[2].split('-')[0]
             if lang in langs:
-                tree[lang]['voices'][voice[4]] = {'gender': voice[3], 'pty': int(voice[1]), 'type': voice[0]}
+                tree[lang]['voices'][voice[4]] = {
+                    'gender': voice[3], 'pty': int(voice[1]), 'type': voice[0], 'locale': voice[2],
+                }
         for lang in langs:
             # Try to find sane default voice, score by pty, then take shortest (for determinism)
             vcs = tree[lang]['voices']
@@ -117,22 +145,35 @@ class EspeakTTS(AbstractTTSEngine):
             tree[lang]['default'] = sorted([k for k, v in vcs.items() if v['pty'] == pty])[0]
         return tree
 
-    def _say(self, phrase, language, voice, voiceinfo, options):
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            fname = f.name
-        vce = voice
+    def _voice(self, voice, voiceinfo, options):
         if voiceinfo['type'] == 'espeak' and options['variant']:
-            vce += '+' + options['variant']
-        cmd = [
+            return voice + '+' + options['variant']
+        return voice
+
+    def _command(self, voice, voiceinfo, options, fname):
+        'The espeak command, writing to fname, or to stdout if None'
+        return [
             self.ioptions['espeak'],
-            '-v', vce,
-            '-p', options['pitch_adjustment'],
-            '-s', options['words_per_minute'],
-            '-w', fname,
-            phrase
-        ]
-        cmd = [str(x) for x in cmd]
-        self._logger.debug('Executing %s', ' '.join([pipes.quote(arg) for arg in cmd]))
-        subprocess.call(cmd)
-        self.play(fname)
-        os.remove(fname)
+            '-v', self._voice(voice, voiceinfo, options),
+            '-p', str(options['pitch_adjustment']),
+            '-s', str(options['words_per_minute']),
+        ] + (['-w', fname] if fname is not None else ['--stdout'])
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        self._call(self._command(voice, voiceinfo, options, fname) + [phrase])
+
+    def _synthesize_audio(self, phrase, language, voice, voiceinfo, options):
+        return self.library.synthesize(
+            phrase, self._voice(voice, voiceinfo, options), options['words_per_minute'], options['pitch_adjustment']
+        )
+
+    def _synthesize_stream(self, phrase, language, voice, voiceinfo, options):
+        if self.library is not None:
+            return self.library.synthesize_stream(
+                phrase, self._voice(voice, voiceinfo, options), options['words_per_minute'],
+                options['pitch_adjustment']
+            )
+        return self._stream_call(self._command(voice, voiceinfo, options, None) + [phrase])
+
+    def _synthesize_ssml(self, markup, language, voice, voiceinfo, options, fname):
+        self._call(self._command(voice, voiceinfo, options, fname) + ['-m', markup])
@@ -1,10 +1,14 @@
-import os
+import re
 import tempfile
 import pipes
 from talkey.base import AbstractTTSEngine, subprocess, register
 from talkey.utils import check_executable
 
 
+# Characters to escape in a Scheme string literal
+_ESCAPE_RE = re.compile(r'(["\\])')
+
+
 @register
 class FestivalTTS(AbstractTTSEngine):
     """
@@ -48,14 +52,9 @@ class FestivalTTS(AbstractTTSEngine):
             'en': {'default': 'en', 'voices': {'en': {}}}
         }
 
-    def _say(self, phrase, language, voice, voiceinfo, options):
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
         cmd = ['festival', '--pipe']
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            fname = f.name
         with tempfile.SpooledTemporaryFile() as in_f:
-            in_f.write(self.SAY_TEMPLATE.format(outfilename=fname, phrase=phrase.replace('\\', '\\\\"').replace('"', '\\"')).encode('utf-8'))
+            in_f.write(self.SAY_TEMPLATE.format(outfilename=fname, phrase=_ESCAPE_RE.sub(r'\\\1', phrase)).encode('utf-8'))
             in_f.seek(0)
-            self._logger.debug('Executing %s', ' '.join([pipes.quote(arg) for arg in cmd]))
-            subprocess.call(cmd, stdin=in_f)
-        self.play(fname)
-        os.remove(fname)
+            self._call(cmd, stdin=in_f)
@@ -1,8 +1,6 @@
-import os
-import tempfile
-import pipes
 from talkey.base import AbstractTTSEngine, subprocess, register
 from talkey.utils import check_executable
+from talkey.native import load_flite
 
 
 @register
@@ -11,6 +9,9 @@ class FliteTTS(AbstractTTSEngine):
     Uses the flite speech synthesizer.
 
     Requires ``flite`` to be available.
+
+    With the ``in_process`` option it synthesizes through ``libflite`` in-process, if the library is found,
+    and runs ``flite`` otherwise.
     """
 
     SLUG = 'flite'
@@ -23,8 +24,29 @@ class FliteTTS(AbstractTTSEngine):
                 'type': 'str',
                 'default': 'flite'
             },
+            'in_process': {
+                'description': 'Synthesize in-process with libflite, if available',
+                'type': 'bool',
+                'default': False
+            },
+            'library': {
+                'description': 'libflite library path, found on the library path if not given',
+                'type': 'str',
+                'default': None
+            },
         }
 
+    def __init__(self, **_options):
+        self.library = None
+        super(FliteTTS, self).__init__(**_options)
+        if self.ioptions['in_process']:
+            self.library = load_flite(self.ioptions['library'])
+            if self.library is None:
+                self._logger.info('libflite not available, running flite')
+
+    def _synthesizes_audio(self):
+        return self.library is not None
+
     def _is_available(self):
         return check_executable(self.ioptions['flite'])
 
@@ -41,16 +63,14 @@ class FliteTTS(AbstractTTSEngine):
             }
         }
 
-    def _say(self, phrase, language, voice, voiceinfo, options):
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
         cmd = [
             'flite',
             '-voice', voice,
-            '-t', phrase
+            '-t', phrase,
+            fname
         ]
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            fname = f.name
-        cmd.append(fname)
-        self._logger.debug('Executing %s', ' '.join([pipes.quote(arg) for arg in cmd]))
-        subprocess.call(cmd)
-        self.play(fname)
-        os.remove(fname)
+        self._call(cmd)
+
+    def _synthesize_audio(self, phrase, language, voice, voiceinfo, options):
+        return self.library.synthesize(phrase, voice)
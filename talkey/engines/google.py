@@ -1,13 +1,13 @@
-import os
-import tempfile
+import threading
+from io import BytesIO
 
 try:
     import gtts
 except ImportError:  # pragma: no cover
     pass
 
-from talkey.base import AbstractTTSEngine, register
-from talkey.utils import check_network_connection, check_python_import
+from talkey.base import AbstractTTSEngine, TTSError, register
+from talkey.utils import check_network_connection, check_python_import, PROBER
 
 
 @register
@@ -19,6 +19,7 @@ class GoogleTTS(AbstractTTSEngine):
     """
 
     SLUG = "google"
+    AUDIO_SUFFIX = '.mp3'
 
     @classmethod
     def _get_init_options(cls):
@@ -28,13 +29,19 @@ class GoogleTTS(AbstractTTSEngine):
                 'type': 'bool',
                 'default': False,
             },
+            'background_probe': {
+                'description': 'Check availability in the background, instead of blocking on a network check',
+                'type': 'bool',
+                'default': True,
+            },
         }
 
     def _is_available(self):
-        return (
-            check_python_import('gtts')
-            and check_network_connection('translate.google.com', 80)
-        )
+        if not check_python_import('gtts'):
+            return False  # pragma: no cover
+        if self.ioptions['background_probe']:
+            return PROBER.check('translate.google.com', 80, self._availability_changed)
+        return check_network_connection('translate.google.com', 80)
 
     def _get_options(self):
         return {}
@@ -48,10 +55,29 @@ class GoogleTTS(AbstractTTSEngine):
             langs[lang]['voices'][voice] = {}
         return langs
 
-    def _say(self, phrase, language, voice, voiceinfo, options):
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
         tts = gtts.gTTS(text=phrase, lang=voice)
-        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as f:
-            tmpfile = f.name
-        tts.save(tmpfile)
-        self.play(tmpfile, translate=True)
-        os.remove(tmpfile)
+        if not self.ioptions['timeout']:
+            tts.save(fname)
+            return
+
+        # gTTS has no deadline of its own, so fetch in a thread and abandon it on timeout
+        buf = BytesIO()
+        errors = []
+
+        def fetch():
+            try:
+                tts.write_to_fp(buf)
+            except Exception as e:  # pylint: disable=W0703
+                errors.append(e)
+
+        thread = threading.Thread(target=fetch)
+        thread.daemon = True
+        thread.start()
+        thread.join(self.ioptions['timeout'])
+        if thread.is_alive():
+            raise TTSError('Timed out after %ss: google' % self.ioptions['timeout'])
+        if errors:
+            raise TTSError('Google TTS failed: %s' % errors[0])
+        with open(fname, 'wb') as f:
+            f.write(buf.getvalue())
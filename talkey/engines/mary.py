@@ -1,5 +1,3 @@
-import os
-import tempfile
 import requests
 
 try:
@@ -10,8 +8,9 @@ except ImportError:
     # pylint: disable=E0611
     from urllib.parse import urlunsplit, urlencode
 
-from talkey.base import AbstractTTSEngine, register
-from talkey.utils import check_network_connection
+from talkey.audio import read_wav_stream
+from talkey.base import AbstractTTSEngine, TTSError, register
+from talkey.utils import check_network_connection, PROBER
 
 
 @register
@@ -34,6 +33,11 @@ class MaryTTS(AbstractTTSEngine):
                 'type': 'bool',
                 'default': False,
             },
+            'background_probe': {
+                'description': 'Check availability in the background, instead of blocking on a network check',
+                'type': 'bool',
+                'default': True,
+            },
             'scheme': {
                 'description': 'HTTP schema',
                 'type': 'enum',
@@ -60,6 +64,8 @@ class MaryTTS(AbstractTTSEngine):
         return urlunsplit(urlparts)
 
     def _is_available(self):
+        if self.ioptions['background_probe']:
+            return PROBER.check(self.ioptions['host'], self.ioptions['port'], self._availability_changed)
         return check_network_connection(self.ioptions['host'], self.ioptions['port'])
 
     def _get_options(self):
@@ -77,17 +83,35 @@ class MaryTTS(AbstractTTSEngine):
             }
         return langs
 
-    def _say(self, phrase, language, voice, voiceinfo, options):
+    def _request(self, text, input_type, voice, voiceinfo, stream=False):
         query = {'OUTPUT_TYPE': 'AUDIO',
                  'AUDIO': 'WAVE_FILE',
-                 'INPUT_TYPE': 'TEXT',
-                 'INPUT_TEXT': phrase,
+                 'INPUT_TYPE': input_type,
+                 'INPUT_TEXT': text,
                  'LOCALE': voiceinfo['locale'],
                  'VOICE': voice}
 
-        res = requests.get(self._makeurl('/process', query=query), timeout=5)
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+        return requests.get(self._makeurl('/process', query=query), timeout=self.ioptions['timeout'] or 5, stream=stream)
+
+    def _process(self, text, input_type, voice, voiceinfo, fname):
+        res = self._request(text, input_type, voice, voiceinfo)
+        with open(fname, 'wb') as f:
             f.write(res.content)
-            tmpfile = f.name
-        self.play(tmpfile)
-        os.remove(tmpfile)
+
+    def _synthesize_stream(self, phrase, language, voice, voiceinfo, options):
+        res = self._request(phrase, 'TEXT', voice, voiceinfo, stream=True)
+        try:
+            for chunk in read_wav_stream(res.raw):
+                yield chunk
+        except ValueError as e:
+            raise TTSError('Could not decode mary output: %s' % e)
+        finally:
+            res.close()
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        self._process(phrase, 'TEXT', voice, voiceinfo, fname)
+
+    def _synthesize_ssml(self, markup, language, voice, voiceinfo, options, fname):
+        # MaryTTS wants the locale on the root element
+        locale = voiceinfo['locale'].replace('_', '-')
+        self._process(markup.replace('<speak ', '<speak xml:lang="%s" ' % locale, 1), 'SSML', voice, voiceinfo, fname)
@@ -1,7 +1,6 @@
 import os
 import re
 import tempfile
-import pipes
 from talkey.base import AbstractTTSEngine, subprocess, register
 from talkey.utils import check_executable
 
@@ -45,14 +44,9 @@ class PicoTTS(AbstractTTSEngine):
         for voice in voices:
             lang = voice[:2]
             langs.setdefault(lang, {'default': voice, 'voices': {}})
-            langs[lang]['voices'][voice] = {}
+            langs[lang]['voices'][voice] = {'locale': voice}
         return langs
 
-    def _say(self, phrase, language, voice, voiceinfo, options):
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            fname = f.name
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
         cmd = ['pico2wave', '-l', voice, '-w', fname, phrase]
-        self._logger.debug('Executing %s', ' '.join([pipes.quote(arg) for arg in cmd]))
-        subprocess.call(cmd)
-        self.play(fname)
-        os.remove(fname)
+        self._call(cmd)
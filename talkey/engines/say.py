@@ -1,5 +1,4 @@
 import platform
-import pipes
 from talkey.base import AbstractTTSEngine, subprocess, register
 
 
@@ -47,7 +46,7 @@ class SayTTS(AbstractTTSEngine):
                 langs[voice[1][:2]] = {
                     'default': voice[0],
                     'voices': { } }
-            langs[voice[1][:2]]['voices'][voice[0]] = {}
+            langs[voice[1][:2]]['voices'][voice[0]] = {'locale': voice[1]}
         return langs
 
     def _say(self, phrase, language, voice, voiceinfo, options):
@@ -55,5 +54,4 @@ class SayTTS(AbstractTTSEngine):
             'say',
             phrase
         ]
-        self._logger.debug('Executing %s', ' '.join([pipes.quote(arg) for arg in cmd]))
-        subprocess.call(cmd)
+        self._call(cmd)
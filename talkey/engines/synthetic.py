@@ -0,0 +1,112 @@
+import math
+import time
+import random
+import struct
+import threading
+
+from talkey.audio import Audio
+from talkey.base import AbstractTTSEngine, TTSError, register
+from talkey.engines.dummy import LANGUAGES
+
+
+@register
+class SyntheticTTS(AbstractTTSEngine):
+    """
+    Deterministic synthetic engine for load testing, renders a tone of a length proportional to the phrase.
+    Streams it in tenth of a second chunks, with the latency spread over them.
+
+    Needs no audio hardware, use it with a ``talkey.sinks`` sink.
+    """
+
+    SLUG = 'synthetic'
+
+    @classmethod
+    def _get_init_options(cls):
+        return {
+            'enabled': {
+                'description': 'Is enabled?',
+                'type': 'bool',
+                'default': False,
+            },
+            'latency': {
+                'description': 'Seconds each synthesis takes',
+                'type': 'float',
+                'default': 0.0,
+                'min': 0.0,
+            },
+            'seconds_per_char': {
+                'description': 'Seconds of audio rendered per character',
+                'type': 'float',
+                'default': 0.06,
+                'min': 0.0,
+            },
+            'framerate': {
+                'description': 'Sample rate of rendered audio',
+                'type': 'int',
+                'default': 16000,
+                'min': 1000,
+            },
+            'failure_rate': {
+                'description': 'Fraction of syntheses that fail',
+                'type': 'float',
+                'default': 0.0,
+                'min': 0.0,
+                'max': 1.0,
+            },
+            'seed': {
+                'description': 'Random seed for failures',
+                'type': 'int',
+                'default': 0,
+            },
+        }
+
+    def __init__(self, **_options):
+        super(SyntheticTTS, self).__init__(**_options)
+        self._random = random.Random(self.ioptions['seed'])
+        self._random_lock = threading.Lock()
+        # A second of 440Hz tone, utterances are sliced from it
+        rate = self.ioptions['framerate']
+        self._tone = struct.pack('<%dh' % rate, *[
+            int(8000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(rate)
+        ])
+
+    def sound_available(self):
+        return True
+
+    def _is_available(self):
+        return True
+
+    def _get_options(self):
+        return {}
+
+    def _get_languages(self):
+        return LANGUAGES
+
+    def _fail(self):
+        if self.ioptions['failure_rate']:
+            with self._random_lock:
+                failed = self._random.random() < self.ioptions['failure_rate']
+            if failed:
+                raise TTSError('Synthetic failure')
+
+    def _frames(self, phrase):
+        nframes = int(len(phrase) * self.ioptions['seconds_per_char'] * self.ioptions['framerate'])
+        seconds, rest = divmod(nframes * 2, len(self._tone))
+        return self._tone * seconds + self._tone[:rest]
+
+    def _synthesize_audio(self, phrase, language, voice, voiceinfo, options):
+        if self.ioptions['latency']:
+            time.sleep(self.ioptions['latency'])
+        self._fail()
+        return Audio(self._frames(phrase), 1, 2, self.ioptions['framerate'])
+
+    def _synthesize_stream(self, phrase, language, voice, voiceinfo, options):
+        # Tenth of a second chunks, with the latency spread over them
+        self._fail()
+        frames = self._frames(phrase)
+        size = self.ioptions['framerate'] // 10 * 2
+        positions = range(0, len(frames), size)
+        for pos in positions:
+            if self.ioptions['latency']:
+                time.sleep(self.ioptions['latency'] / len(positions))
+            yield Audio(frames[pos:pos + size], 1, 2, self.ioptions['framerate'])
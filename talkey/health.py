@@ -0,0 +1,168 @@
+'''
+Runtime health tracking of engines.
+'''
+import time
+import threading
+from collections import deque
+
+HEALTH_OPTIONS = {
+    'failure_threshold': {
+        'description': 'Consecutive failures that trip the circuit breaker',
+        'type': 'int',
+        'default': 3,
+        'min': 1,
+    },
+    'slow_threshold': {
+        'description': 'Synthesis latency EWMA (seconds) that trips the circuit breaker, 0 for none',
+        'type': 'float',
+        'default': 0.0,
+        'min': 0.0,
+    },
+    'reset_timeout': {
+        'description': 'Seconds before a tripped engine is tried again',
+        'type': 'float',
+        'default': 30.0,
+        'min': 0.0,
+    },
+    'probe_interval': {
+        'description': 'Seconds between background availability probes of tripped engines, 0 for none',
+        'type': 'float',
+        'default': 0.0,
+        'min': 0.0,
+    },
+    'latency_window': {
+        'description': 'Number of latency samples kept per phrase length bucket, for percentiles',
+        'type': 'int',
+        'default': 100,
+        'min': 1,
+    },
+    'smoothing': {
+        'description': 'Weight of the newest sample in the error rate and latency EWMAs',
+        'type': 'float',
+        'default': 0.2,
+        'min': 0.0,
+        'max': 1.0,
+    },
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class EngineHealth(object):
+    '''
+    Tracks error rate and latency of an engine, with a circuit breaker.
+
+    The breaker is ``closed`` while the engine is healthy.
+    It trips ``open`` after ``failure_threshold`` consecutive failures (or when the latency EWMA
+    exceeds ``slow_threshold``), and is ``half-open`` once ``reset_timeout`` passed (or a probe
+    succeeded), where the next success closes it, and the next failure trips it again.
+
+    :options: A processed set of ``HEALTH_OPTIONS``
+    '''
+
+    def __init__(self, options):
+        self.options = options
+        self.state = CLOSED
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.error_rate = 0.0
+        self.latency = None
+        self.opened_at = None
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def _ewma(self, current, sample):
+        if current is None:
+            return sample
+        alpha = self.options['smoothing']
+        return (1.0 - alpha) * current + alpha * sample
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = time.time()
+
+    def record_success(self):
+        with self._lock:
+            self.requests += 1
+            self.consecutive_failures = 0
+            self.error_rate = self._ewma(self.error_rate, 0.0)
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.error_rate = self._ewma(self.error_rate, 1.0)
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.options['failure_threshold']:
+                self._trip()
+
+    def record_latency(self, seconds, length=0):
+        '''
+        Records the time taken to synthesize a phrase of ``length`` characters.
+        '''
+        with self._lock:
+            self.latency = self._ewma(self.latency, seconds)
+            self._samples.setdefault(self._bucket(length), deque(maxlen=self.options['latency_window'])).append(seconds)
+            slow = self.options['slow_threshold']
+            if slow and self.latency > slow and self.state != OPEN:
+                self._trip()
+
+    @staticmethod
+    def _bucket(length):
+        'Phrase lengths are bucketed by powers of two'
+        return int(length).bit_length()
+
+    def percentile(self, pct, length=None):
+        '''
+        Returns the ``pct`` percentile of synthesis latency for phrases of about ``length`` characters,
+        or None if not measured.
+        Falls back to the nearest measured length bucket.
+        '''
+        with self._lock:
+            if not self._samples:
+                return None
+            bucket = self._bucket(length or 0)
+            if length is None:
+                samples = [val for vals in self._samples.values() for val in vals]
+            else:
+                samples = self._samples[min(self._samples.keys(), key=lambda key: abs(key - bucket))]
+            samples = sorted(samples)
+        idx = int(round(pct / 100.0 * (len(samples) - 1)))
+        return samples[idx]
+
+    def reset(self):
+        '''
+        Moves a tripped breaker to ``half-open``, e.g. after a successful probe.
+        '''
+        with self._lock:
+            if self.state == OPEN:
+                self.state = HALF_OPEN
+                # Let the latency be re-established
+                self.latency = None
+
+    def allow(self):
+        '''
+        Boolean on if requests should be sent to the engine.
+        '''
+        if self.state == OPEN and time.time() - self.opened_at >= self.options['reset_timeout']:
+            self.reset()
+        return self.state != OPEN
+
+    def stats(self):
+        '''
+        Returns dict of health metrics.
+        '''
+        return {
+            'state': self.state,
+            'requests': self.requests,
+            'failures': self.failures,
+            'error_rate': self.error_rate,
+            'latency': self.latency,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+        }
@@ -0,0 +1,187 @@
+'''
+Instrumentation of the synthesis pipeline.
+'''
+import time
+import socket
+import threading
+from collections import namedtuple
+
+Event = namedtuple('Event', ['kind', 'name', 'value', 'tags'])
+'''
+A metric event.
+
+:kind: ``timing`` (value in seconds) or ``count``
+:name: The stage or counter name, e.g. ``synthesize`` or ``cache_hit``
+:value: The measurement
+:tags: Dict of tags, e.g. ``{'engine': 'espeak'}``
+'''
+
+
+class _NullTimer(object):
+    'Shared no-op timer, so disabled instrumentation costs next to nothing'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+
+    def __init__(self, instrumentation, name, tags):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.tags = tags
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        tags = self.tags
+        if exc_type is not None:
+            tags = dict(tags, error=exc_type.__name__)
+            self.instrumentation.count('error', stage=self.name, **self.tags)
+        self.instrumentation.emit(Event('timing', self.name, time.time() - self.start, tags))
+        return False
+
+
+class Instrumentation(object):
+    '''
+    Records per-stage timings, byte counts, cache hits and errors, and passes them to listeners.
+    Without listeners it is disabled, and does no work.
+
+    Stages timed are: ``classify``, ``configure``, ``spawn``, ``subprocess`` (child process wall time),
+    ``synthesize``, ``first_audio`` (of streamed renders), ``decode``, ``postprocess``, ``play`` and
+    ``queue_latency`` (of scheduled announcements).
+    Counters are: ``bytes``, ``cache_hit``, ``cache_miss``, ``error``, and ``expired``, ``superseded`` and
+    ``preempted`` announcements.
+    '''
+
+    def __init__(self):
+        self.listeners = []
+
+    @property
+    def enabled(self):
+        return bool(self.listeners)
+
+    def add_listener(self, listener):
+        '''
+        Registers ``listener(event)`` to receive every ``Event``.
+        '''
+        # Copy-on-write, so listeners can be changed while events are emitted
+        self.listeners = self.listeners + [listener]
+
+    def remove_listener(self, listener):
+        listeners = list(self.listeners)
+        listeners.remove(listener)
+        self.listeners = listeners
+
+    def emit(self, event):
+        for listener in self.listeners:
+            listener(event)
+
+    def timer(self, name, **tags):
+        '''
+        Returns a context manager that times the enclosed stage.
+        '''
+        if not self.listeners:
+            return _NULL_TIMER
+        return _Timer(self, name, tags)
+
+    def count(self, name, value=1, **tags):
+        '''
+        Records a counter increment.
+        '''
+        if self.listeners:
+            self.emit(Event('count', name, value, tags))
+
+
+def _tagstr(tags, fmt, sep):
+    return sep.join(fmt % (key, tags[key]) for key in sorted(tags.keys()))
+
+
+class MetricsCollector(object):
+    '''
+    Listener that aggregates events in memory, and renders them in Prometheus text or StatsD format.
+
+    ``prefix``
+        Prefix of metric names
+    '''
+
+    def __init__(self, prefix='talkey'):
+        self.prefix = prefix
+        self.counters = {}
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        key = (event.name, tuple(sorted(event.tags.items())))
+        with self._lock:
+            if event.kind == 'count':
+                self.counters[key] = self.counters.get(key, 0) + event.value
+            else:
+                count, total, peak = self.timings.get(key, (0, 0.0, 0.0))
+                self.timings[key] = (count + 1, total + event.value, max(peak, event.value))
+
+    def prometheus(self):
+        '''
+        Returns the metrics in the Prometheus text exposition format.
+        '''
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            timings = sorted(self.timings.items())
+        for (name, tags), value in counters:
+            tagstr = _tagstr(dict(tags), '%s="%s"', ',')
+            lines.append('%s_%s_total{%s} %s' % (self.prefix, name, tagstr, value))
+        for (name, tags), (count, total, peak) in timings:
+            tagstr = _tagstr(dict(tags), '%s="%s"', ',')
+            lines.append('%s_%s_seconds_count{%s} %d' % (self.prefix, name, tagstr, count))
+            lines.append('%s_%s_seconds_sum{%s} %f' % (self.prefix, name, tagstr, total))
+            lines.append('%s_%s_seconds_max{%s} %f' % (self.prefix, name, tagstr, peak))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+def statsd_line(event, prefix='talkey'):
+    '''
+    Formats an event as a StatsD line, with DogStatsD-style tags.
+    '''
+    line = '%s.%s:%s|%s' % (
+        prefix, event.name,
+        ('%d' % round(event.value * 1000)) if event.kind == 'timing' else event.value,
+        'ms' if event.kind == 'timing' else 'c'
+    )
+    if event.tags:
+        line += '|#' + _tagstr(event.tags, '%s:%s', ',')
+    return line
+
+
+class StatsDExporter(object):
+    '''
+    Listener that sends events to a StatsD server over UDP.
+    '''
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='talkey'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, event):
+        try:
+            self._sock.sendto(statsd_line(event, self.prefix).encode('utf-8'), self.address)
+        except (IOError, OSError):  # pragma: no cover
+            pass
+
+    def close(self):
+        self._sock.close()
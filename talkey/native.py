@@ -0,0 +1,254 @@
+'''
+ctypes bindings to speech synthesis libraries, for engines that synthesize in-process.
+
+Libraries are loaded once per process, and keep their loaded voices across calls.
+They are not thread-safe, so each serializes its syntheses.
+'''
+import ctypes
+import ctypes.util
+import logging
+import os
+import threading
+
+try:
+    import queue
+except ImportError:  # pragma: no cover
+    import Queue as queue
+
+from talkey.audio import Audio
+from talkey.base import TTSError
+
+_LOCK = threading.Lock()
+_LIBRARIES = {}
+
+
+def _load(cls, path, names):
+    'Returns the shared instance of a library binding, or None if the library can not be loaded'
+    with _LOCK:
+        if path is None:
+            for name in names:
+                path = ctypes.util.find_library(name)
+                if path is not None:
+                    break
+            else:
+                return None
+        key = (cls, path)
+        if key not in _LIBRARIES:
+            try:
+                _LIBRARIES[key] = cls(path)
+            except (OSError, AttributeError) as e:
+                logging.getLogger(__name__).warning('Could not load %s: %s', path, e)
+                _LIBRARIES[key] = None
+        return _LIBRARIES[key]
+
+
+_SYNTH_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+
+
+class EspeakLibrary(object):
+    '''
+    Binding to ``libespeak-ng`` (or ``libespeak``), synthesizing to memory.
+
+    :path: The library file
+    '''
+    AUDIO_OUTPUT_SYNCHRONOUS = 2
+    POS_CHARACTER = 1
+    CHARS_UTF8 = 1
+    RATE = 1
+    PITCH = 3
+
+    def __init__(self, path):
+        lib = ctypes.CDLL(path)
+        lib.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        lib.espeak_Initialize.restype = ctypes.c_int
+        lib.espeak_SetSynthCallback.argtypes = [_SYNTH_CALLBACK]
+        lib.espeak_SetSynthCallback.restype = None
+        lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+        lib.espeak_SetVoiceByName.restype = ctypes.c_int
+        lib.espeak_SetParameter.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        lib.espeak_SetParameter.restype = ctypes.c_int
+        lib.espeak_Synth.argtypes = [
+            ctypes.c_char_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int, ctypes.c_uint, ctypes.c_uint,
+            ctypes.c_void_p, ctypes.c_void_p,
+        ]
+        lib.espeak_Synth.restype = ctypes.c_int
+        self.framerate = lib.espeak_Initialize(self.AUDIO_OUTPUT_SYNCHRONOUS, 0, None, 0)
+        if self.framerate <= 0:
+            raise OSError('espeak_Initialize failed')
+        self.path = path
+        self.lock = threading.Lock()
+        self._lib = lib
+        self._voice = None
+        self._on_chunk = None
+        # Kept referenced for as long as the library may call it
+        self._callback = _SYNTH_CALLBACK(self._on_audio)
+        lib.espeak_SetSynthCallback(self._callback)
+
+    def _on_audio(self, wav, numsamples, events):  # pylint: disable=W0613
+        if wav and numsamples > 0:
+            # Non-zero aborts the synthesis
+            return 1 if self._on_chunk(ctypes.string_at(wav, numsamples * 2)) else 0
+        return 0
+
+    def _synth(self, text, voice, rate, pitch, on_chunk):
+        'Synthesizes, calling ``on_chunk(frames)`` for each chunk as rendered, which returns True to abort'
+        data = text.encode('utf-8')
+        with self.lock:
+            if voice != self._voice:
+                if self._lib.espeak_SetVoiceByName(voice.encode('utf-8')):
+                    raise TTSError('Could not load espeak voice: %s' % voice)
+                self._voice = voice
+            self._lib.espeak_SetParameter(self.RATE, rate, 0)
+            self._lib.espeak_SetParameter(self.PITCH, pitch, 0)
+            self._on_chunk = on_chunk
+            try:
+                status = self._lib.espeak_Synth(
+                    data, len(data) + 1, 0, self.POS_CHARACTER, 0, self.CHARS_UTF8, None, None
+                )
+            finally:
+                self._on_chunk = None
+        if status:
+            raise TTSError('espeak_Synth failed with status %d' % status)
+
+    def synthesize(self, text, voice, rate, pitch):
+        '''
+        Renders text, returns a ``talkey.audio.Audio`` instance.
+
+        :voice: Voice name, as listed by ``espeak --voices``, optionally with a ``+variant``
+        :rate: Words per minute
+        :pitch: Pitch adjustment, 0 to 99
+        '''
+        chunks = []
+        self._synth(text, voice, rate, pitch, lambda frames: chunks.append(frames))
+        return Audio(b''.join(chunks), 1, 2, self.framerate)
+
+    def synthesize_stream(self, text, voice, rate, pitch):
+        '''
+        Renders text, yielding ``talkey.audio.Audio`` chunks as the library renders them.
+        Synthesis is aborted if the chunks are not consumed to the end.
+        '''
+        chunks = queue.Queue()
+        aborted = threading.Event()
+
+        def run():
+            try:
+                self._synth(text, voice, rate, pitch, lambda frames: chunks.put(frames) or aborted.is_set())
+                chunks.put(None)
+            except Exception as e:  # pylint: disable=W0703
+                chunks.put(e)
+
+        thread = threading.Thread(target=run, name='talkey-espeak')
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield Audio(item, 1, 2, self.framerate)
+        finally:
+            aborted.set()
+
+
+def load_espeak(path=None):
+    '''
+    Returns the shared ``EspeakLibrary``, or None if not available.
+
+    :path: The library file, found on the library path if None
+    '''
+    return _load(EspeakLibrary, path, ['espeak-ng', 'espeak'])
+
+
+class _CstWave(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_char_p),
+        ('sample_rate', ctypes.c_int),
+        ('num_samples', ctypes.c_int),
+        ('num_channels', ctypes.c_int),
+        ('samples', ctypes.POINTER(ctypes.c_short)),
+    ]
+
+
+class FliteLibrary(object):
+    '''
+    Binding to ``libflite``, with voices loaded from their ``libflite_cmu_*`` libraries on first use.
+
+    :path: The library file
+    '''
+
+    def __init__(self, path):
+        # Voice libraries resolve their symbols against it
+        lib = ctypes.CDLL(path, mode=ctypes.RTLD_GLOBAL)
+        lib.flite_init.restype = ctypes.c_int
+        lib.flite_text_to_wave.argtypes = [ctypes.c_char_p, ctypes.c_void_p]
+        lib.flite_text_to_wave.restype = ctypes.POINTER(_CstWave)
+        lib.delete_wave.argtypes = [ctypes.POINTER(_CstWave)]
+        lib.delete_wave.restype = None
+        lib.flite_init()
+        self.path = path
+        self.lock = threading.Lock()
+        self._lib = lib
+        self._voices = {}
+
+    @staticmethod
+    def voice_name(voice):
+        'Returns the library name of a voice as listed by ``flite -lv``, e.g. ``cmu_us_kal`` for ``kal``'
+        if voice.endswith('_time'):
+            return 'cmu_time_' + voice[:-5]
+        return 'cmu_us_' + voice
+
+    def _load_voice(self, voice):
+        name = self.voice_name(voice)
+        # Voice libraries are installed alongside libflite
+        dirname, basename = os.path.split(self.path)
+        paths = [ctypes.util.find_library('flite_' + name), os.path.join(dirname, basename.replace(
+            'libflite', 'libflite_' + name, 1
+        ))]
+        register, errors = None, []
+        for path in paths:
+            if path is None:
+                continue
+            try:
+                register = getattr(ctypes.CDLL(path, mode=ctypes.RTLD_GLOBAL), 'register_' + name)
+                break
+            except (OSError, AttributeError) as e:
+                errors.append(str(e))
+        if register is None:
+            raise TTSError('Could not load flite voice %s: %s' % (voice, '; '.join(errors)))
+        register.argtypes = [ctypes.c_char_p]
+        register.restype = ctypes.c_void_p
+        handle = register(None)
+        if not handle:
+            raise TTSError('Could not register flite voice: %s' % voice)
+        return handle
+
+    def synthesize(self, text, voice):
+        '''
+        Renders text, returns a ``talkey.audio.Audio`` instance.
+
+        :voice: Voice name, as listed by ``flite -lv``
+        '''
+        with self.lock:
+            handle = self._voices.get(voice)
+            if handle is None:
+                handle = self._voices[voice] = self._load_voice(voice)
+            wave = self._lib.flite_text_to_wave(text.encode('utf-8'), handle)
+            if not wave:
+                raise TTSError('flite_text_to_wave failed')
+            try:
+                contents = wave.contents
+                frames = ctypes.string_at(contents.samples, contents.num_samples * contents.num_channels * 2)
+                return Audio(frames, contents.num_channels, 2, contents.sample_rate)
+            finally:
+                self._lib.delete_wave(wave)
+
+
+def load_flite(path=None):
+    '''
+    Returns the shared ``FliteLibrary``, or None if not available.
+
+    :path: The library file, found on the library path if None
+    '''
+    return _load(FliteLibrary, path, ['flite'])
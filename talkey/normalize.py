@@ -0,0 +1,147 @@
+'''
+Text normalization ahead of language classification and synthesis.
+'''
+import re
+import threading
+from collections import OrderedDict
+
+ONES = [
+    'zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten',
+    'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen',
+]
+TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']
+SCALES = [(10 ** 9, 'billion'), (10 ** 6, 'million'), (1000, 'thousand'), (100, 'hundred')]
+
+
+def english_number(num):
+    '''
+    Spells out a non-negative integer in English words.
+    '''
+    if num < 20:
+        return ONES[num]
+    if num < 100:
+        return TENS[num // 10] + ('-' + ONES[num % 10] if num % 10 else '')
+    for scale, name in SCALES:
+        if num >= scale:
+            words = english_number(num // scale) + ' ' + name
+            if num % scale:
+                words += (' and ' if num % scale < 100 else ' ') + english_number(num % scale)
+            return words
+
+
+def _english_numbers(match):
+    whole, fraction = match.group(1).replace(',', ''), match.group(2)
+    if len(whole) > 12:
+        words = ' '.join(ONES[int(digit)] for digit in whole)
+    else:
+        words = english_number(int(whole))
+    if fraction:
+        words += ' point ' + ' '.join(ONES[int(digit)] for digit in fraction)
+    return words
+
+
+ENGLISH_ABBREVIATIONS = {
+    'dr.': 'doctor',
+    'mr.': 'mister',
+    'mrs.': 'missus',
+    'st.': 'street',
+    'rd.': 'road',
+    'ave.': 'avenue',
+    'etc.': 'et cetera',
+    'e.g.': 'for example',
+    'i.e.': 'that is',
+    'vs.': 'versus',
+    'approx.': 'approximately',
+}
+
+ENGLISH_RULES = [
+    (r'\s*&\s*', ' and '),
+    (r'(?<=\d)\s*%', ' percent'),
+    (r'\$\s*(\d[\d,]*(?:\.\d+)?)', r'\1 dollars'),
+    (r'(?<![\w.])(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+))?(?!\w|[.,]\d)', _english_numbers),
+]
+
+
+class Normalizer(object):
+    '''
+    Per-language text normalization by precompiled regular expression rules and abbreviation tables,
+    memoized in an LRU cache.
+
+    Whitespace is always collapsed. By default English abbreviations, symbols and numbers are spelled out.
+    Rules for all languages run first, then those of the language.
+
+    ``defaults``
+        Install the default rules
+    ``cache_size``
+        Number of normalized texts kept
+    '''
+
+    def __init__(self, defaults=True, cache_size=1024):
+        self.cache_size = cache_size
+        self._rules = {}
+        self._abbreviations = {}
+        self._abbreviation_res = {}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        if defaults:
+            self.add_abbreviations(ENGLISH_ABBREVIATIONS, 'en')
+            for pattern, replacement in ENGLISH_RULES:
+                self.add_rule(pattern, replacement, 'en')
+
+    def add_rule(self, pattern, replacement, lang=None):
+        '''
+        Adds a substitution rule.
+
+        :pattern: A regular expression
+        :replacement: The replacement, as for ``re.sub()``, a string or function of the match
+        :lang: The language the rule is for, or None for all languages
+        '''
+        with self._lock:
+            self._rules.setdefault(lang, []).append((re.compile(pattern, re.UNICODE), replacement))
+            self._memo.clear()
+
+    def add_abbreviations(self, abbreviations, lang=None):
+        '''
+        Adds a table of abbreviations to expand, matched as whole words ignoring case.
+
+        :abbreviations: Dict of abbreviation to expansion
+        :lang: The language the abbreviations are for, or None for all languages
+        '''
+        with self._lock:
+            table = self._abbreviations.setdefault(lang, {})
+            table.update(dict((abbr.lower(), expansion) for abbr, expansion in abbreviations.items()))
+            # A single alternation, longest first, so each text is scanned once
+            self._abbreviation_res[lang] = re.compile(
+                r'(?<!\w)(%s)(?!\w)' % '|'.join(re.escape(abbr) for abbr in sorted(table, key=len, reverse=True)),
+                re.IGNORECASE | re.UNICODE
+            )
+            self._memo.clear()
+
+    def _apply(self, text, lang):
+        regex = self._abbreviation_res.get(lang)
+        if regex is not None:
+            table = self._abbreviations[lang]
+            text = regex.sub(lambda match: table[match.group(1).lower()], text)
+        for regex, replacement in self._rules.get(lang, []):
+            text = regex.sub(replacement, text)
+        return text
+
+    def normalize(self, text, lang=None):
+        '''
+        Returns the normalized text, by the rules for all languages, and then those of ``lang`` if given.
+        '''
+        key = (text, lang)
+        with self._lock:
+            normalized = self._memo.pop(key, None)
+            if normalized is not None:
+                self._memo[key] = normalized
+                return normalized
+        normalized = ' '.join(text.split())
+        normalized = self._apply(normalized, None)
+        if lang is not None:
+            normalized = ' '.join(self._apply(normalized, lang).split())
+        with self._lock:
+            self._memo[key] = normalized
+            while len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        return normalized
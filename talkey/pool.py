@@ -0,0 +1,171 @@
+'''
+Bounded worker pool for dispatching synthesis jobs.
+'''
+import logging
+import threading
+import multiprocessing
+from collections import deque, OrderedDict
+
+
+class Job(object):
+    '''
+    A queued unit of work, as returned by ``SynthesisPool.submit()``.
+    '''
+
+    def __init__(self, func, args, kwargs, engine, caller, priority=0):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.engine = engine
+        self.caller = caller
+        self.priority = priority
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+
+    def _run(self):
+        try:
+            self._result = self.func(*self.args, **self.kwargs)
+        except Exception as e:  # pylint: disable=W0703
+            self._error = e
+        self._event.set()
+
+    def done(self):
+        'Boolean on if job has completed'
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        '''
+        Waits for job to complete, returns ``done()``.
+        '''
+        self._event.wait(timeout)
+        return self.done()
+
+    def result(self, timeout=None):
+        '''
+        Waits for job to complete, and returns its result, or re-raises its error.
+        '''
+        if not self.wait(timeout):
+            raise RuntimeError('Job not complete')
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class SynthesisPool(object):
+    '''
+    Engine-agnostic scheduler of synthesis jobs over a bounded set of worker threads.
+
+    The subprocess engines do their work in child processes, so worker threads are enough to keep
+    all cores busy. Jobs of the highest priority are taken first, round-robin from per-caller queues
+    for fairness, and an engine never has more than its limit of jobs running.
+
+    ``workers``
+        Number of workers, defaults to the number of cores.
+    ``engine_limits``
+        Dict of engine SLUG to maximum concurrent jobs of that engine.
+    '''
+
+    def __init__(self, workers=None, engine_limits=None):
+        self._logger = logging.getLogger(__name__)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.engine_limits = engine_limits or {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._queues = OrderedDict()
+        self._running = {}
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._threads = []
+        for num in range(self.workers):
+            thread = threading.Thread(target=self._worker, name='talkey-worker-%d' % num)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        Queues ``func(*args, **kwargs)``, returns a ``Job``.
+
+        The keyword arguments ``engine`` (engine SLUG used for concurrency limits),
+        ``caller`` (key for fair queueing, defaults to the calling thread) and
+        ``priority`` (higher runs first, defaults to 0) are consumed.
+        '''
+        engine = kwargs.pop('engine', None)
+        caller = kwargs.pop('caller', None) or threading.current_thread().ident
+        priority = kwargs.pop('priority', 0)
+        job = Job(func, args, kwargs, engine, caller, priority)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('Pool is shut down')
+            self._queues.setdefault(caller, deque()).append(job)
+            self.submitted += 1
+            self._cond.notify()
+        return job
+
+    def _runnable(self, job):
+        limit = self.engine_limits.get(job.engine)
+        return not limit or self._running.get(job.engine, 0) < limit
+
+    def _next_job(self):
+        'Takes the first highest priority job whose engine is under its limit, round-robin over callers'
+        best = None
+        for caller, queue in self._queues.items():
+            for job in queue:
+                if self._runnable(job) and (best is None or job.priority > best.priority):
+                    best = job
+        if best is not None:
+            queue = self._queues.pop(best.caller)
+            queue.remove(best)
+            # Move caller to the back of the line
+            if queue:
+                self._queues[best.caller] = queue
+        return best
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    job = self._next_job()
+                self._running[job.engine] = self._running.get(job.engine, 0) + 1
+
+            job._run()  # pylint: disable=W0212
+
+            with self._cond:
+                self._running[job.engine] -= 1
+                self.completed += 1
+                if job._error is not None:  # pylint: disable=W0212
+                    self.failed += 1
+                    self._logger.debug('Job failed: %s', job._error)  # pylint: disable=W0212
+                self._cond.notify_all()
+
+    def stats(self):
+        '''
+        Returns dict of queue metrics.
+        '''
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'queue_depth': sum(len(queue) for queue in self._queues.values()),
+                'callers': dict((caller, len(queue)) for caller, queue in self._queues.items()),
+                'running': dict((engine, num) for engine, num in self._running.items() if num),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+    def shutdown(self, wait=True):
+        '''
+        Stops the workers once the queue is drained.
+        '''
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,122 @@
+'''
+Sampling profiler of utterances.
+'''
+import os
+import re
+import json
+import time
+import logging
+import random
+import cProfile
+import threading
+import itertools
+
+PROFILE_OPTIONS = {
+    'directory': {
+        'description': 'Directory to dump profiles to',
+        'type': 'str',
+        'default': 'talkey-profiles',
+    },
+    'sample_rate': {
+        'description': 'Fraction of utterances to profile',
+        'type': 'float',
+        'default': 0.01,
+        'min': 0.0,
+        'max': 1.0,
+    },
+    'max_files': {
+        'description': 'Number of most recent profiles to keep',
+        'type': 'int',
+        'default': 100,
+        'min': 1,
+    },
+}
+
+# Profile files, named by time of dump and counter
+_NAME_RE = re.compile(r'^(\d+\.\d+)-(\d+)\.(?:prof|json)$')
+
+
+class Profiler(object):
+    '''
+    Profiles a sampled fraction of utterances.
+
+    For each sampled utterance it dumps a cProfile ``.prof`` file (readable with ``pstats``) and a
+    ``.json`` summary with the wall time, per-stage timings and the wall time of child processes.
+    Only the ``max_files`` most recent profiles are kept, other files in the directory are left alone.
+    Failing to dump a profile is logged, and never fails the utterance.
+
+    :instrumentation: The ``talkey.metrics.Instrumentation`` to take stage timings from
+    :options: A processed set of ``PROFILE_OPTIONS``
+    '''
+
+    def __init__(self, instrumentation, options):
+        self._logger = logging.getLogger(__name__)
+        self.instrumentation = instrumentation
+        self.options = options
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def sample(self):
+        'Boolean on if the next utterance should be profiled'
+        return random.random() < self.options['sample_rate']
+
+    def run(self, label, func, *args, **kwargs):
+        '''
+        Returns ``func(*args, **kwargs)``, profiling it if sampled.
+        '''
+        if not self.sample():
+            return func(*args, **kwargs)
+
+        ident = threading.current_thread().ident
+        stages = []
+
+        def listener(event):
+            if event.kind == 'timing' and threading.current_thread().ident == ident:
+                stages.append((event.name, event.value, event.tags))
+
+        profile = cProfile.Profile()
+        error = None
+        self.instrumentation.add_listener(listener)
+        start = time.time()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            wall = time.time() - start
+            self.instrumentation.remove_listener(listener)
+            try:
+                self._dump(label, profile, wall, stages, error)
+            except Exception as e:  # pylint: disable=W0703
+                self._logger.warning('Could not dump profile to %s: %s', self.options['directory'], e)
+
+    def _dump(self, label, profile, wall, stages, error):
+        directory = self.options['directory']
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        name = os.path.join(directory, '%.6f-%d' % (time.time(), next(self._counter)))
+        profile.dump_stats(name + '.prof')
+        with open(name + '.json', 'w') as f:
+            json.dump({
+                'label': label,
+                'wall_time': wall,
+                'subprocess_time': sum(value for stage, value, tags in stages if stage == 'subprocess'),
+                'stages': [{'stage': stage, 'seconds': value, 'tags': tags} for stage, value, tags in stages],
+                'error': str(error) if error is not None else None,
+            }, f, indent=2, sort_keys=True)
+        self._rotate()
+
+    def _rotate(self):
+        directory = self.options['directory']
+        with self._lock:
+            matches = [_NAME_RE.match(fname) for fname in os.listdir(directory)]
+            names = sorted(set(
+                (float(match.group(1)), int(match.group(2)), '%s-%s' % match.groups()) for match in matches if match
+            ))
+            for _, _, name in names[:-self.options['max_files']]:
+                for ext in ['.prof', '.json']:
+                    try:
+                        os.remove(os.path.join(directory, name + ext))
+                    except OSError:  # pragma: no cover
+                        pass
@@ -0,0 +1,272 @@
+'''
+Priority and deadline aware scheduling of announcements, e.g. for a PA system.
+'''
+import itertools
+import logging
+import threading
+import time
+
+from .base import TTSError, TTSCancelled
+from .metrics import Event
+
+QUEUED = 'queued'
+PLAYING = 'playing'
+DONE = 'done'
+EXPIRED = 'expired'
+SUPERSEDED = 'superseded'
+PREEMPTED = 'preempted'
+FAILED = 'failed'
+
+FINAL = frozenset([DONE, EXPIRED, SUPERSEDED, PREEMPTED, FAILED])
+
+
+class Message(object):
+    '''
+    An announcement, as returned by ``SpeechScheduler.announce()``.
+
+    :text: The text
+    :lang: The language
+    :priority: Higher is played first, and may preempt lower
+    :deadline: ``time.time()`` after which it is dropped if not yet played, or None
+    :key: Messages with the same key supersede each other, or None
+    :status: One of ``queued``, ``playing``, ``done``, ``expired``, ``superseded``, ``preempted`` or ``failed``
+    :error: The exception, if it failed
+    '''
+
+    def __init__(self, text, lang, priority, deadline, key, seq):
+        self.text = text
+        self.lang = lang
+        self.priority = priority
+        self.deadline = deadline
+        self.key = key
+        self.seq = seq
+        self.status = QUEUED
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.audio = None
+        self._preempt = False
+        self._event = threading.Event()
+
+    def expired(self, now=None):
+        'Boolean on if its deadline has passed'
+        return self.deadline is not None and (now or time.time()) > self.deadline
+
+    def done(self):
+        'Boolean on if it has reached a final status'
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        '''
+        Waits for a final status, and returns the status.
+        '''
+        self._event.wait(timeout)
+        return self.status
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.audio = None
+        self._event.set()
+
+    def __repr__(self):
+        return '<Message %s p%s %s: %r>' % (self.key, self.priority, self.status, self.text)
+
+
+class SpeechScheduler(object):
+    '''
+    Plays announcements one at a time, highest priority first, and in order of submission otherwise,
+    as returned by ``Talkey.scheduler()``.
+
+    Messages past their deadline are dropped instead of played, a new message replaces queued ones of the same key,
+    and a message of higher priority than the one playing stops it.
+    Playback is stopped with ``stop()`` of the ``Talkey`` sink if it has one, otherwise by ``cancel()`` of the engine.
+    Only a message whose playback raised ``TTSCancelled`` counts as stopped, one that played to the end is done.
+
+    Each message is timed from submission to the start of playback as the ``queue_latency`` stage of
+    the ``Talkey`` instrumentation, tagged by priority, and ``expired``, ``superseded`` and ``preempted``
+    messages are counted.
+
+    ``talkey``
+        The ``Talkey`` to render and play with
+    ``preempt``
+        Stop the playing message when one of higher priority arrives
+    ``requeue_preempted``
+        Play stopped messages again once their turn comes, if still within their deadline
+    '''
+
+    def __init__(self, talkey, preempt=True, requeue_preempted=True):
+        self._logger = logging.getLogger(__name__)
+        self.talkey = talkey
+        self.preempt = preempt
+        self.requeue_preempted = requeue_preempted
+        self.counts = dict((status, 0) for status in FINAL)
+        self._latency = (0, 0.0, 0.0)
+        self._queue = []
+        self._current = None
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._thread = threading.Thread(target=self._player, name='talkey-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def announce(self, text, lang=None, priority=0, ttl=None, deadline=None, key=None):
+        '''
+        Queues a message, returns a ``Message``.
+
+        :lang: The language, detected by ``Talkey.classify()`` if not given
+        :priority: Higher is played first, and stops the playing message if lower
+        :ttl: Seconds from now after which it is dropped if not yet played
+        :deadline: ``time.time()`` after which it is dropped if not yet played
+        :key: Queued messages with the same key are superseded by this one, e.g. ``'platform-3'``
+        '''
+        if ttl is not None:
+            deadline = min(deadline, time.time() + ttl) if deadline is not None else time.time() + ttl
+        if lang is None:
+            lang = self.talkey._prepare(text, lang)[1]  # pylint: disable=W0212
+        msg = Message(text, lang, priority, deadline, key, next(self._seq))
+        with self._cond:
+            if self._shutdown:
+                raise TTSError('Scheduler is closed')
+            if key is not None:
+                for old in [old for old in self._queue if old.key == key]:
+                    self._queue.remove(old)
+                    self._finalize(old, SUPERSEDED)
+            self._queue.append(msg)
+            current = self._current
+            if self.preempt and current is not None and current.status == PLAYING and priority > current.priority:
+                current._preempt = True  # pylint: disable=W0212
+                self._stop(current)
+            self._cond.notify_all()
+        return msg
+
+    def _stop(self, msg):
+        'Stops playback of the message'
+        sink = self.talkey.sink
+        if sink is not None:
+            sink.stop()
+        else:
+            self.talkey.get_engine_for_lang(msg.lang).cancel()
+
+    def _finalize(self, msg, status, error=None):
+        self.counts[status] += 1
+        if status in [EXPIRED, SUPERSEDED, PREEMPTED]:
+            self.talkey.instrumentation.count(status, priority=msg.priority)
+        msg._finish(status, error)  # pylint: disable=W0212
+        self._cond.notify_all()
+
+    def _next(self):
+        'Takes the first highest priority message, dropping expired ones'
+        now = time.time()
+        for msg in [msg for msg in self._queue if msg.expired(now)]:
+            self._queue.remove(msg)
+            self._finalize(msg, EXPIRED)
+        if not self._queue:
+            return None
+        msg = max(self._queue, key=lambda msg: (msg.priority, -msg.seq))
+        self._queue.remove(msg)
+        return msg
+
+    def _outranked(self, msg):
+        return any(other.priority > msg.priority for other in self._queue)
+
+    def _player(self):
+        while True:
+            with self._cond:
+                msg = self._next()
+                while msg is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    msg = self._next()
+                self._current = msg
+
+            try:
+                if msg.audio is None:
+                    msg.audio = self.talkey.synthesize(msg.text, msg.lang)
+            except Exception as e:  # pylint: disable=W0703
+                self._logger.warning('Could not render %r: %s', msg.text, e)
+                with self._cond:
+                    self._current = None
+                    self._finalize(msg, FAILED, e)
+                continue
+
+            with self._cond:
+                # Rendering takes time, so check again
+                if msg.expired():
+                    self._current = None
+                    self._finalize(msg, EXPIRED)
+                    continue
+                if self._outranked(msg):
+                    self._current = None
+                    self._queue.append(msg)
+                    continue
+                msg.status = PLAYING
+                if msg.started is None:
+                    msg.started = time.time()
+                    latency = msg.started - msg.submitted
+                    count, total, peak = self._latency
+                    self._latency = (count + 1, total + latency, max(peak, latency))
+                    self.talkey.instrumentation.emit(Event('timing', 'queue_latency', latency, {
+                        'priority': msg.priority,
+                    }))
+
+            error = None
+            try:
+                self.talkey.get_engine_for_lang(msg.lang).play_audio(msg.audio)
+            except Exception as e:  # pylint: disable=W0703
+                error = e
+
+            with self._cond:
+                self._current = None
+                preempted = msg._preempt and isinstance(error, TTSCancelled)  # pylint: disable=W0212
+                msg._preempt = False  # pylint: disable=W0212
+                if preempted:
+                    if self.requeue_preempted and not msg.expired():
+                        msg.status = QUEUED
+                        self._queue.append(msg)
+                    else:
+                        self._finalize(msg, PREEMPTED)
+                elif error is not None:
+                    self._logger.warning('Could not play %r: %s', msg.text, error)
+                    self._finalize(msg, FAILED, error)
+                else:
+                    self._finalize(msg, DONE)
+                self._cond.notify_all()
+
+    def stats(self):
+        '''
+        Returns dict of message counts by final status, queue depth, and queue latency in seconds.
+        '''
+        with self._cond:
+            count, total, peak = self._latency
+            stats = dict(self.counts)
+            stats['queued'] = len(self._queue)
+            stats['playing'] = self._current.text if self._current is not None else None
+        stats['latency_mean'] = total / count if count else None
+        stats['latency_max'] = peak if count else None
+        return stats
+
+    def join(self, timeout=None):
+        '''
+        Waits until all queued messages are finished, returns True if so.
+        '''
+        end = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            while self._queue or self._current is not None:
+                remaining = end - time.time() if end is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, wait=True):
+        '''
+        Stops the scheduler once the queue is drained.
+        '''
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            self._thread.join()
@@ -0,0 +1,344 @@
+'''
+Audio sinks, that synthesized audio can be delivered to instead of the audio device.
+
+Sinks are given the rendered ``talkey.audio.Audio`` itself, which is never modified, so a
+``FanOutSink`` shares one buffer among all its outputs without copying.
+'''
+import os
+import socket
+import itertools
+import threading
+from abc import ABCMeta, abstractmethod
+
+try:
+    import queue
+except ImportError:  # pragma: no cover
+    import Queue as queue
+
+from talkey.audio import STREAM_LENGTH, concatenate
+from talkey.base import TTSError, TTSCancelled, subprocess
+
+
+class AbstractSink(object):
+    '''
+    Generic parent class for all sinks
+    '''
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def write(self, audio):
+        '''
+        AbstractMethod: Delivers the audio
+
+        :audio: A ``talkey.audio.Audio`` instance
+        '''
+        pass  # pragma: no cover
+
+    def write_stream(self, chunks):
+        '''
+        Delivers audio rendered progressively. Sinks that can not stream deliver it once complete.
+
+        :chunks: Iterable of ``talkey.audio.Audio`` instances of the same format
+        '''
+        chunks = list(chunks)
+        if chunks:
+            self.write(chunks[0] if len(chunks) == 1 else concatenate(chunks))
+
+    def stop(self):
+        'Stops delivery of the audio being written, if possible, which makes that write raise TTSCancelled'
+        pass
+
+    def close(self):
+        'Releases any resources held by the sink'
+        pass
+
+
+class NullSink(AbstractSink):
+    '''
+    Discards all audio, only counting it.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def write(self, audio):
+        with self._lock:
+            self.count += 1
+            self.bytes += len(audio.frames)
+
+
+class CaptureSink(AbstractSink):
+    '''
+    Keeps all audio in memory, in order of delivery.
+
+    ``maxlen``
+        Maximum number of utterances kept, oldest are dropped first. ``None`` for unlimited.
+    '''
+
+    def __init__(self, maxlen=None):
+        self.maxlen = maxlen
+        self.captured = []
+        self._lock = threading.Lock()
+
+    def write(self, audio):
+        with self._lock:
+            self.captured.append(audio)
+            if self.maxlen is not None and len(self.captured) > self.maxlen:
+                del self.captured[0]
+
+    @property
+    def last(self):
+        'The last delivered audio, or None'
+        with self._lock:
+            return self.captured[-1] if self.captured else None
+
+    def clear(self):
+        with self._lock:
+            self.captured = []
+
+    def __len__(self):
+        return len(self.captured)
+
+
+class CallbackSink(AbstractSink):
+    '''
+    Calls ``callback(audio)`` for all audio.
+    '''
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, audio):
+        self.callback(audio)
+
+
+class DeviceSink(AbstractSink):
+    '''
+    Plays audio on the audio device, streaming it as WAV to the stdin of a player.
+    Progressively rendered audio is played as it arrives. ``stop()`` kills the player, and the write raises TTSCancelled.
+
+    ``command``
+        The player command, that reads WAV from stdin.
+    '''
+
+    def __init__(self, command=None):
+        self.command = command or ['aplay', '-q', '-']
+        self._lock = threading.Lock()
+        self._proc_lock = threading.Lock()
+        self._proc = None
+        self._stopped = False
+
+    def write(self, audio):
+        self._play(audio.wav_header(), [audio])
+
+    def write_stream(self, chunks):
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is not None:
+            self._play(first.wav_header(STREAM_LENGTH), itertools.chain([first], chunks))
+
+    def _play(self, header, chunks):
+        # One utterance at a time, so they don't talk over each other
+        with self._lock:
+            with self._proc_lock:
+                try:
+                    proc = self._proc = subprocess.Popen(self.command, stdin=subprocess.PIPE)
+                except OSError as e:
+                    raise TTSError('Could not run %s: %s' % (self.command[0], e))
+                self._stopped = False
+            try:
+                try:
+                    proc.stdin.write(header)
+                    for chunk in chunks:
+                        proc.stdin.write(memoryview(chunk.frames))
+                        proc.stdin.flush()
+                    proc.stdin.close()
+                except (IOError, OSError):
+                    pass
+                proc.wait()
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+                with self._proc_lock:
+                    self._proc = None
+            if self._stopped:
+                raise TTSCancelled('Stopped: %s' % self.command[0])
+            if proc.returncode:
+                raise TTSError('%s failed with exit status %s' % (self.command[0], proc.returncode))
+
+    def stop(self):
+        with self._proc_lock:
+            if self._proc is not None:
+                self._stopped = True
+                try:
+                    self._proc.kill()
+                except OSError:  # pragma: no cover
+                    pass
+
+
+class FileSink(AbstractSink):
+    '''
+    Writes each utterance to a new numbered WAV file, e.g. for a recording archive.
+
+    ``directory``
+        Directory to write to, created if missing
+    ``pattern``
+        File name pattern, formatted with the utterance number
+    '''
+
+    def __init__(self, directory, pattern='%05d.wav'):
+        self.directory = directory
+        self.pattern = pattern
+        self.written = []
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def write(self, audio):
+        with self._lock:
+            fname = os.path.join(self.directory, self.pattern % (len(self.written) + 1))
+            self.written.append(fname)
+        audio.write(fname)
+
+
+class SocketSink(AbstractSink):
+    '''
+    Streams the raw PCM of all audio to a network socket, progressively rendered audio as it arrives.
+
+    ``address``
+        ``(host, port)`` tuple to send to
+    ``protocol``
+        ``tcp`` for a single connection, made on first use, or ``udp`` for datagrams
+    ``packet_size``
+        Maximum bytes per UDP datagram
+    '''
+
+    def __init__(self, address, protocol='tcp', packet_size=1024):
+        if protocol not in ['tcp', 'udp']:
+            raise TTSError('Bad protocol: %s' % protocol, ['tcp', 'udp'])
+        self.address = address
+        self.protocol = protocol
+        self.packet_size = packet_size
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _socket(self):
+        if self._sock is None:
+            if self.protocol == 'udp':
+                self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            else:
+                self._sock = socket.create_connection(self.address)
+        return self._sock
+
+    def write(self, audio):
+        data = memoryview(audio.frames)
+        with self._lock:
+            try:
+                sock = self._socket()
+                if self.protocol == 'udp':
+                    for pos in range(0, len(data), self.packet_size):
+                        sock.sendto(data[pos:pos + self.packet_size], self.address)
+                else:
+                    sock.sendall(data)
+            except (IOError, OSError) as e:
+                self._close()
+                raise TTSError('Could not send audio to %s:%s: %s' % (self.address[0], self.address[1], e))
+
+    def write_stream(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+class FanOutSink(AbstractSink):
+    '''
+    Delivers the same audio to multiple sinks concurrently, sharing the buffer.
+    Progressively rendered audio is passed on to each sink as it arrives.
+
+    Waits for all sinks, and raises TTSError if any of them failed.
+
+    ``sinks``
+        List of sinks
+    '''
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def _deliver(self, writes):
+        'Calls the writes of each sink, the first one in this thread, and the others concurrently'
+        errors = []
+
+        def deliver(sink, write):
+            try:
+                write()
+            except Exception as e:  # pylint: disable=W0703
+                errors.append((sink, e))
+
+        threads = []
+        for sink, write in zip(self.sinks[1:], writes[1:]):
+            thread = threading.Thread(target=deliver, args=(sink, write), name='talkey-sink')
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        if self.sinks:
+            deliver(self.sinks[0], writes[0])
+        for thread in threads:
+            thread.join()
+        if errors and all(isinstance(e, TTSCancelled) for sink, e in errors):
+            raise TTSCancelled('Stopped')
+        if errors:
+            raise TTSError('%d of %d sinks failed: %s' % (
+                len(errors), len(self.sinks), '; '.join('%s: %s' % (type(sink).__name__, e) for sink, e in errors)
+            ))
+
+    def write(self, audio):
+        self._deliver([lambda sink=sink: sink.write(audio) for sink in self.sinks])
+
+    def write_stream(self, chunks):
+        if not self.sinks:
+            return
+        queues = [queue.Queue() for _ in self.sinks[1:]]
+
+        def tee():
+            try:
+                for chunk in chunks:
+                    for chunk_queue in queues:
+                        chunk_queue.put(chunk)
+                    yield chunk
+            finally:
+                for chunk_queue in queues:
+                    chunk_queue.put(None)
+
+        shared = tee()
+
+        def first():
+            try:
+                self.sinks[0].write_stream(shared)
+            finally:
+                # The other sinks get the rest, even if the first one stopped early
+                for _ in shared:
+                    pass
+
+        self._deliver([first] + [
+            lambda sink=sink, chunk_queue=chunk_queue: sink.write_stream(iter(chunk_queue.get, None))
+            for sink, chunk_queue in zip(self.sinks[1:], queues)
+        ])
+
+    def stop(self):
+        for sink in self.sinks:
+            sink.stop()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
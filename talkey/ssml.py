@@ -0,0 +1,185 @@
+'''
+Parsing of a small SSML subset, into segments of uniform voice and prosody.
+
+Supported elements are ``<speak>``, ``<voice name="..." xml:lang="...">``, ``<lang xml:lang="...">``,
+``<prosody rate="..." pitch="...">``, ``<break time="..." strength="...">``, and ``<p>``/``<s>``.
+'''
+import re
+from collections import namedtuple
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+
+from talkey.base import TTSRequestError
+
+SSML_NS = 'http://www.w3.org/2001/10/synthesis'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+Segment = namedtuple('Segment', ['text', 'language', 'voice', 'rate', 'pitch', 'pause'])
+'''
+A run of text of uniform voice and prosody, or a pause.
+
+:text: The text, empty for a pause
+:language: The requested language, or None for the default
+:voice: The requested voice, or None for the default
+:rate: Speaking rate relative to the default, e.g. ``1.5``
+:pitch: Pitch relative to the default
+:pause: Seconds of silence, for a pause
+'''
+
+RATES = {'x-slow': 0.5, 'slow': 0.75, 'medium': 1.0, 'fast': 1.25, 'x-fast': 1.75, 'default': 1.0}
+PITCHES = {'x-low': 0.5, 'low': 0.75, 'medium': 1.0, 'high': 1.25, 'x-high': 1.5, 'default': 1.0}
+STRENGTHS = {'none': 0.0, 'x-weak': 0.1, 'weak': 0.25, 'medium': 0.5, 'strong': 0.75, 'x-strong': 1.0}
+
+_RELATIVE_RE = re.compile(r'^([+-]?)(\d+(?:\.\d+)?)(%?)$')
+_TIME_RE = re.compile(r'^(\d+(?:\.\d+)?)(ms|s)$')
+
+
+def _factor(value, names, attr):
+    'Parses a prosody value to a factor relative to the default'
+    value = value.strip()
+    if value in names:
+        return names[value]
+    match = _RELATIVE_RE.match(value)
+    if not match:
+        raise TTSRequestError('Bad SSML %s: %s' % (attr, value), sorted(names.keys()))
+    sign, num, pct = match.groups()
+    num = float(num) / 100.0 if pct else float(num)
+    if sign:
+        # Relative change, e.g. +10%
+        return max(1.0 + (num if sign == '+' else -num), 0.1)
+    return max(num, 0.1)
+
+
+def _pause(elem):
+    time = elem.get('time')
+    if time is not None:
+        match = _TIME_RE.match(time.strip())
+        if not match:
+            raise TTSRequestError('Bad SSML break time: %s' % time)
+        return float(match.group(1)) / (1000.0 if match.group(2) == 'ms' else 1.0)
+    strength = elem.get('strength', 'medium')
+    if strength not in STRENGTHS:
+        raise TTSRequestError('Bad SSML break strength: %s' % strength, sorted(STRENGTHS.keys()))
+    return STRENGTHS[strength]
+
+
+def _language(elem, language):
+    lang = elem.get(XML_LANG)
+    return lang.split('-')[0].split('_')[0].lower() if lang else language
+
+
+def _walk(elem, segments, language, voice, rate, pitch):
+    tag = elem.tag.split('}')[-1]
+    if tag in ['speak', 'lang', 'p', 's']:
+        language = _language(elem, language)
+    elif tag == 'voice':
+        language = _language(elem, language)
+        voice = elem.get('name', voice)
+    elif tag == 'prosody':
+        if 'rate' in elem.attrib:
+            rate *= _factor(elem.get('rate'), RATES, 'rate')
+        if 'pitch' in elem.attrib:
+            pitch *= _factor(elem.get('pitch'), PITCHES, 'pitch')
+    elif tag == 'break':
+        segments.append(Segment('', None, None, 1.0, 1.0, _pause(elem)))
+    else:
+        raise TTSRequestError('Unsupported SSML element: %s' % tag, ['speak', 'voice', 'lang', 'prosody', 'break', 'p', 's'])
+
+    def add(text):
+        text = ' '.join((text or '').split())
+        if not text:
+            return
+        last = segments[-1] if segments else None
+        if last is not None and not last.pause and last[1:5] == (language, voice, rate, pitch):
+            segments[-1] = last._replace(text=last.text + ' ' + text)
+        else:
+            segments.append(Segment(text, language, voice, rate, pitch, 0.0))
+
+    add(elem.text)
+    for child in elem:
+        _walk(child, segments, language, voice, rate, pitch)
+        add(child.tail)
+
+
+def parse(markup):
+    '''
+    Parses SSML markup to a list of ``Segment``, in order.
+    The ``<speak>`` root element is optional.
+
+    Raises TTSRequestError on malformed or unsupported markup.
+    '''
+    segments = []
+    _walk(_fromstring(markup), segments, None, None, 1.0, 1.0)
+    return segments
+
+
+def _fromstring(markup):
+    markup = markup.strip()
+    if not re.match(r'^(<\?xml[^>]*\?>\s*)?<speak[\s>/]', markup):
+        markup = '<speak>%s</speak>' % markup
+    try:
+        return ElementTree.fromstring(markup.encode('utf-8'))
+    except ElementTree.ParseError as e:
+        raise TTSRequestError('Bad SSML: %s' % e)
+
+
+def _normalize_text(text, normalizer, language):
+    if not text or not text.strip():
+        return text
+    # Keep the separation from neighbouring elements
+    return '%s%s%s' % (
+        ' ' if text[0].isspace() else '', normalizer.normalize(text, language), ' ' if text[-1].isspace() else ''
+    )
+
+
+def _normalize_elem(elem, normalizer, language):
+    language = _language(elem, language)
+    elem.text = _normalize_text(elem.text, normalizer, language)
+    for child in elem:
+        _normalize_elem(child, normalizer, language)
+        child.tail = _normalize_text(child.tail, normalizer, language)
+
+
+def normalize(markup, normalizer, language=None):
+    '''
+    Returns the markup with its text normalized by a ``talkey.normalize.Normalizer``,
+    in the language in effect for each element, else ``language``. The markup itself is left alone.
+
+    Raises TTSRequestError on malformed markup.
+    '''
+    root = _fromstring(markup)
+    _normalize_elem(root, normalizer, language)
+    return ElementTree.tostring(root).decode('ascii')
+
+
+def plain_text(segments):
+    '''
+    Returns the text of the segments, without markup.
+    '''
+    return ' '.join(seg.text for seg in segments if seg.text)
+
+
+def to_ssml(segments, language=None):
+    '''
+    Renders segments as SSML, for engines that support it natively.
+    Segment voices should already be resolved to the voices of the engine.
+
+    :language: Locale of the root element, e.g. ``en-US``
+    '''
+    parts = ['<speak version="1.0" xmlns="%s"%s>' % (
+        SSML_NS, ' xml:lang=%s' % quoteattr(language) if language else ''
+    )]
+    for seg in segments:
+        if seg.pause:
+            parts.append('<break time="%dms"/>' % round(seg.pause * 1000))
+            continue
+        text = escape(seg.text)
+        if seg.rate != 1.0 or seg.pitch != 1.0:
+            text = '<prosody rate="%d%%" pitch="%+d%%">%s</prosody>' % (
+                round(seg.rate * 100), round((seg.pitch - 1.0) * 100), text
+            )
+        if seg.voice:
+            text = '<voice name=%s>%s</voice>' % (quoteattr(seg.voice), text)
+        parts.append(text)
+    parts.append('</speak>')
+    return ''.join(parts)
@@ -0,0 +1,110 @@
+'''
+Announcement templates, assembled from separately rendered and cached fragments.
+'''
+import string
+import threading
+
+from .audio import concatenate
+from .base import TTSError
+from .cache import AudioCache
+
+
+class Template(object):
+    '''
+    An announcement template, e.g. ``'Train to {city} departs from platform {platform}'``,
+    as returned by ``Talkey.template()``.
+
+    The static text between slots, and the slot values, are rendered as separate fragments and kept in memory,
+    so saying a template only renders slot values not seen before, and otherwise only concatenates audio.
+    Enable the ``trim_silence`` post-processing for fragments to join without gaps.
+
+    ``talkey``
+        The ``Talkey`` to render fragments with
+    ``template``
+        The template text, with slots in ``str.format()`` syntax
+    ``lang``
+        Language of the template, detected from the static text if not given
+    ``slots``
+        Dict of slot name to values to render in advance, e.g. ``{'platform': range(1, 13)}``
+    ``cache_size``
+        Number of slot values kept in memory, besides those given in ``slots``
+    '''
+
+    def __init__(self, talkey, template, lang=None, slots=None, cache_size=64):
+        self.talkey = talkey
+        self.template = template
+        self.parts = []
+        self._formatter = string.Formatter()
+        try:
+            for literal, field, spec, conversion in self._formatter.parse(template):
+                literal = literal.strip()
+                if literal:
+                    self.parts.append((None, literal))
+                if field is not None:
+                    if not field or field.isdigit():
+                        raise TTSError('Template slots must be named: %s' % template)
+                    self.parts.append((field, (spec, conversion)))
+        except ValueError as e:
+            raise TTSError('Bad template: %s' % e)
+        self.slot_names = [name for name, _ in self.parts if name is not None]
+        self.lang = lang or talkey.classify(' '.join(text for name, text in self.parts if name is None) or template)
+        self.slots = dict((name, list(values)) for name, values in (slots or {}).items())
+        self.cache = AudioCache(cache_size)
+        self._fragments = {}
+        self._lock = threading.Lock()
+
+    def _fragment(self, text, keep):
+        'Returns rendered audio of a fragment, kept for good if ``keep``, else in the LRU cache'
+        audio = self._fragments.get(text)
+        if audio is None:
+            audio = self.cache.get(text)
+        if audio is None:
+            audio = self.talkey.synthesize(text, self.lang)
+            if keep:
+                with self._lock:
+                    self._fragments[text] = audio
+            else:
+                self.cache.put(text, audio)
+        return audio
+
+    def _format(self, spec, value):
+        spec, conversion = spec
+        return self._formatter.format_field(self._formatter.convert_field(value, conversion), spec or '')
+
+    def precompute(self):
+        '''
+        Renders the static fragments and the slot values given in advance.
+        '''
+        for name, text in self.parts:
+            if name is None:
+                self._fragment(text, True)
+            else:
+                for value in self.slots.get(name, []):
+                    self._fragment(self._format(text, value), True)
+
+    def synthesize(self, **values):
+        '''
+        Renders the template with the slot values, returns a ``talkey.audio.Audio`` instance.
+
+        Raises TTSError if a slot value is missing.
+        '''
+        missing = [name for name in self.slot_names if name not in values]
+        if missing:
+            raise TTSError('Missing template slots: %s' % ', '.join(missing), self.slot_names)
+        parts = []
+        for name, text in self.parts:
+            if name is None:
+                parts.append(self._fragment(text, True))
+            else:
+                parts.append(self._fragment(self._format(text, values[name]), False))
+        try:
+            return concatenate(parts)
+        except ValueError as e:
+            raise TTSError('Could not concatenate fragments: %s' % e)
+
+    def say(self, **values):
+        '''
+        Says the template with the slot values.
+        '''
+        audio = self.synthesize(**values)
+        self.talkey.get_engine_for_lang(self.lang).play_audio(audio)
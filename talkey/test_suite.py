@@ -2,12 +2,43 @@
 talkey test suite
 '''
 # pylint: disable=W0104
-from talkey.base import DETECTABLE_LANGS, TTSError, AbstractTTSEngine, subprocess
+from talkey.base import DETECTABLE_LANGS, TTSError, TTSCancelled, AbstractTTSEngine, subprocess
 from talkey.engines import *
-from talkey.utils import check_executable, process_options
+from talkey.engines import _ENGINE_MAP
+from talkey.utils import check_executable, process_options, AvailabilityProber
 from talkey.tts import create_engine, Talkey
-
-from os.path import isfile
+from talkey.audio import Audio, STREAM_LENGTH, trim_silence, normalize_loudness, concatenate, read_wav_stream
+from talkey.cache import AudioCache, DiskAudioCache, MappedAudio, SingleFlight
+from talkey.pool import SynthesisPool
+from talkey.health import OPEN, CLOSED
+from talkey.metrics import Instrumentation, MetricsCollector, Event, statsd_line
+from talkey.sinks import NullSink, CaptureSink, CallbackSink, DeviceSink, FileSink, SocketSink, FanOutSink
+from talkey.daemon import TalkeyDaemon, TalkeyClient
+from talkey import cli, ssml
+from talkey.normalize import Normalizer
+from talkey.voices import Voice, VoiceRegistry
+from talkey.classifier import get_classifier, rank_many
+from talkey.native import load_espeak, load_flite
+from talkey.scheduler import DONE, EXPIRED, SUPERSEDED, PREEMPTED
+import langid
+from talkey.engines.dummy import LANGUAGES as DUMMY_LANGUAGES
+from talkey.engines.festival import _ESCAPE_RE as FESTIVAL_ESCAPE_RE
+
+import math
+import time
+import codecs
+import struct
+import io
+import sys
+import socket
+import json
+import shutil
+import tempfile
+import threading
+import weakref
+import gc
+from os import remove, listdir
+from os.path import isfile, isdir, join
 
 try:
     import unittest2 as unittest  # pylint: disable=F0401
@@ -26,6 +57,38 @@ def fakeplay(self, filename, translate=False):
 AbstractTTSEngine.play = fakeplay
 
 
+def tone(seconds, amplitude=0.5, framerate=8000, lead=0.0, trail=0.0):
+    'Generates a mono 16-bit sine tone, with optional leading/trailing silence'
+    samples = [0] * int(lead * framerate)
+    samples += [int(amplitude * 32767 * math.sin(2 * math.pi * 440 * i / framerate)) for i in range(int(seconds * framerate))]
+    samples += [0] * int(trail * framerate)
+    return Audio(struct.pack('<%dh' % len(samples), *samples), 1, 2, framerate)
+
+
+# Stands in for a player, copies stdin to a file
+PLAYER = '''
+import sys
+with open(sys.argv[1], 'wb') as f:
+    f.write(sys.stdin.buffer.read() if hasattr(sys.stdin, 'buffer') else sys.stdin.read())
+'''
+
+
+class RenderTTS(DummyTTS):
+    'Dummy engine that renders a tone, and needs no sound output'
+    SLUG = 'render'
+    renders = 0
+
+    def sound_available(self):
+        return True
+
+    # Render and play, instead of just logging
+    _say = AbstractTTSEngine._say
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        RenderTTS.renders += 1
+        tone(0.1, lead=0.3, trail=0.3).write(fname)
+
+
 class CheckExecutableTest(unittest.TestCase):
 
     def test_check_executable_found(self):
@@ -118,6 +181,1542 @@ class ProcessOptionsTest(unittest.TestCase):
         self.assertEqual(ret, {'test': 'two'})
 
 
+class SingleFlightTest(unittest.TestCase):
+
+    def test_leader_interrupted(self):
+        flight = SingleFlight()
+        started, gate = threading.Event(), threading.Event()
+        errors = []
+
+        def leader():
+            started.set()
+            gate.wait(5)
+            raise KeyboardInterrupt()
+
+        def follower():
+            try:
+                flight.do('key', lambda: 'not shared')
+            except KeyboardInterrupt as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=lambda: self.assertRaises(KeyboardInterrupt, flight.do, 'key', leader))
+        thread.start()
+        started.wait(5)
+        other = threading.Thread(target=follower)
+        other.start()
+        deadline = time.time() + 5
+        while not flight.shared and time.time() < deadline:
+            time.sleep(0.01)
+        gate.set()
+        thread.join(5)
+        other.join(5)
+        self.assertEqual(len(errors), 1)
+
+
+class AudioTest(unittest.TestCase):
+
+    def test_audio_file_roundtrip(self):
+        audio = tone(0.25)
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            fname = f.name
+        audio.write(fname)
+        ret = Audio.from_file(fname)
+        remove(fname)
+        self.assertEqual(ret.frames, audio.frames)
+        self.assertEqual(ret.framerate, 8000)
+        self.assertEqual(ret.nframes, 2000)
+        self.assertAlmostEqual(ret.duration, 0.25)
+
+    def test_trim_silence(self):
+        ret = trim_silence(tone(0.5, lead=0.25, trail=0.5), padding=0.01)
+        self.assertAlmostEqual(ret.duration, 0.52, places=2)
+        self.assertEqual(trim_silence(tone(0, trail=0.5)).nframes, 0)
+
+    def test_normalize_loudness(self):
+        quiet = normalize_loudness(tone(0.5, amplitude=0.9), level=-20.0)
+        loud = normalize_loudness(tone(0.5, amplitude=0.01), level=-20.0)
+        self.assertEqual(quiet.nframes, loud.nframes)
+        rms = lambda a: math.sqrt(sum(x * x for x in struct.unpack('<%dh' % a.nframes, a.frames)) / a.nframes) / 32768
+        self.assertAlmostEqual(rms(quiet), 0.1, places=3)
+        self.assertAlmostEqual(rms(loud), 0.1, places=3)
+
+    def test_normalize_no_clip(self):
+        ret = normalize_loudness(tone(0.5, amplitude=0.01), level=0.0)
+        self.assertLessEqual(max(struct.unpack('<%dh' % ret.nframes, ret.frames)), 32767)
+
+    def test_audio_cache(self):
+        cache = AudioCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_disk_audio_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            cache = DiskAudioCache(tmpdir, maxsize=2)
+            one, two = tone(0.1), tone(0.2, framerate=16000)
+            cache.put(('espeak', 'en', 'one'), one)
+            cache.put(('espeak', 'en', 'two'), two)
+            audio = cache.get(('espeak', 'en', 'one'))
+            self.assertIsInstance(audio, MappedAudio)
+            self.assertIsInstance(audio.frames, memoryview)
+            self.assertEqual(audio.frames, one.frames)
+            self.assertEqual(audio.framerate, 8000)
+            # The stored file is a plain WAV file
+            self.assertEqual(Audio.from_file(audio.filename).frames, one.frames)
+            self.assertIs(cache.get(('espeak', 'en', 'one')), audio)
+
+            # Persists across instances, in LRU order
+            cache = DiskAudioCache(tmpdir, maxsize=2)
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.get(('espeak', 'en', 'two')).framerate, 16000)
+            cache.put(('espeak', 'en', 'three'), tone(0.3))
+            self.assertNotIn(('espeak', 'en', 'one'), cache)
+            self.assertEqual(len([name for name in listdir(tmpdir) if name.endswith('.wav')]), 2)
+            self.assertIsNone(cache.get(('espeak', 'en', 'one')))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            # Evicted files still play from their mapping
+            held = cache.get(('espeak', 'en', 'two'))
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+            self.assertEqual(held.frames, two.frames)
+            self.assertEqual(len(DiskAudioCache(tmpdir)), 0)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class RenderTest(unittest.TestCase):
+
+    def test_synthesize_postprocess_cached(self):
+        obj = RenderTTS(enabled=True)
+        obj.cache = AudioCache()
+        obj.configure_postprocess(trim_silence=True, silence_padding=0)
+        RenderTTS.renders = 0
+        audio = obj.synthesize('Cows go moo')
+        self.assertAlmostEqual(audio.duration, 0.1, places=2)
+        self.assertIs(obj.synthesize('Cows go moo'), audio)
+        obj.say('Cows go moo')
+        self.assertEqual(RenderTTS.renders, 1)
+        inst, filename, output = LAST_PLAY
+        self.assertIn('WAVE audio', output)
+        self.assertFalse(isfile(filename), 'Tempfile not deleted')
+
+    def test_synthesize_disk_cached(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            tts = make_talkey([RenderTTS], cache_dir=tmpdir)
+            RenderTTS.renders = 0
+            audio = tts.synthesize('Cows go moo', 'en')
+            tts = make_talkey([RenderTTS], cache_dir=tmpdir)
+            cached = tts.synthesize('Cows go moo', 'en')
+            self.assertEqual(RenderTTS.renders, 1)
+            self.assertEqual(cached.frames, audio.frames)
+            # Played straight from the cache file
+            tts.say('Cows go moo', 'en')
+            self.assertEqual(LAST_PLAY[1], cached.filename)
+            self.assertTrue(isfile(cached.filename))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_synthesize_coalesced(self):
+        obj = SlowRenderTTS(enabled=True)
+        RenderTTS.renders = 0
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(obj.synthesize('Alarm'))) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(RenderTTS.renders, 1)
+        self.assertEqual(len(results), 20)
+        self.assertTrue(all(audio is results[0] for audio in results))
+        self.assertEqual(obj._inflight.shared, 19)
+
+    def test_synthesize_cache_postprocess_key(self):
+        obj = RenderTTS(enabled=True)
+        obj.cache = AudioCache()
+        untrimmed = obj.synthesize('Cows go moo')
+        obj.configure_postprocess(trim_silence=True, silence_padding=0)
+        trimmed = obj.synthesize('Cows go moo')
+        self.assertAlmostEqual(untrimmed.duration, 0.7, places=2)
+        self.assertAlmostEqual(trimmed.duration, 0.1, places=2)
+
+    def test_synthesize_bad_output(self):
+        with self.assertRaisesRegexp(TTSError, 'Could not decode render output'):
+            EmptyRenderTTS(enabled=True).synthesize('Cows go moo')
+
+    def test_synthesize_not_supported(self):
+        with self.assertRaisesRegexp(TTSError, 'Synthesis not supported'):
+            DummyTTS(enabled=True).synthesize('Cows go moo')
+
+
+def make_talkey(engines, **config):
+    'Creates a Talkey that prefers the provided (enabled) test engines'
+    for cls in engines:
+        _ENGINE_MAP[cls.SLUG] = cls
+        config.setdefault(cls.SLUG, {'options': {'enabled': True}})
+    return Talkey(engine_preference=[cls.SLUG for cls in engines], **config)
+
+
+class FailingTTS(RenderTTS):
+    'Render engine that always fails'
+    SLUG = 'failing'
+    fail = True
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        if FailingTTS.fail:
+            raise TTSError('Broken')
+        super(FailingTTS, self)._synthesize(phrase, language, voice, voiceinfo, options, fname)
+
+
+def slow_check(server, port):
+    time.sleep(0.1)
+    return port == 1
+
+
+class PendingTTS(RenderTTS):
+    'Render engine whose availability is checked in the background'
+    SLUG = 'pending'
+    prober = None
+
+    def _is_available(self):
+        return self.prober.check('localhost', 1, self._availability_changed)
+
+
+class SlowRenderTTS(RenderTTS):
+    'Render engine that takes a while'
+    SLUG = 'slow'
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        time.sleep(0.2)
+        super(SlowRenderTTS, self)._synthesize(phrase, language, voice, voiceinfo, options, fname)
+
+
+class SubprocessRenderTTS(RenderTTS):
+    'Render engine that runs a subprocess'
+    SLUG = 'subprocess'
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        self._call(['true'])
+        super(SubprocessRenderTTS, self)._synthesize(phrase, language, voice, voiceinfo, options, fname)
+
+
+class HangingTTS(RenderTTS):
+    'Render engine whose subprocess hangs'
+    last_file = None
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        HangingTTS.last_file = fname
+        self._call(['sleep', '10'])
+
+
+class HangingRenderTTS(HangingTTS):
+    'Hanging render engine, alongside the render engine'
+    SLUG = 'hanging'
+
+
+class EmptyRenderTTS(RenderTTS):
+    'Render engine that leaves an empty file behind'
+
+    def _synthesize(self, phrase, language, voice, voiceinfo, options, fname):
+        pass
+
+
+class OptionTTS(RenderTTS):
+    'Render engine with a voice option'
+    SLUG = 'option'
+
+    def _get_options(self):
+        return {'speed': {'type': 'int', 'default': 100}}
+
+    def _say(self, phrase, language, voice, voiceinfo, options):
+        self.said.append((phrase, language, options['speed']))
+
+    def __init__(self, **_options):
+        self.said = []
+        super(OptionTTS, self).__init__(**_options)
+
+    def _get_languages(self):
+        return {
+            'en': {'default': 'en', 'voices': {'en': {}}},
+            'af': {'default': 'af', 'voices': {'af': {}}},
+        }
+
+
+class SubprocessLimitsTest(unittest.TestCase):
+
+    def test_timeout(self):
+        obj = HangingTTS(enabled=True, timeout=0.2)
+        start = time.time()
+        with self.assertRaisesRegexp(TTSError, 'Timed out after 0.2s'):
+            obj.synthesize('Cows go moo')
+        self.assertLess(time.time() - start, 5)
+        self.assertFalse(isfile(HangingTTS.last_file), 'Tempfile not deleted')
+        self.assertEqual(obj._procs, set())
+
+    def test_cancel(self):
+        obj = HangingTTS(enabled=True)
+        errors = []
+
+        def run():
+            try:
+                obj.synthesize('Cows go moo')
+            except TTSError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        deadline = time.time() + 5
+        while not obj._procs and time.time() < deadline:
+            time.sleep(0.01)
+        obj.cancel()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertIn('Cancelled', str(errors[0]))
+        self.assertFalse(isfile(HangingTTS.last_file), 'Tempfile not deleted')
+
+    def test_exit_status(self):
+        obj = RenderTTS(enabled=True)
+        self.assertEqual(obj._call(['true']), 0)
+        with self.assertRaisesRegexp(TTSError, 'false failed with exit status 1'):
+            obj._call(['false'])
+
+
+class ThreadSafetyTest(unittest.TestCase):
+
+    def test_configure_no_leak(self):
+        obj = OptionTTS(enabled=True)
+        obj.configure(language='af', speed=50)
+        self.assertEqual(obj._configure(language='af', speed=70)[3], {'speed': 70})
+        self.assertEqual(obj.languages_options['af'][1], {'speed': 50})
+        self.assertEqual(obj._configure(language='af')[3], {'speed': 50})
+
+    def test_configure_concurrent(self):
+        obj = OptionTTS(enabled=True)
+        obj.configure(language='af', speed=50)
+        errors = []
+
+        def run(num):
+            try:
+                for _ in range(200):
+                    language, voice, voiceinfo, options = obj._configure(language='af', speed=num)
+                    if options['speed'] != num:
+                        errors.append((num, options))
+                    if obj._configure(language='af')[3]['speed'] != 50:
+                        errors.append((num, 'leaked'))
+                    obj.configure(language='en', speed=num)
+            except Exception as e:  # pylint: disable=W0703
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(num,)) for num in range(101, 117)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(obj.languages_options.keys()), ['af', 'en'])
+
+    def test_say_concurrent(self):
+        obj = OptionTTS(enabled=True)
+        obj.configure(language='af', speed=50)
+
+        def run(num):
+            for _ in range(200):
+                obj.say(str(num), language='af', speed=num)
+                obj.say('default', language='af')
+                obj.configure_default(language='en', speed=num)
+
+        threads = [threading.Thread(target=run, args=(num,)) for num in range(101, 117)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(obj.said), 16 * 400)
+        for phrase, language, speed in obj.said:
+            self.assertEqual(language, 'af')
+            self.assertEqual(speed, 50 if phrase == 'default' else int(phrase))
+        self.assertEqual(obj.default_options, obj.languages_options[obj.default_language][1])
+
+
+class FailoverTest(unittest.TestCase):
+
+    def test_failover(self):
+        FailingTTS.fail = True
+        tts = make_talkey([FailingTTS, RenderTTS], health={'failure_threshold': 2})
+        self.assertEqual(tts.get_engine_for_lang('en').SLUG, 'failing')
+        for _ in range(2):
+            self.assertEqual(tts.synthesize('Cows go moo', 'en').nframes, 5600)
+        self.assertEqual(tts.health['failing'].state, OPEN)
+        self.assertEqual(tts.health['failing'].failures, 2)
+        self.assertEqual(tts.health['render'].requests, 2)
+        self.assertIsNotNone(tts.health['render'].latency)
+        self.assertEqual(tts.get_engine_for_lang('en').SLUG, 'render')
+
+        # Probe lets it be tried again, and success closes the breaker
+        FailingTTS.fail = False
+        tts.probe()
+        self.assertEqual(tts.get_engine_for_lang('en').SLUG, 'failing')
+        tts.synthesize('Cows go moo', 'en')
+        self.assertEqual(tts.health['failing'].state, CLOSED)
+
+    def test_all_fail(self):
+        FailingTTS.fail = True
+        tts = make_talkey([FailingTTS])
+        with self.assertRaisesRegexp(TTSError, 'Broken'):
+            tts.synthesize('Cows go moo', 'en')
+
+    def test_bad_request_no_failover(self):
+        tts = make_talkey([SyntheticTTS, RenderTTS], health={'failure_threshold': 2})
+        for _ in range(3):
+            with self.assertRaisesRegexp(TTSError, 'Unsupported SSML element: foo'):
+                tts.synthesize_ssml('<speak><foo>x</foo></speak>', 'en')
+        self.assertEqual(tts.health['synthetic'].state, CLOSED)
+        self.assertEqual(tts.health['synthetic'].failures, 0)
+        self.assertEqual(tts.health['render'].requests, 0)
+
+    def test_cancel_no_failover(self):
+        tts = make_talkey([HangingRenderTTS, RenderTTS])
+        eng = tts.get_engine('hanging')
+        errors = []
+
+        def run():
+            try:
+                tts.synthesize('Cows go moo', 'en')
+            except TTSError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        deadline = time.time() + 5
+        while not eng._procs and time.time() < deadline:
+            time.sleep(0.01)
+        eng.cancel()
+        thread.join(5)
+        self.assertIsInstance(errors[0], TTSCancelled)
+        self.assertEqual(tts.health['hanging'].failures, 0)
+        self.assertEqual(tts.health['render'].requests, 0)
+
+    def test_slow_trips(self):
+        tts = make_talkey([SlowRenderTTS, RenderTTS], health={'slow_threshold': 0.1})
+        tts.synthesize('Cows go moo', 'en')
+        self.assertEqual(tts.health['slow'].state, OPEN)
+        self.assertEqual(tts.get_engine_for_lang('en').SLUG, 'render')
+
+
+class AvailabilityProberTest(unittest.TestCase):
+
+    def test_prober(self):
+        prober = AvailabilityProber(ttl=60, checker=slow_check)
+        changes = []
+        self.assertIsNone(prober.check('localhost', 1, changes.append))
+        self.assertIsNone(prober.check('localhost', 2))
+        self.assertTrue(prober.wait('localhost', 1, 5))
+        self.assertFalse(prober.wait('localhost', 2, 5))
+        self.assertTrue(prober.check('localhost', 1))
+        self.assertEqual(changes, [True])
+
+    def test_listener_not_kept_alive(self):
+        PendingTTS.prober = AvailabilityProber(checker=slow_check)
+        eng = PendingTTS(enabled=True)
+        ref = weakref.ref(eng)
+        PendingTTS.prober.wait('localhost', 1, 5)
+        self.assertFalse(eng.pending)
+        del eng
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_pending_engine(self):
+        PendingTTS.prober = AvailabilityProber(checker=slow_check)
+        changes = []
+        start = time.time()
+        tts = make_talkey([PendingTTS], pending={
+            'options': {'enabled': True},
+            'languages': {'af': {'voice': 'af'}},
+        })
+        tts.add_availability_listener(lambda eng, available: changes.append((eng.SLUG, available)))
+        self.assertLess(time.time() - start, 0.1)
+        eng = tts.engines[0]
+        self.assertTrue(eng.pending)
+        with self.assertRaisesRegexp(TTSError, 'Could not match language'):
+            tts.get_engine_for_lang('af')
+
+        PendingTTS.prober.wait('localhost', 1, 5)
+        deadline = time.time() + 5
+        while not changes and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(changes, [('pending', True)])
+        self.assertFalse(eng.pending)
+        self.assertIn('af', eng.languages_options)
+        self.assertIn('af', tts.languages)
+        self.assertEqual(tts.get_engine_for_lang('af'), eng)
+
+
+class LatencySelectionTest(unittest.TestCase):
+
+    def test_percentile(self):
+        tts = make_talkey([RenderTTS])
+        health = tts.health['render']
+        self.assertIsNone(health.percentile(95))
+        for num in range(1, 101):
+            health.record_latency(num / 100.0, 10)
+        health.record_latency(5.0, 1000)
+        self.assertAlmostEqual(health.percentile(50, 12), 0.51)
+        self.assertAlmostEqual(health.percentile(95, 12), 0.95)
+        self.assertAlmostEqual(health.percentile(95, 800), 5.0)
+
+    def test_latency_selection(self):
+        tts = make_talkey([SlowRenderTTS, RenderTTS], engine_selection='latency', quality_weight=0.05)
+        self.assertEqual(tts.get_engine_for_lang('en').SLUG, 'slow')
+        tts.synthesize('Cows go moo', 'en')
+        # Unmeasured engines are tried first
+        self.assertEqual(tts.get_engine_for_lang('en', 11).SLUG, 'render')
+        tts.synthesize('Cows go moo', 'en')
+        self.assertEqual(tts.get_engine_for_lang('en', 11).SLUG, 'render')
+
+        tts.quality_weight = 10.0
+        self.assertEqual(tts.get_engine_for_lang('en', 11).SLUG, 'slow')
+
+    def test_bad_selection(self):
+        with self.assertRaisesRegexp(TTSError, 'Bad engine_selection'):
+            make_talkey([RenderTTS], engine_selection='random')
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_disabled(self):
+        inst = Instrumentation()
+        self.assertFalse(inst.enabled)
+        self.assertIs(inst.timer('a'), inst.timer('b'))
+
+    def test_pipeline_metrics(self):
+        tts = make_talkey([RenderTTS], cache_size=4, postprocess={'trim_silence': True})
+        collector = MetricsCollector()
+        events = []
+        tts.instrumentation.add_listener(collector)
+        tts.instrumentation.add_listener(events.append)
+        tts.classify('Cows go moo')
+        tts.say('Cows go moo', 'en')
+        tts.say('Cows go moo', 'en')
+        stages = set(event.name for event in events if event.kind == 'timing')
+        self.assertEqual(stages, set(['classify', 'configure', 'synthesize', 'decode', 'postprocess', 'play']))
+        self.assertEqual(collector.counters[('cache_hit', (('engine', 'render'),))], 1)
+        self.assertEqual(collector.counters[('bytes', (('engine', 'render'),))], 11200)
+        text = collector.prometheus()
+        self.assertIn('talkey_cache_miss_total{engine="render"} 1\n', text)
+        self.assertIn('talkey_play_seconds_count{engine="render"} 2\n', text)
+
+    def test_errors(self):
+        FailingTTS.fail = True
+        tts = make_talkey([FailingTTS])
+        collector = MetricsCollector()
+        tts.instrumentation.add_listener(collector)
+        self.assertRaises(TTSError, tts.synthesize, 'Cows go moo', 'en')
+        self.assertEqual(collector.counters[('error', (('engine', 'failing'), ('stage', 'synthesize')))], 1)
+
+    def test_statsd_line(self):
+        self.assertEqual(statsd_line(Event('timing', 'play', 0.25, {'engine': 'espeak'})), 'talkey.play:250|ms|#engine:espeak')
+        self.assertEqual(statsd_line(Event('count', 'cache_hit', 1, {})), 'talkey.cache_hit:1|c')
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_benchmark_run(self):
+        from talkey import benchmark
+        ret = benchmark.run(repeat=1, only=['classify', 'synthesis'])
+        self.assertEqual(sorted(ret['results'].keys()), ['classify', 'synthesis'])
+        self.assertEqual(sorted(ret['results']['synthesis']['bench-subprocess'].keys()), ['long', 'medium', 'short'])
+        self.assertNotIn('bench-subprocess', _ENGINE_MAP)
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def test_profiling(self):
+        import json
+        import shutil
+        directory = tempfile.mkdtemp()
+        try:
+            tts = make_talkey([SubprocessRenderTTS], profile={'directory': directory, 'sample_rate': 1.0, 'max_files': 2})
+            for _ in range(3):
+                tts.say('Cows go moo')
+            names = sorted(listdir(directory))
+            self.assertEqual(len(names), 4)
+            self.assertEqual(set(name.rsplit('.', 1)[1] for name in names), set(['prof', 'json']))
+            with open(join(directory, names[-1] if names[-1].endswith('json') else names[-2])) as f:
+                data = json.load(f)
+            self.assertEqual(data['label'], 'say')
+            self.assertGreater(data['subprocess_time'], 0)
+            self.assertIn('classify', [stage['stage'] for stage in data['stages']])
+            self.assertFalse(tts.instrumentation.enabled)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_other_files_kept(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with open(join(directory, 'notes.json'), 'w') as f:
+                f.write('{}')
+            tts = make_talkey([RenderTTS], profile={'directory': directory, 'sample_rate': 1.0, 'max_files': 1})
+            for _ in range(2):
+                tts.synthesize('Cows go moo', 'en')
+            names = sorted(listdir(directory))
+            self.assertEqual(len(names), 3)
+            self.assertIn('notes.json', names)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_dump_failure(self):
+        directory = tempfile.mkdtemp()
+        try:
+            # Not a directory
+            fname = join(directory, 'profiles')
+            with open(fname, 'w') as f:
+                f.write('')
+            tts = make_talkey([RenderTTS], profile={'directory': fname, 'sample_rate': 1.0})
+            self.assertEqual(tts.synthesize('Cows go moo', 'en').nframes, 5600)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_not_sampled(self):
+        directory = join(tempfile.gettempdir(), 'talkey-not-sampled')
+        tts = make_talkey([RenderTTS], profile={'directory': directory, 'sample_rate': 0.0})
+        tts.say('Cows go moo')
+        self.assertFalse(isdir(directory))
+
+
+class SynthesisPoolTest(unittest.TestCase):
+
+    def test_pool_result(self):
+        pool = SynthesisPool(2)
+        job = pool.submit(lambda a, b: a + b, 1, b=2)
+        self.assertEqual(job.result(5), 3)
+        job = pool.submit(lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            job.result(5)
+        pool.shutdown()
+        self.assertEqual(pool.stats()['failed'], 1)
+        self.assertEqual(pool.stats()['completed'], 2)
+
+    def test_pool_engine_limit(self):
+        pool = SynthesisPool(4, engine_limits={'slow': 1})
+        lock = threading.Lock()
+        state = {'running': 0, 'peak': 0}
+
+        def work():
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.01)
+            with lock:
+                state['running'] -= 1
+
+        jobs = [pool.submit(work, engine='slow') for _ in range(5)]
+        for job in jobs:
+            job.result(5)
+        pool.shutdown()
+        self.assertEqual(state['peak'], 1)
+
+    def test_pool_fairness(self):
+        pool = SynthesisPool(1)
+        started, gate = threading.Event(), threading.Event()
+        order = []
+        pool.submit(lambda: started.set() or gate.wait(5))
+        started.wait(5)
+        jobs = [pool.submit(order.append, 'a%d' % num, caller='a') for num in range(3)]
+        jobs += [pool.submit(order.append, 'b%d' % num, caller='b') for num in range(3)]
+        self.assertEqual(pool.stats()['callers'], {'a': 3, 'b': 3})
+        gate.set()
+        for job in jobs:
+            job.result(5)
+        pool.shutdown()
+        self.assertEqual(order, ['a0', 'b0', 'a1', 'b1', 'a2', 'b2'])
+
+    def test_pool_priority(self):
+        pool = SynthesisPool(1)
+        started, gate = threading.Event(), threading.Event()
+        order = []
+        pool.submit(lambda: started.set() or gate.wait(5))
+        started.wait(5)
+        jobs = [pool.submit(order.append, 'low', caller='a')]
+        jobs += [pool.submit(order.append, 'normal', caller='b', priority=1)]
+        jobs += [pool.submit(order.append, 'high', caller='a', priority=5)]
+        gate.set()
+        for job in jobs:
+            job.result(5)
+        pool.shutdown()
+        self.assertEqual(order, ['high', 'normal', 'low'])
+
+
+# Stands in for a streaming engine, writes WAV to stdout in chunks
+WAV_WRITER = '''
+import sys, time
+out = sys.stdout.buffer if hasattr(sys.stdout, 'buffer') else sys.stdout
+if sys.argv[1] == 'fail':
+    sys.exit(3)
+if sys.argv[1] == 'bad':
+    out.write(b'Not a WAV file at all')
+    sys.exit(0)
+out.write(bytes(bytearray.fromhex(sys.argv[2])))
+out.flush()
+for _ in range(5):
+    out.write(b'\\x01\\x02' * 800)
+    out.flush()
+    time.sleep(float(sys.argv[3]))
+'''
+
+
+class StreamTTS(RenderTTS):
+    'Render engine that streams from a subprocess'
+    SLUG = 'streaming'
+    mode = 'ok'
+    delay = 0.0
+
+    def _synthesize_stream(self, phrase, language, voice, voiceinfo, options):
+        header = Audio(b'', 1, 2, 16000).wav_header(STREAM_LENGTH)
+        return self._stream_call([
+            sys.executable, '-c', WAV_WRITER, StreamTTS.mode, codecs.encode(header, 'hex').decode('ascii'),
+            str(StreamTTS.delay)
+        ], chunk_size=1600)
+
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        StreamTTS.mode = 'ok'
+        StreamTTS.delay = 0.0
+
+    def test_read_wav_stream(self):
+        buf = io.BytesIO()
+        tone(0.1).write(buf)
+        buf.seek(0)
+        chunks = list(read_wav_stream(buf, 333))
+        self.assertEqual(len(chunks), 5)
+        self.assertTrue(all(len(chunk.frames) % 2 == 0 for chunk in chunks))
+        self.assertEqual(b''.join(chunk.frames for chunk in chunks), tone(0.1).frames)
+        with self.assertRaisesRegexp(ValueError, 'Not a WAV stream'):
+            list(read_wav_stream(io.BytesIO(b'RIFX' + b'\x00' * 40)))
+        with self.assertRaisesRegexp(ValueError, 'Truncated WAV stream'):
+            list(read_wav_stream(io.BytesIO(b'RIFF'), 333))
+
+    def test_synthetic(self):
+        eng = SyntheticTTS(enabled=True, latency=0.5)
+        start = time.time()
+        chunks = eng.synthesize_stream('Old McDonald had a farm', language='en')
+        first = next(chunks)
+        self.assertLess(time.time() - start, 0.25)
+        chunks = [first] + list(chunks)
+        self.assertGreaterEqual(time.time() - start, 0.45)
+        self.assertEqual(len(chunks), 14)
+        eng = SyntheticTTS(enabled=True)
+        self.assertEqual(concatenate(chunks).frames, eng.synthesize('Old McDonald had a farm', language='en').frames)
+
+    def test_subprocess(self):
+        eng = StreamTTS(enabled=True)
+        chunks = list(eng.synthesize_stream('Cows go moo'))
+        self.assertEqual([len(chunk.frames) for chunk in chunks], [1600] * 5)
+        self.assertEqual(chunks[0].framerate, 16000)
+
+        StreamTTS.delay = 1.0
+        start = time.time()
+        chunks = eng.synthesize_stream('Cows go moo')
+        next(chunks)
+        chunks.close()
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(eng._procs, set())  # pylint: disable=W0212
+
+        StreamTTS.mode = 'bad'
+        with self.assertRaisesRegexp(TTSError, 'Could not decode streaming output'):
+            list(eng.synthesize_stream('Cows go moo'))
+        StreamTTS.mode = 'fail'
+        with self.assertRaisesRegexp(TTSError, 'failed with exit status 3'):
+            list(eng.synthesize_stream('Cows go moo'))
+
+    def test_subprocess_timeout(self):
+        eng = StreamTTS(enabled=True, timeout=0.5)
+        # Time taken by the consumer does not count
+        chunks = []
+        for chunk in eng.synthesize_stream('Cows go moo'):
+            time.sleep(0.2)
+            chunks.append(chunk)
+        self.assertEqual(len(chunks), 5)
+
+        StreamTTS.delay = 10.0
+        start = time.time()
+        with self.assertRaisesRegexp(TTSError, 'Timed out after 0.5s'):
+            list(eng.synthesize_stream('Cows go moo'))
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(eng._procs, set())  # pylint: disable=W0212
+
+    def test_failover_and_cache(self):
+        StreamTTS.mode = 'fail'
+        tts = make_talkey([StreamTTS, RenderTTS], cache_size=4)
+        chunks = list(tts.synthesize_stream('Cows go moo', 'en'))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(tts.health['streaming'].failures, 1)
+
+        StreamTTS.mode = 'ok'
+        tts = make_talkey([StreamTTS], cache_size=4)
+        self.assertEqual(len(list(tts.synthesize_stream('Cows go moo', 'en'))), 5)
+        # Cached once complete
+        chunks = list(tts.synthesize_stream('Cows go moo', 'en'))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(len(chunks[0].frames), 8000)
+
+    def test_say_streamed(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            played = join(tmpdir, 'played.wav')
+            capture = CaptureSink()
+            sink = [capture, DeviceSink([sys.executable, '-c', PLAYER, played])]
+            tts = Talkey(sink=sink, stream=True, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+            tts.say('Cows go moo', 'en')
+            expected = tts.synthesize('Cows go moo', 'en').frames
+            self.assertEqual(capture.last.frames, expected)
+            with open(played, 'rb') as f:
+                self.assertEqual(b''.join(chunk.frames for chunk in read_wav_stream(f)), expected)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_fan_out_stream(self):
+        received = threading.Event()
+        waited = []
+
+        class StreamCaptureSink(CaptureSink):
+            def write_stream(self, chunks):
+                for chunk in chunks:
+                    received.set()
+                    self.write(chunk)
+
+        def source():
+            yield tone(0.1)
+            # Passed on before the rest is rendered
+            waited.append(received.wait(5))
+            yield tone(0.2)
+
+        capture, streamed = CaptureSink(), StreamCaptureSink()
+        FanOutSink([capture, streamed]).write_stream(source())
+        self.assertEqual(waited, [True])
+        self.assertEqual(capture.last.frames, tone(0.1).frames + tone(0.2).frames)
+        self.assertEqual([len(audio.frames) for audio in streamed.captured], [1600, 3200])
+
+    def test_device_sink_stream(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            played = join(tmpdir, 'played.wav')
+            DeviceSink([sys.executable, '-c', PLAYER, played]).write_stream(iter([tone(0.1), tone(0.2)]))
+            with open(played, 'rb') as f:
+                frames = b''.join(chunk.frames for chunk in read_wav_stream(f))
+            self.assertEqual(frames, tone(0.1).frames + tone(0.2).frames)
+
+            # Without a sink, engines pipe to a player themselves
+            eng = SyntheticTTS(enabled=True)
+            eng._play_pipe(  # pylint: disable=W0212
+                eng.synthesize_stream('Cows go moo', language='en'), [sys.executable, '-c', PLAYER, played]
+            )
+            with open(played, 'rb') as f:
+                frames = b''.join(chunk.frames for chunk in read_wav_stream(f))
+            self.assertEqual(frames, eng.synthesize('Cows go moo', language='en').frames)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class SinkTest(unittest.TestCase):
+
+    def test_synthetic_capture(self):
+        sink = CaptureSink()
+        tts = Talkey(sink=sink, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+        tts.say('Cows go moo', 'en')
+        tts.say('Old McDonald had a farm', 'en')
+        self.assertEqual(len(sink), 2)
+        self.assertAlmostEqual(sink.captured[0].duration, 11 * 0.06, places=2)
+        self.assertAlmostEqual(sink.last.duration, 23 * 0.06, places=2)
+        sink.clear()
+        self.assertIsNone(sink.last)
+
+    def test_synthetic_failure_rate(self):
+        eng = SyntheticTTS(enabled=True, failure_rate=1.0)
+        with self.assertRaisesRegexp(TTSError, 'Synthetic failure'):
+            eng.synthesize('Cows go moo')
+
+    def test_synthetic_deterministic(self):
+        def outcomes():
+            eng = SyntheticTTS(enabled=True, failure_rate=0.5, seed=42)
+            eng.sink = NullSink()
+            result = []
+            for _ in range(20):
+                try:
+                    eng.say('Cows go moo', language='en')
+                    result.append(True)
+                except TTSError:
+                    result.append(False)
+            return result, eng.sink.count
+        result, count = outcomes()
+        self.assertEqual(outcomes(), (result, count))
+        self.assertEqual(result.count(True), count)
+        self.assertTrue(0 < count < 20)
+
+    def test_fan_out(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            capture, called = CaptureSink(), []
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.bind(('127.0.0.1', 0))
+            server.listen(1)
+            played = join(tmpdir, 'played.wav')
+            device = DeviceSink([sys.executable, '-c', PLAYER, played])
+            sinks = [capture, CallbackSink(called.append), FileSink(join(tmpdir, 'archive')), device,
+                     SocketSink(server.getsockname())]
+            tts = Talkey(sink=sinks, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+            tts.say('Cows go moo', 'en')
+            conn, _ = server.accept()
+            audio = capture.last
+            received = b''
+            while len(received) < len(audio.frames):
+                received += conn.recv(65536)
+            conn.close()
+            server.close()
+            tts.sink.close()
+
+            # All sinks got the very same buffer
+            self.assertIs(called[0], audio)
+            self.assertEqual(received, audio.frames)
+            self.assertEqual(Audio.from_file(join(tmpdir, 'archive', '00001.wav')).frames, audio.frames)
+            self.assertEqual(Audio.from_file(played).frames, audio.frames)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_fan_out_errors(self):
+        capture = CaptureSink()
+        sink = FanOutSink([DeviceSink([sys.executable, '-c', 'import sys; sys.exit(3)']), capture])
+        with self.assertRaisesRegexp(TTSError, '1 of 2 sinks failed: DeviceSink'):
+            sink.write(tone(0.1))
+        self.assertEqual(len(capture), 1)
+
+    def test_device_stop(self):
+        sink = DeviceSink([sys.executable, '-c', 'import time; time.sleep(10)'])
+        errors = []
+
+        def write():
+            try:
+                sink.write(tone(0.1))
+            except TTSError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=write)
+        start = time.time()
+        thread.start()
+        while sink._proc is None:  # pylint: disable=W0212
+            time.sleep(0.01)
+        sink.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertLess(time.time() - start, 5)
+        self.assertIsInstance(errors[0], TTSCancelled)
+
+    def test_null_sink(self):
+        sink = NullSink()
+        eng = SyntheticTTS(enabled=True)
+        eng.sink = sink
+        eng.say('Cows go moo', language='en')
+        self.assertEqual(sink.count, 1)
+        self.assertEqual(sink.bytes, len(eng.synthesize('Cows go moo', language='en').frames))
+
+
+class DaemonTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = CaptureSink()
+        self.tts = Talkey(sink=self.sink, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+        self.tmpdir = tempfile.mkdtemp()
+        self.daemon = TalkeyDaemon(self.tts, join(self.tmpdir, 'talkey.sock'), workers=2)
+        self.daemon.start()
+        self.client = TalkeyClient(self.daemon.address, timeout=10)
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.tts.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_say(self):
+        self.client.say('Cows go moo', 'en')
+        self.assertEqual(len(self.sink), 1)
+        self.assertAlmostEqual(self.sink.last.duration, 11 * 0.06, places=2)
+
+    def test_say_nowait(self):
+        self.client.say('Cows go moo', 'en', wait=False)
+        self.daemon.pool.shutdown()
+        self.assertEqual(len(self.sink), 1)
+
+    def test_synthesize(self):
+        audio = self.client.synthesize('Cows go moo', 'en')
+        self.assertEqual(audio.frames, self.tts.synthesize('Cows go moo', 'en').frames)
+        self.assertEqual(len(self.sink), 0)
+
+    def test_classify(self):
+        self.assertEqual(self.client.classify('Old McDonald had a farm'), 'en')
+        self.assertIn('en', self.client.languages)
+
+    def test_errors(self):
+        with self.assertRaisesRegexp(TTSError, 'Bad request'):
+            self.client._request('POST', '/say', {})
+        with self.assertRaisesRegexp(TTSError, 'Unknown path'):
+            self.client._request('GET', '/moo')
+        with self.assertRaisesRegexp(TTSError, 'Could not reach'):
+            TalkeyClient(join(self.tmpdir, 'missing.sock')).classify('moo')
+
+    def test_stats(self):
+        self.client.say('Cows go moo', 'en')
+        stats = self.client.stats()
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['engines']['synthetic']['state'], CLOSED)
+        self.assertIn('talkey_synthesize_seconds_count{engine="synthetic"} 1', self.client.metrics())
+
+    def test_tcp(self):
+        daemon = TalkeyDaemon(self.tts, ('127.0.0.1', 0))
+        daemon.start()
+        try:
+            self.assertEqual(TalkeyClient(daemon.address, timeout=10).classify('Old McDonald had a farm'), 'en')
+        finally:
+            daemon.shutdown()
+
+
+class CLITest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.config = join(self.tmpdir, 'config.json')
+        with open(self.config, 'w') as f:
+            json.dump({'engine_preference': ['synthetic'], 'synthetic': {'options': {'enabled': True}}}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_cli(self, argv, stdin=''):
+        out = io.StringIO()
+        ret = cli.main(['--config', self.config] + argv, out=out, stdin=io.StringIO(stdin))
+        return ret, out.getvalue().splitlines()
+
+    def test_render_args(self):
+        outdir = join(self.tmpdir, 'out')
+        ret, lines = self.run_cli(['--lang', 'en', 'render', '-o', outdir, 'Cows go moo', 'Moo'])
+        self.assertEqual(ret, 0)
+        self.assertEqual(lines, [join(outdir, '00001.wav'), join(outdir, '00002.wav')])
+        self.assertAlmostEqual(Audio.from_file(lines[0]).duration, 11 * 0.06, places=2)
+
+    def test_render_stdin_parallel(self):
+        phrases = ['Phrase number %d' % num for num in range(10)]
+        ret, lines = self.run_cli(
+            ['--lang', 'en', 'render', '-o', self.tmpdir, '-j', '4', '--format', 'raw'],
+            '\n'.join(phrases) + '\n\n'
+        )
+        self.assertEqual(ret, 0)
+        self.assertEqual(lines, [join(self.tmpdir, '%05d.raw' % num) for num in range(1, 11)])
+        with open(lines[-1], 'rb') as f:
+            self.assertAlmostEqual(len(f.read()), 15 * 0.06 * 16000 * 2, delta=4)
+
+    def test_render_file(self):
+        fname = join(self.tmpdir, 'phrases.txt')
+        with open(fname, 'w') as f:
+            f.write('Cows go moo\nOld McDonald had a farm\n')
+        ret, lines = self.run_cli(['render', '-o', self.tmpdir, '--file', fname])
+        self.assertEqual(ret, 0)
+        self.assertEqual(len(lines), 2)
+
+    def test_languages(self):
+        ret, lines = self.run_cli(['languages'])
+        self.assertEqual(ret, 0)
+        self.assertIn('en', lines)
+
+    def test_say_connect(self):
+        sink = CaptureSink()
+        tts = Talkey(sink=sink, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+        daemon = TalkeyDaemon(tts, join(self.tmpdir, 'talkey.sock'))
+        daemon.start()
+        try:
+            ret, lines = self.run_cli(['--connect', daemon.address, '--lang', 'en', 'say'], 'Cows go moo\nMoo\n')
+        finally:
+            daemon.shutdown()
+            tts.close()
+        self.assertEqual(ret, 0)
+        self.assertEqual([round(audio.duration, 2) for audio in sink.captured], [0.66, 0.18])
+
+    def test_daemon_args(self):
+        import talkey.daemon
+        calls = []
+        daemon_main = talkey.daemon.main
+        talkey.daemon.main = lambda argv: calls.append(argv) or 0
+        try:
+            self.assertEqual(self.run_cli(['daemon', '--socket', 'talkey.sock'])[0], 0)
+            self.assertEqual(cli.main(['daemon', '--help']), 0)
+        finally:
+            talkey.daemon.main = daemon_main
+        self.assertEqual(calls, [['--config', self.config, '--socket', 'talkey.sock'], ['--help']])
+
+    def test_parse_address(self):
+        self.assertEqual(cli.parse_address('localhost:8128'), ('localhost', 8128))
+        self.assertEqual(cli.parse_address(':8128'), ('127.0.0.1', 8128))
+        self.assertEqual(cli.parse_address('/tmp/talkey.sock'), '/tmp/talkey.sock')
+
+
+class ProsodyTTS(SyntheticTTS):
+    'Synthetic engine with a speed option, that SSML prosody rate scales'
+    SLUG = 'prosody'
+    PROSODY_OPTIONS = {'rate': 'speed'}
+
+    def __init__(self, **_options):
+        self.speeds = []
+        super(ProsodyTTS, self).__init__(**_options)
+
+    def _get_options(self):
+        return {'speed': {'type': 'int', 'default': 100, 'min': 50, 'max': 200}}
+
+    def _synthesize_audio(self, phrase, language, voice, voiceinfo, options):
+        self.speeds.append((phrase, options['speed']))
+        return super(ProsodyTTS, self)._synthesize_audio(phrase, language, voice, voiceinfo, options)
+
+
+class NativeSSMLTTS(RenderTTS):
+    'Render engine with native SSML support'
+    SLUG = 'native-ssml'
+
+    def __init__(self, **_options):
+        self.markup = []
+        super(NativeSSMLTTS, self).__init__(**_options)
+
+    def _synthesize_ssml(self, markup, language, voice, voiceinfo, options, fname):
+        self.markup.append((markup, language, voice))
+        tone(0.1).write(fname)
+
+
+class SSMLTest(unittest.TestCase):
+
+    def test_parse(self):
+        segments = ssml.parse(
+            '<speak xml:lang="en-US">Hello <break time="250ms"/>'
+            '<voice name="af" xml:lang="af">Goeie <s>more</s></voice>'
+            '<prosody rate="fast" pitch="+10%"><prosody rate="200%">quick</prosody></prosody>'
+            '<break strength="strong"/></speak>'
+        )
+        self.assertEqual(segments, [
+            ssml.Segment('Hello', 'en', None, 1.0, 1.0, 0.0),
+            ssml.Segment('', None, None, 1.0, 1.0, 0.25),
+            ssml.Segment('Goeie more', 'af', 'af', 1.0, 1.0, 0.0),
+            ssml.Segment('quick', 'en', None, 2.5, 1.1, 0.0),
+            ssml.Segment('', None, None, 1.0, 1.0, 0.75),
+        ])
+        self.assertEqual(ssml.plain_text(segments), 'Hello Goeie more quick')
+
+    def test_parse_no_root(self):
+        self.assertEqual(ssml.parse('Cows <lang xml:lang="fr">vaches</lang>'), [
+            ssml.Segment('Cows', None, None, 1.0, 1.0, 0.0),
+            ssml.Segment('vaches', 'fr', None, 1.0, 1.0, 0.0),
+        ])
+
+    def test_parse_bad(self):
+        with self.assertRaisesRegexp(TTSError, 'Bad SSML'):
+            ssml.parse('<speak>Moo')
+        with self.assertRaisesRegexp(TTSError, 'Unsupported SSML element: audio'):
+            ssml.parse('<audio src="moo.wav"/>')
+        with self.assertRaisesRegexp(TTSError, 'Bad SSML rate: zippy'):
+            ssml.parse('<prosody rate="zippy">Moo</prosody>')
+        with self.assertRaisesRegexp(TTSError, 'Bad SSML break time: 1h'):
+            ssml.parse('<break time="1h"/>')
+
+    def test_to_ssml(self):
+        self.assertEqual(
+            ssml.to_ssml(ssml.parse('A &amp; B<break time="1s"/><prosody rate="slow">C</prosody>')),
+            '<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis">A &amp; B<break time="1000ms"/>'
+            '<prosody rate="75%" pitch="+0%">C</prosody></speak>'
+        )
+
+    def test_concatenate(self):
+        audio = concatenate([tone(0.5, framerate=8000), 0.25, tone(0.5, framerate=16000)])
+        self.assertEqual(audio.framerate, 8000)
+        self.assertAlmostEqual(audio.duration, 1.25, places=3)
+
+    def test_render_segments(self):
+        eng = ProsodyTTS(enabled=True)
+        audio = eng.synthesize_ssml(
+            'Cows go moo<break time="500ms"/><prosody rate="x-slow">slow</prosody>'
+            '<prosody rate="400%">fast</prosody><lang xml:lang="de">Kuh</lang>',
+            language='en'
+        )
+        self.assertEqual(eng.speeds, [('Cows go moo', 100), ('slow', 50), ('fast', 200), ('Kuh', 100)])
+        self.assertAlmostEqual(audio.duration, (11 + 4 + 4 + 3) * 0.06 + 0.5, places=2)
+
+    def test_render_bad_voice(self):
+        eng = ProsodyTTS(enabled=True)
+        with self.assertRaisesRegexp(TTSError, 'Bad voice: moo'):
+            eng.synthesize_ssml('<voice name="moo">Moo</voice>')
+        with self.assertRaisesRegexp(TTSError, 'No text'):
+            eng.synthesize_ssml('<break/>')
+
+    def test_render_native(self):
+        eng = NativeSSMLTTS(enabled=True)
+        eng.synthesize_ssml('Moo <break time="1s"/><lang xml:lang="af">Koei</lang>', language='en')
+        self.assertEqual(eng.markup, [(
+            '<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis"><voice name="en">Moo</voice>'
+            '<break time="1000ms"/><voice name="af">Koei</voice></speak>', 'en', 'en'
+        )])
+
+    def test_talkey(self):
+        sink = CaptureSink()
+        tts = Talkey(sink=sink, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+        tts.say_ssml('<speak xml:lang="de">Kuh<break time="1s"/>Kuh</speak>')
+        self.assertAlmostEqual(sink.last.duration, 6 * 0.06 + 1.0, places=2)
+        self.assertAlmostEqual(tts.synthesize_ssml('Old McDonald had a farm').duration, 23 * 0.06, places=2)
+
+
+class TemplateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = CaptureSink()
+        self.tts = Talkey(sink=self.sink, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+        self.rendered = []
+        self.tts.instrumentation.add_listener(
+            lambda event: self.rendered.append(event) if event.name == 'synthesize' else None
+        )
+
+    def test_template(self):
+        tmpl = self.tts.template(
+            'Train to {city} departs from platform {platform:02d}', slots={'platform': [1, 2, 3]}
+        )
+        self.assertEqual(tmpl.lang, 'en')
+        self.assertEqual(tmpl.slot_names, ['city', 'platform'])
+        tmpl.precompute()
+        self.assertEqual(len(self.rendered), 5)
+
+        tmpl.say(city='Paris', platform=2)
+        self.assertEqual(len(self.rendered), 6)
+        self.assertAlmostEqual(self.sink.last.duration, (8 + 5 + 21 + 2) * 0.06, places=2)
+        tmpl.say(city='Paris', platform=3)
+        self.assertEqual(len(self.rendered), 6)
+        tmpl.synthesize(city='Rome', platform=12)
+        self.assertEqual(len(self.rendered), 8)
+
+    def test_template_errors(self):
+        tmpl = self.tts.template('Train to {city}', lang='en')
+        with self.assertRaisesRegexp(TTSError, 'Missing template slots: city'):
+            tmpl.synthesize()
+        with self.assertRaisesRegexp(TTSError, 'must be named'):
+            self.tts.template('Train to {}')
+        with self.assertRaisesRegexp(TTSError, 'Bad template'):
+            self.tts.template('Train to {city')
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_english(self):
+        norm = Normalizer()
+        self.assertEqual(
+            norm.normalize('Dr.  Smith lives at 221 Baker St. &  pays $1,250 (50%)', 'en'),
+            'doctor Smith lives at two hundred and twenty-one Baker street and pays '
+            'one thousand two hundred and fifty dollars (fifty percent)'
+        )
+        self.assertEqual(norm.normalize('It is 3.5 vs. 2,000,000.', 'en'), 'It is three point five versus two million.')
+        self.assertEqual(norm.normalize('Version v1.2', 'en'), 'Version v1.2')
+        # Only whitespace is normalized for all languages
+        self.assertEqual(norm.normalize(' Dr. \n Smith  5 '), 'Dr. Smith 5')
+        self.assertEqual(norm.normalize('Dr. Smith 5', 'af'), 'Dr. Smith 5')
+
+    def test_custom(self):
+        norm = Normalizer(defaults=False)
+        norm.add_abbreviations({'bv.': 'byvoorbeeld'}, 'af')
+        norm.add_rule(r'#', ' nommer ', 'af')
+        self.assertEqual(norm.normalize('BV. kamer #5', 'af'), 'byvoorbeeld kamer nommer 5')
+        self.assertEqual(norm.normalize('BV. kamer #5', 'en'), 'BV. kamer #5')
+
+    def test_memoized(self):
+        norm = Normalizer(cache_size=2)
+        self.assertIs(norm.normalize('Dr. %s' % 'Who', 'en'), norm.normalize('Dr. Who', 'en'))
+        norm.normalize('a', 'en')
+        norm.normalize('b', 'en')
+        self.assertEqual(len(norm._memo), 2)
+
+    def test_talkey(self):
+        tts = Talkey(
+            normalize=True, cache_size=8, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}},
+        )
+        collector = MetricsCollector()
+        tts.instrumentation.add_listener(collector)
+        first = tts.synthesize('Meet Dr. Smith at 5')
+        second = tts.synthesize(' Meet  DR. Smith at   5 ')
+        self.assertIs(first, second)
+        self.assertAlmostEqual(first.duration, len('Meet doctor Smith at five') * 0.06, places=2)
+        self.assertEqual(collector.counters[('cache_hit', (('engine', 'synthetic'),))], 1)
+
+    def test_ssml(self):
+        markup = (
+            '<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis">Pay $5 &amp; '
+            '<prosody rate="150%">see Dr. Smith</prosody><break time="1s"/><lang xml:lang="af">Dr. 5</lang></speak>'
+        )
+        self.assertEqual(
+            [seg.text for seg in ssml.parse(ssml.normalize(markup, Normalizer(), 'en'))],
+            ['Pay five dollars and', 'see doctor Smith', '', 'Dr. 5'],
+        )
+        tts = make_talkey([ProsodyTTS], normalize=True)
+        tts.synthesize_ssml(markup, 'en')
+        self.assertEqual(tts.engines[0].speeds, [('Pay five dollars and', 100), ('see doctor Smith', 150), ('Dr. 5', 100)])
+
+    def test_festival_escape(self):
+        self.assertEqual(FESTIVAL_ESCAPE_RE.sub(r'\\\1', 'say "hi" \\ moo'), 'say \\"hi\\" \\\\ moo')
+
+
+class GenderTTS(SyntheticTTS):
+    'Synthetic engine with gendered voices'
+    SLUG = 'gender'
+
+    def _get_languages(self):
+        return {
+            'en': {'default': 'alice', 'voices': {
+                'alice': {'gender': 'F', 'locale': 'en-gb'}, 'bob': {'gender': 'M', 'locale': 'en-us'},
+            }},
+            'de': {'default': 'heidi', 'voices': {'heidi': {'gender': 'female', 'locale': 'de_DE'}}},
+        }
+
+
+class VoiceRegistryTest(unittest.TestCase):
+
+    def test_voice(self):
+        voice = Voice('espeak', 'en-us', 'en', 'en-us', 'M', True, {'pty': 5})
+        self.assertEqual((voice.locale, voice.gender), ('en_US', 'male'))
+        self.assertEqual(voice, Voice('espeak', 'en-us', 'en'))
+        with self.assertRaises(AttributeError):
+            voice.gender = 'female'
+        with self.assertRaises(AttributeError):
+            voice.pitch = 5
+
+    def test_registry(self):
+        registry = VoiceRegistry.merge([
+            VoiceRegistry.from_languages('gender', GenderTTS(enabled=True).languages),
+            VoiceRegistry.from_languages('dummy', {'en': {'default': 'en', 'voices': {'en': {}}}}),
+        ])
+        self.assertEqual(len(registry), 4)
+        self.assertEqual(registry.languages(), set(['en', 'de']))
+        self.assertEqual([voice.name for voice in registry.find(language='de', gender='F')], ['heidi'])
+        self.assertEqual([voice.name for voice in registry.find(locale='en_US')], ['bob'])
+        self.assertEqual(sorted(voice.name for voice in registry.find(language='en', default=True)), ['alice', 'en'])
+        self.assertEqual(registry.find(language='en', gender='robot'), ())
+        self.assertEqual(registry.find(engine='moo'), ())
+        self.assertEqual(registry.get('gender', 'en', 'bob').gender, 'male')
+        self.assertIsNone(registry.get('gender', 'en', 'heidi'))
+
+    def test_shared_languages(self):
+        self.assertIs(RenderTTS(enabled=True).languages, SyntheticTTS(enabled=True).languages)
+        self.assertIs(RenderTTS(enabled=True).languages, DUMMY_LANGUAGES)
+
+    def test_talkey(self):
+        _ENGINE_MAP[GenderTTS.SLUG] = GenderTTS
+        tts = Talkey(
+            engine_preference=['synthetic', 'gender'],
+            synthetic={'options': {'enabled': True}}, gender={'options': {'enabled': True}},
+        )
+        self.assertIn('de', tts.languages)
+        self.assertEqual(
+            [(voice.engine, voice.name) for voice in tts.find_voices(language='en')],
+            [('synthetic', 'en'), ('gender', 'alice'), ('gender', 'bob')]
+        )
+        self.assertEqual([voice.name for voice in tts.find_voices(language='de', gender='female')], ['heidi'])
+        tts.health['synthetic'].record_latency(1.0, 10)
+        tts.health['gender'].record_latency(0.1, 10)
+        self.assertEqual(
+            [voice.engine for voice in tts.find_voices(language='en', order='latency')],
+            ['gender', 'gender', 'synthetic']
+        )
+        voice = tts.find_voices(language='en', gender='male')[0]
+        self.assertAlmostEqual(
+            tts.get_engine(voice.engine).synthesize('Moo', language=voice.language, voice=voice.name).duration,
+            0.18, places=2
+        )
+        with self.assertRaisesRegexp(TTSError, 'Unknown engine'):
+            tts.get_engine('moo')
+
+
+class ClassifierTest(unittest.TestCase):
+
+    def test_shared(self):
+        self.assertIs(get_classifier(['en', 'af']), get_classifier(set(['af', 'en'])))
+        self.assertEqual(sorted(get_classifier(['en', 'af', 'moo']).nb_classes), ['af', 'en'])
+        self.assertEqual(len(get_classifier(['moo']).nb_classes), len(DETECTABLE_LANGS))
+        self.assertEqual(len(get_classifier().nb_classes), len(DETECTABLE_LANGS))
+
+    def test_instances_independent(self):
+        _ENGINE_MAP[OptionTTS.SLUG] = OptionTTS
+        restricted = Talkey(engine_preference=['option'], option={'options': {'enabled': True}})
+        full = Talkey(engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+        self.assertEqual(restricted.languages, set(['en', 'af']))
+        self.assertIn(restricted.classify('Der alte McDonald hatte eine Farm'), ['en', 'af'])
+        self.assertEqual(full.classify('Der alte McDonald hatte eine Farm'), 'de')
+        # The global langid identifier is left alone
+        self.assertEqual(len(langid.rank('moo')), len(DETECTABLE_LANGS))
+
+    def test_rank_many(self):
+        classifier = get_classifier()
+        texts = [t[2] for t in TalkeyTest.TXTS] + ['', u'Caf\xe9 cr\xe8me br\xfbl\xe9e', 'moo ' * 100]
+        scores = rank_many(classifier, texts, batch_size=2)
+        for text, row in zip(texts, scores):
+            expected = dict(classifier.rank(text))
+            for lang, score in zip(classifier.nb_classes, row):
+                self.assertAlmostEqual(score, expected[lang], delta=abs(expected[lang]) * 1e-5)
+
+    def test_classify_many(self):
+        texts = [t[2] for t in TalkeyTest.TXTS]
+        opts = {'synthetic': {'options': {'enabled': True}}}
+        tts = Talkey(engine_preference=['synthetic'], **opts)
+        self.assertEqual(tts.classify_many(texts), [t[1] for t in TalkeyTest.TXTS])
+        self.assertEqual(tts.classify_many(iter([])), [])
+        tts = Talkey(engine_preference=['synthetic'], preferred_languages=['en', 'af'], **opts)
+        self.assertEqual(tts.classify_many(texts), [t[0] for t in TalkeyTest.TXTS])
+        self.assertEqual(tts.classify_many(texts), [tts.classify(text) for text in texts])
+
+
+class GateSink(CaptureSink):
+    'Captures audio that plays to the end, which is once the gate is open, unless stopped first'
+
+    def __init__(self):
+        CaptureSink.__init__(self)
+        self.playing = threading.Event()
+        self.gate = threading.Event()
+        self.halt = threading.Event()
+        self.stops = 0
+
+    def write(self, audio):
+        self.halt.clear()
+        self.playing.set()
+        while not (self.gate.is_set() or self.halt.is_set()):
+            time.sleep(0.005)
+        if self.halt.is_set():
+            raise TTSCancelled('Stopped')
+        CaptureSink.write(self, audio)
+
+    def stop(self):
+        self.stops += 1
+        self.halt.set()
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = GateSink()
+        self.tts = Talkey(sink=self.sink, engine_preference=['synthetic'], synthetic={'options': {'enabled': True}})
+        self.metrics = MetricsCollector()
+        self.tts.instrumentation.add_listener(self.metrics)
+
+    def durations(self):
+        return [round(audio.duration / 0.06) for audio in self.sink.captured]
+
+    def test_preempt(self):
+        sched = self.tts.scheduler()
+        routine = sched.announce('Cows go moo', 'en')
+        self.assertTrue(self.sink.playing.wait(5))
+        later = sched.announce('Old McDonald had a farm', 'en')
+        urgent = sched.announce('Fire in the building', 'en', priority=10)
+        self.sink.gate.set()
+        self.assertTrue(sched.join(5))
+        sched.close()
+        self.assertEqual(self.sink.stops, 1)
+        # The stopped message plays again, before those queued after it
+        self.assertEqual(self.durations(), [20, 11, 23])
+        self.assertEqual([routine.status, later.status, urgent.status], [DONE, DONE, DONE])
+        self.assertTrue(routine.started < urgent.started < later.started)
+
+    def test_preempt_drop(self):
+        sched = self.tts.scheduler(requeue_preempted=False)
+        routine = sched.announce('Cows go moo', 'en')
+        self.assertTrue(self.sink.playing.wait(5))
+        sched.announce('Fire in the building', 'en', priority=10)
+        self.sink.gate.set()
+        self.assertEqual(routine.wait(5), PREEMPTED)
+        self.assertTrue(sched.join(5))
+        self.assertEqual(self.durations(), [20])
+        self.assertEqual(sched.stats()['preempted'], 1)
+
+    def test_preempt_not_stopped(self):
+        # Sinks that can not stop play to the end, which is not preempted
+        self.sink.stop = lambda: None
+        sched = self.tts.scheduler()
+        routine = sched.announce('Cows go moo', 'en')
+        self.assertTrue(self.sink.playing.wait(5))
+        sched.announce('Fire in the building', 'en', priority=10)
+        self.sink.gate.set()
+        self.assertTrue(sched.join(5))
+        self.assertEqual(routine.status, DONE)
+        self.assertEqual(self.durations(), [11, 20])
+        self.assertEqual(sched.stats()['preempted'], 0)
+
+    def test_no_preempt(self):
+        sched = self.tts.scheduler(preempt=False)
+        sched.announce('Cows go moo', 'en')
+        self.assertTrue(self.sink.playing.wait(5))
+        sched.announce('Old McDonald had a farm', 'en')
+        sched.announce('Fire in the building', 'en', priority=10)
+        self.sink.gate.set()
+        self.assertTrue(sched.join(5))
+        self.assertEqual(self.sink.stops, 0)
+        self.assertEqual(self.durations(), [11, 20, 23])
+
+    def test_expire_and_coalesce(self):
+        sched = self.tts.scheduler()
+        sched.announce('Cows go moo', 'en')
+        self.assertTrue(self.sink.playing.wait(5))
+        first = sched.announce('Platform one', 'en', key='platform-1')
+        update = sched.announce('Platform one is delayed', 'en', key='platform-1')
+        stale = sched.announce('Departing now', 'en', ttl=0.01)
+        past = sched.announce('Departed', 'en', deadline=time.time() - 1)
+        self.assertEqual(first.wait(1), SUPERSEDED)
+        time.sleep(0.05)
+        self.sink.gate.set()
+        self.assertTrue(sched.join(5))
+        self.assertEqual([update.status, stale.status, past.status], [DONE, EXPIRED, EXPIRED])
+        self.assertEqual(self.durations(), [11, 23])
+
+        stats = sched.stats()
+        self.assertEqual([stats[key] for key in ['done', 'expired', 'superseded', 'queued']], [2, 2, 1, 0])
+        self.assertTrue(0 < stats['latency_mean'] <= stats['latency_max'])
+        metrics = self.metrics.prometheus()
+        self.assertIn('talkey_expired_total{priority="0"} 2', metrics)
+        self.assertIn('talkey_superseded_total{priority="0"} 1', metrics)
+        self.assertIn('talkey_queue_latency_seconds_count{priority="0"} 2', metrics)
+
+        sched.close()
+        with self.assertRaisesRegexp(TTSError, 'Scheduler is closed'):
+            sched.announce('Cows go moo', 'en')
+
+
+class NativeTest(unittest.TestCase):
+
+    def test_fallback(self):
+        self.assertIsNone(load_espeak('/nonexistent/libespeak-ng.so'))
+        self.assertIsNone(load_flite('/nonexistent/libflite.so'))
+        for cls in [EspeakTTS, FliteTTS]:
+            eng = cls(in_process=True, library='/nonexistent/lib.so')
+            self.assertIsNone(eng.library)
+            self.assertFalse(eng._synthesizes_audio())  # pylint: disable=W0212
+            self.assertIsNone(cls().library)
+
+    @unittest.skipUnless(load_espeak(), 'libespeak-ng not available')
+    def test_espeak(self):
+        eng = EspeakTTS(in_process=True)
+        self.assertIs(eng.library, load_espeak())
+        audio = eng.synthesize('Old McDonald had a farm', language='en')
+        self.assertEqual(audio.framerate, eng.library.framerate)
+        self.assertGreater(audio.duration, 0.5)
+        with self.assertRaisesRegexp(TTSError, 'Could not load espeak voice'):
+            eng.library.synthesize('Cows go moo', 'moo', 150, 50)
+
+    @unittest.skipUnless(load_flite(), 'libflite not available')
+    def test_flite(self):
+        eng = FliteTTS(in_process=True)
+        audio = eng.synthesize('Old McDonald had a farm', language='en')
+        self.assertGreater(audio.duration, 0.5)
+        with self.assertRaisesRegexp(TTSError, 'Could not load flite voice'):
+            eng.library.synthesize('Cows go moo', 'moo')
+
+
 class CreateEngineTest(unittest.TestCase):
 
     def test_create_engine(self):
@@ -211,7 +1810,7 @@ class BaseTTSTest(unittest.TestCase):
     # pylint: disable=E1102
     CLS = None
     SLUG = None
-    INIT_ATTRS = ['enabled']
+    INIT_ATTRS = ['enabled', 'timeout']
     CONF = {}
     OBJ_ATTRS = []
     EVAL_PLAY = True
@@ -290,19 +1889,19 @@ class DummyTTSTest(BaseTTSTest):
 class FestivalTTSTest(BaseTTSTest):
     CLS = FestivalTTS
     SLUG = 'festival'
-    INIT_ATTRS = ['enabled', 'festival']
+    INIT_ATTRS = ['enabled', 'festival', 'timeout']
 
 
 class FliteTTSTest(BaseTTSTest):
     CLS = FliteTTS
     SLUG = 'flite'
-    INIT_ATTRS = ['enabled', 'flite']
+    INIT_ATTRS = ['enabled', 'flite', 'in_process', 'library', 'timeout']
 
 
 class EspeakTTSTest(BaseTTSTest):
     CLS = EspeakTTS
     SLUG = 'espeak'
-    INIT_ATTRS = ['enabled', 'espeak', 'mbrola', 'mbrola_voices', 'passable_only']
+    INIT_ATTRS = ['enabled', 'espeak', 'in_process', 'library', 'mbrola', 'mbrola_voices', 'passable_only', 'timeout']
     OBJ_ATTRS = ['words_per_minute', 'pitch_adjustment', 'variant']
     EVAL_PLAY = True
 
@@ -334,21 +1933,22 @@ class EspeakTTSTest(BaseTTSTest):
 class PicoTTSTest(BaseTTSTest):
     CLS = PicoTTS
     SLUG = 'pico'
-    INIT_ATTRS = ['enabled', 'pico2wave']
+    INIT_ATTRS = ['enabled', 'pico2wave', 'timeout']
 
 
 class MaryTTSTest(BaseTTSTest):
     CLS = MaryTTS
     SLUG = 'mary'
-    INIT_ATTRS = ['enabled', 'host', 'port', 'scheme']
-    CONF = {'enabled': True, 'host': 'mary.dfki.de'}
+    INIT_ATTRS = ['enabled', 'background_probe', 'host', 'port', 'scheme', 'timeout']
+    CONF = {'enabled': True, 'host': 'mary.dfki.de', 'background_probe': False}
     EVAL_PLAY = True
 
 
 class GoogleTTSTest(BaseTTSTest):
     CLS = GoogleTTS
     SLUG = 'google'
-    CONF = {'enabled': True}
+    INIT_ATTRS = ['enabled', 'background_probe', 'timeout']
+    CONF = {'enabled': True, 'background_probe': False}
     FILE_TYPE = 'MPEG ADTS, layer III'
 
 
@@ -356,5 +1956,5 @@ class SayTTSTest(BaseTTSTest):
     CLS = SayTTS
     SLUG = 'say'
     EVAL_PLAY = False
-    INIT_ATTRS = ['enabled', 'say']
+    INIT_ATTRS = ['enabled', 'say', 'timeout']
     CONF = {'enabled': True}
@@ -1,6 +1,22 @@
-import langid
+import logging
+import threading
 
-from .base import TTSError
+import numpy
+
+from .base import TTSError, TTSRequestError, TTSCancelled
+from .cache import AudioCache, DiskAudioCache
+from .health import EngineHealth, HEALTH_OPTIONS, OPEN
+from .metrics import Instrumentation
+from .profiling import Profiler, PROFILE_OPTIONS
+from .utils import process_options
+from .pool import SynthesisPool
+from .sinks import FanOutSink
+from . import ssml
+from .templates import Template
+from .scheduler import SpeechScheduler
+from .normalize import Normalizer
+from .voices import VoiceRegistry
+from .classifier import get_classifier, rank_many
 from .engines import _ENGINE_MAP, _ENGINE_ORDER
 
 
@@ -41,6 +57,58 @@ class Talkey(object):
         The weighting factor to prefer the ``preferred_languages`` list. Higher number skews towards preference.
     ``engine_preference``
         Specify preferred engines in order of preference.
+    ``postprocess``
+        Post-synthesis processing applied to rendered audio, e.g. ``{'trim_silence': True, 'normalize': True}``.
+        See ``talkey.audio.POSTPROCESS_OPTIONS``. Can be overridden per engine with a ``postprocess`` key.
+    ``cache_size``
+        Number of rendered (and post-processed) phrases to keep in memory. ``0`` disables caching.
+    ``cache_dir``
+        Directory to keep rendered phrases in instead, as memory-mapped WAV files that persist across runs.
+        Keeps ``cache_size`` phrases, or 1024 if not given.
+    ``coalesce``
+        Concurrent requests for the same phrase (and engine, voice and options) share a single render.
+        This renders to memory before playing, so is off by default.
+    ``stream``
+        say() plays audio as it is rendered, for engines that stream (e.g. espeak),
+        so long phrases start playing early. Not done with ``coalesce``.
+    ``health``
+        Circuit breaker settings, see ``talkey.health.HEALTH_OPTIONS``.
+        Engines that keep failing (or get too slow) are skipped in favour of the next engine
+        that supports the language, until they recover.
+        Bad requests (``TTSRequestError``) and cancellation (``TTSCancelled``) are raised as is,
+        and do not count as failures.
+    ``engine_selection``
+        How to pick among the (healthy) engines that support a language:
+
+        ``preference``
+            In order of ``engine_preference``.
+        ``latency``
+            By measured synthesis latency for the phrase length (unmeasured engines are tried first),
+            traded off against ``engine_preference`` order by ``quality_weight``.
+    ``latency_percentile``
+        The latency percentile used by ``latency`` selection, e.g. 50 or 95.
+    ``quality_weight``
+        Seconds of latency that one step down the ``engine_preference`` order is worth.
+        Higher values prefer quality, ``0`` picks the fastest engine.
+    ``instrumentation``
+        Not an argument, but the ``talkey.metrics.Instrumentation`` shared by the engines.
+        Add listeners to it, e.g. a ``talkey.metrics.MetricsCollector``, to record per-stage timings.
+    ``profile``
+        Enables sampled profiling of say()/synthesize() calls, e.g. ``{'directory': '/tmp/talkey', 'sample_rate': 0.05}``.
+        See ``talkey.profiling.PROFILE_OPTIONS``.
+    ``sink``
+        A ``talkey.sinks`` sink to deliver audio to, instead of playing it on the audio device.
+        A list of sinks renders once, and delivers to all of them concurrently,
+        e.g. ``[DeviceSink(), FileSink('archive')]``.
+    ``normalize``
+        Normalizes text before classification and synthesis, e.g. spelling out numbers and abbreviations,
+        so engines read them alike, and trivially different texts share cached audio.
+        ``True`` for the default ``talkey.normalize.Normalizer``, or a ``Normalizer`` with your own rules.
+        Of SSML only the text is normalized, in the language of each element.
+    ``workers``
+        Number of workers used by ``say_async()``/``synthesize_async()``. Defaults to the number of cores.
+    ``engine_limits``
+        Dict of engine SLUG to the maximum number of concurrent jobs for that engine, e.g. ``{'festival': 2}``
     ``**config``
         Engine-specfic configuration, e.g.:
 
@@ -59,6 +127,11 @@ class Talkey(object):
                         'variant': 'f4',
                 },
 
+                # Optionally override post-processing for this engine
+                'postprocess': {
+                    'normalize': True,
+                },
+
                 # Here you specify language-specific voice options
                 # e.g. for english we prefer the mbrola en1 voice
                 'languages': {
@@ -70,16 +143,44 @@ class Talkey(object):
             }
     '''
 
-    def __init__(self, preferred_languages=None, preferred_factor=80.0, engine_preference=None, **config):
+    def __init__(self, preferred_languages=None, preferred_factor=80.0, engine_preference=None,
+                 postprocess=None, cache_size=0, cache_dir=None, coalesce=False, stream=False, health=None, engine_selection='preference',
+                 latency_percentile=95, quality_weight=0.1, profile=None, sink=None, normalize=False, workers=None, engine_limits=None,
+                 **config):
+        self._logger = logging.getLogger(__name__)
+        self.instrumentation = Instrumentation()
+        if isinstance(sink, (list, tuple)):
+            sink = FanOutSink(sink)
+        self.sink = sink
+        if normalize is True:
+            normalize = Normalizer()
+        self.normalizer = normalize or None
+        self.profiler = None
+        if profile is not None:
+            self.profiler = Profiler(self.instrumentation, process_options(PROFILE_OPTIONS, profile, TTSError))
         self.preferred_languages = preferred_languages or []
         self.preferred_factor = preferred_factor
-        engine_preference = engine_preference or enumerate_engines()
+        if engine_selection not in ['preference', 'latency']:
+            raise TTSError('Bad engine_selection: %s' % engine_selection, ['preference', 'latency'])
+        self.engine_selection = engine_selection
+        self.latency_percentile = latency_percentile
+        self.quality_weight = quality_weight
+        if cache_dir is not None:
+            self.cache = DiskAudioCache(cache_dir, cache_size or 1024)
+        else:
+            self.cache = AudioCache(cache_size) if cache_size else None
+        self.workers = workers
+        self.engine_limits = engine_limits
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        engine_preference = list(engine_preference or enumerate_engines())
         for ename in enumerate_engines():
             if ename not in engine_preference:
                 engine_preference.append(ename)
 
         self.engines = []
         self.languages = set()
+        self.voices = VoiceRegistry()
 
         for ename in engine_preference:
             try:
@@ -94,34 +195,187 @@ class Talkey(object):
             except TTSError:
                 pass
 
+        self.health_options = process_options(HEALTH_OPTIONS, health or {}, TTSError)
+        self.health = {}
+        self._availability_listeners = []
         for eng in self.engines:
-            self.languages.update(eng.languages.keys())
+            eng.health = self.health[eng.SLUG] = EngineHealth(self.health_options)
+            eng.instrumentation = self.instrumentation
+            eng.sink = sink
+            eng.cache = self.cache
+            eng.coalesce = coalesce
+            eng.stream = stream
+            eng.configure_postprocess(**config.get(eng.SLUG, {}).get('postprocess', postprocess or {}))
 
-        langid.set_languages(self.languages)
+        self._update_languages()
+        for eng in self.engines:
+            eng.add_availability_listener(self._availability_changed)
 
-        if not self.languages:
+        if not self.languages and not any(eng.pending for eng in self.engines):
             raise TTSError('No supported languages')
 
+        self._probe_stop = threading.Event()
+        self._prober = None
+        if self.health_options['probe_interval']:
+            self._prober = threading.Thread(target=self._probe_loop, name='talkey-health-prober')
+            self._prober.daemon = True
+            self._prober.start()
+
+    def _update_languages(self):
+        voices = VoiceRegistry.merge(eng.voices for eng in self.engines if eng.available)
+        languages = voices.languages()
+        self.voices = voices
+        self.languages = languages
+        self.classifier = get_classifier(languages or None)
+
+    def _availability_changed(self, eng, available):
+        self._update_languages()
+        for listener in list(self._availability_listeners):
+            listener(eng, available)
+
+    def add_availability_listener(self, listener):
+        '''
+        Registers ``listener(engine, available)`` to be called when the availability of an engine changes,
+        e.g. once a networked engine that was pending a background availability check becomes available.
+        '''
+        self._availability_listeners.append(listener)
+
+    def _probe_loop(self):
+        while not self._probe_stop.wait(self.health_options['probe_interval']):
+            self.probe()
+
+    def probe(self):
+        '''
+        Re-checks availability of tripped engines, and lets the available ones be tried again.
+        '''
+        for eng in self.engines:
+            health = self.health[eng.SLUG]
+            if health.state == OPEN:
+                try:
+                    available = eng.is_available()
+                except Exception:  # pylint: disable=W0703
+                    available = False
+                if available:
+                    self._logger.info("Engine '%s' recovered", eng.SLUG)
+                    health.reset()
+
     def classify(self, txt):
         '''
         Classifies text by language. Uses preferred_languages weighting.
         '''
-        ranks = []
-        for lang, score in langid.rank(txt):
-            if lang in self.preferred_languages:
-                score += self.preferred_factor
-            ranks.append((lang, score))
-        ranks.sort(key=lambda x: x[1], reverse=True)
-        return ranks[0][0]
+        with self.instrumentation.timer('classify'):
+            ranks = []
+            for lang, score in self.classifier.rank(txt):
+                if lang in self.preferred_languages:
+                    score += self.preferred_factor
+                ranks.append((lang, score))
+            ranks.sort(key=lambda x: x[1], reverse=True)
+            return ranks[0][0]
 
-    def get_engine_for_lang(self, lang):
+    def classify_many(self, texts):
         '''
-        Determines the preferred engine/voice for a language.
+        Classifies many texts by language, as ``classify()`` does each, in batched matrix operations.
+        Returns a list of languages, in order.
+        '''
+        texts = list(texts)
+        if not texts:
+            return []
+        with self.instrumentation.timer('classify'):
+            scores = rank_many(self.classifier, texts)
+            classes = self.classifier.nb_classes
+            scores += numpy.array([
+                self.preferred_factor if lang in self.preferred_languages else 0.0 for lang in classes
+            ], dtype=scores.dtype)
+            return [classes[idx] for idx in scores.argmax(axis=1)]
+
+    def _latency_score(self, rank, eng, length):
+        latency = self.health[eng.SLUG].percentile(self.latency_percentile, length)
+        return (latency or 0.0) + self.quality_weight * rank
+
+    def find_voices(self, language=None, locale=None, gender=None, engine=None, order=None):
+        '''
+        Returns a list of the ``talkey.voices.Voice`` of available engines that match all given criteria,
+        e.g. ``find_voices(language='de', gender='female', order='latency')``.
+
+        ``order`` is ``preference`` (by ``engine_preference``) or ``latency`` (by measured synthesis latency),
+        and defaults to the ``engine_selection``.
+        Use a voice with its engine as ``engine.say(txt, language=voice.language, voice=voice.name)``.
+        '''
+        order = order or self.engine_selection
+        if order not in ['preference', 'latency']:
+            raise TTSError('Bad order: %s' % order, ['preference', 'latency'])
+        ranks = dict((eng.SLUG, rank) for rank, eng in enumerate(self.engines))
+        if order == 'latency':
+            scores = dict(
+                (eng.SLUG, self._latency_score(rank, eng, None)) for rank, eng in enumerate(self.engines)
+            )
+        else:
+            scores = ranks
+        voices = self.voices.find(language=language, locale=locale, gender=gender, engine=engine)
+        return sorted(voices, key=lambda voice: (scores[voice.engine], ranks[voice.engine], not voice.default))
+
+    def get_engine(self, slug):
+        '''
+        Returns the engine with the SLUG, or raises TTSError.
         '''
         for eng in self.engines:
-            if lang in eng.languages.keys():
+            if eng.SLUG == slug:
                 return eng
-        raise TTSError('Could not match language')
+        raise TTSError('Unknown engine %s' % slug)
+
+    def get_engines_for_lang(self, lang, length=None):
+        '''
+        Returns all engines for a language in order of selection, the healthy ones first.
+
+        ``length`` is the length of the text to say, used by ``latency`` engine selection.
+        '''
+        engines = [eng for eng in self.engines if eng.available and lang in eng.languages.keys()]
+        if self.engine_selection == 'latency':
+            scores = dict((eng.SLUG, self._latency_score(rank, eng, length)) for rank, eng in enumerate(engines))
+            engines.sort(key=lambda eng: scores[eng.SLUG])
+        return [eng for eng in engines if self.health[eng.SLUG].allow()] + \
+            [eng for eng in engines if not self.health[eng.SLUG].allow()]
+
+    def get_engine_for_lang(self, lang, length=None):
+        '''
+        Determines the preferred engine/voice for a language.
+        '''
+        engines = self.get_engines_for_lang(lang, length)
+        if not engines:
+            raise TTSError('Could not match language')
+        return engines[0]
+
+    def _dispatch(self, method, txt, lang):
+        'Calls the engine method, failing over to the next engine for the language on error'
+        engines = self.get_engines_for_lang(lang, len(txt))
+        if not engines:
+            raise TTSError('Could not match language')
+        error = None
+        for eng in engines:
+            health = self.health[eng.SLUG]
+            try:
+                ret = getattr(eng, method)(txt, language=lang)
+            except (TTSRequestError, TTSCancelled):
+                # Not a failure of the engine, another would do no better
+                raise
+            except Exception as e:  # pylint: disable=W0703
+                self._logger.warning("Engine '%s' failed: %s", eng.SLUG, e)
+                health.record_failure()
+                error = e
+                continue
+            health.record_success()
+            return ret
+        if isinstance(error, TTSError):
+            raise error
+        raise TTSError('All engines failed: %s' % error)
+
+    def synthesize(self, txt, lang=None):
+        '''
+        Renders the text to audio, returns a ``talkey.audio.Audio`` instance.
+
+        if ``lang`` is ``None``, then uses ``classify()`` to detect language.
+        '''
+        return self._run('synthesize', txt, lang)
 
     def say(self, txt, lang=None):
         '''
@@ -129,5 +383,173 @@ class Talkey(object):
 
         if ``lang`` is ``None``, then uses ``classify()`` to detect language.
         '''
-        lang = lang or self.classify(txt)
-        self.get_engine_for_lang(lang).say(txt, language=lang)
+        self._run('say', txt, lang)
+
+    def synthesize_stream(self, txt, lang=None):
+        '''
+        Renders the text progressively, returns an iterator of ``talkey.audio.Audio`` chunks,
+        yielded as the engine produces them. See ``AbstractTTSEngine.synthesize_stream()``.
+
+        Fails over to the next engine for the language only until the first chunk is produced.
+
+        if ``lang`` is ``None``, then uses ``classify()`` to detect language.
+        '''
+        txt, lang = self._prepare(txt, lang)
+        engines = self.get_engines_for_lang(lang, len(txt))
+        if not engines:
+            raise TTSError('Could not match language')
+        return self._stream(engines, txt, lang)
+
+    def _stream(self, engines, txt, lang):
+        error = None
+        for eng in engines:
+            health = self.health[eng.SLUG]
+            chunks = None
+            try:
+                try:
+                    chunks = eng.synthesize_stream(txt, language=lang)
+                    first = next(chunks, None)
+                except (TTSRequestError, TTSCancelled):
+                    raise
+                except Exception as e:  # pylint: disable=W0703
+                    self._logger.warning("Engine '%s' failed: %s", eng.SLUG, e)
+                    health.record_failure()
+                    error = e
+                    continue
+                try:
+                    if first is not None:
+                        yield first
+                    for chunk in chunks:
+                        yield chunk
+                except (TTSRequestError, TTSCancelled):
+                    raise
+                except Exception:
+                    # Too late to fail over
+                    health.record_failure()
+                    raise
+            finally:
+                if chunks is not None:
+                    chunks.close()
+            health.record_success()
+            return
+        if isinstance(error, TTSError):
+            raise error
+        raise TTSError('All engines failed: %s' % error)
+
+    def _ssml_lang(self, markup, lang):
+        'The language of SSML, that of its first segment if it has one, otherwise classified'
+        if lang:
+            return lang
+        segments = ssml.parse(markup)
+        for seg in segments:
+            if seg.language:
+                return seg.language
+        return self.classify(ssml.plain_text(segments))
+
+    def synthesize_ssml(self, markup, lang=None):
+        '''
+        Renders SSML markup to audio, returns a ``talkey.audio.Audio`` instance.
+        See ``talkey.ssml`` for the supported subset.
+
+        All segments are rendered by a single engine, that supports the language of the markup,
+        which is ``lang``, else that of the first segment, else detected by ``classify()``.
+        '''
+        return self._run('synthesize_ssml', markup, lang, self._prepare_ssml)
+
+    def say_ssml(self, markup, lang=None):
+        '''
+        Says SSML markup. See ``synthesize_ssml()``.
+        '''
+        self._run('say_ssml', markup, lang, self._prepare_ssml)
+
+    def template(self, template, lang=None, slots=None, cache_size=64):
+        '''
+        Returns a ``talkey.templates.Template`` for announcements like
+        ``'Train to {city} departs from platform {platform}'``, that renders static text and slot values once,
+        and assembles announcements from them.
+
+        ``slots`` is a dict of slot name to values to render in advance by ``Template.precompute()``,
+        and ``cache_size`` the number of other slot values kept.
+        '''
+        return Template(self, template, lang, slots, cache_size)
+
+    def scheduler(self, preempt=True, requeue_preempted=True):
+        '''
+        Returns a ``talkey.scheduler.SpeechScheduler``, that plays announcements by priority,
+        drops them past their deadline, and stops the playing announcement for one of higher priority.
+        '''
+        return SpeechScheduler(self, preempt, requeue_preempted)
+
+    def _prepare(self, txt, lang):
+        'Returns the normalized text and its language'
+        if self.normalizer is None:
+            return txt, lang or self.classify(txt)
+        lang = lang or self.classify(self.normalizer.normalize(txt))
+        return self.normalizer.normalize(txt, lang), lang
+
+    def _prepare_ssml(self, markup, lang):
+        'Returns the SSML with the text of its elements normalized, and its language'
+        lang = self._ssml_lang(markup, lang)
+        if self.normalizer is not None:
+            markup = ssml.normalize(markup, self.normalizer, lang)
+        return markup, lang
+
+    def _classify_dispatch(self, method, prepare, txt, lang):
+        return self._dispatch(method, *prepare(txt, lang))
+
+    def _run(self, method, txt, lang, prepare=None):
+        prepare = prepare or self._prepare
+        if self.profiler is not None:
+            return self.profiler.run(method, self._classify_dispatch, method, prepare, txt, lang)
+        return self._classify_dispatch(method, prepare, txt, lang)
+
+    def get_pool(self):
+        '''
+        Returns the ``SynthesisPool`` used for asynchronous requests, creating it on first use.
+        '''
+        with self._pool_lock:
+            if self.pool is None:
+                self.pool = SynthesisPool(self.workers, self.engine_limits)
+            return self.pool
+
+    def close(self):
+        '''
+        Shuts down the worker pool, if any, after queued requests complete, and the health prober.
+        '''
+        self._probe_stop.set()
+        with self._pool_lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _submit(self, method, txt, lang, caller, priority):
+        txt, lang = self._prepare(txt, lang)
+        eng = self.get_engine_for_lang(lang, len(txt))
+        return self.get_pool().submit(
+            self._dispatch, method, txt, lang, engine=eng.SLUG, caller=caller, priority=priority
+        )
+
+    def synthesize_async(self, txt, lang=None, caller=None, priority=0):
+        '''
+        Queues rendering of the text to audio, returns a ``talkey.pool.Job``
+        whose ``result()`` is a ``talkey.audio.Audio`` instance.
+
+        ``caller`` identifies the requester for fair scheduling, defaults to the calling thread.
+        Requests of higher ``priority`` are run first.
+        '''
+        return self._submit('synthesize', txt, lang, caller, priority)
+
+    def say_async(self, txt, lang=None, caller=None, priority=0):
+        '''
+        Queues saying the text, returns a ``talkey.pool.Job``.
+
+        ``caller`` identifies the requester for fair scheduling, defaults to the calling thread.
+        Requests of higher ``priority`` are run first.
+        '''
+        return self._submit('say', txt, lang, caller, priority)
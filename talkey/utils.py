@@ -1,9 +1,12 @@
 # -*- coding: utf-8-*-
 import sys
+import time
 import logging
 import socket
+import threading
 import functools
 import pkgutil
+import weakref
 if sys.version_info < (3, 3):
     from distutils.spawn import find_executable as _find_executable  # pylint: disable=E0611
 else:
@@ -63,6 +66,109 @@ def check_network_connection(server, port):
     return True
 
 
+try:
+    from weakref import WeakMethod
+except ImportError:  # pragma: no cover
+    class WeakMethod(object):
+        'Weak reference to a bound method, that does not keep its object alive'
+
+        def __init__(self, meth):
+            self._obj = weakref.ref(meth.__self__)
+            self._func = meth.__func__
+
+        def __call__(self):
+            obj = self._obj()
+            return None if obj is None else self._func.__get__(obj, type(obj))
+
+        def __eq__(self, other):
+            return isinstance(other, WeakMethod) and (self._obj, self._func) == (other._obj, other._func)
+
+        def __ne__(self, other):
+            return not self == other
+
+        def __hash__(self):
+            return hash((self._obj, self._func))
+
+
+class AvailabilityProber(object):
+    '''
+    Checks network servers in the background, caching the results.
+
+    ``ttl``
+        Seconds a result is fresh for. Stale results are still returned while being refreshed.
+    ``checker``
+        Function ``(server, port)`` that returns True or False, defaults to check_network_connection()
+    '''
+
+    def __init__(self, ttl=60.0, checker=None):
+        self.ttl = ttl
+        self.checker = checker or check_network_connection
+        self._results = {}
+        self._checking = set()
+        self._listeners = {}
+        self._lock = threading.Lock()
+
+    def check(self, server, port, listener=None):
+        '''
+        Returns the last known availability of the server without blocking,
+        or None if it is pending its first check.
+
+        ``listener`` is called as ``listener(available)`` whenever the availability changes.
+        Bound methods are held weakly, so the prober does not keep their objects alive.
+        '''
+        key = (server, port)
+        with self._lock:
+            if listener is not None:
+                # Listener to function returning it, or None once gone
+                listeners = self._listeners.setdefault(key, {})
+                if getattr(listener, '__self__', None) is not None and hasattr(listener, '__func__'):
+                    ref = WeakMethod(listener)
+                    listeners[ref] = ref
+                else:
+                    listeners[listener] = lambda: listener
+            available, checked = self._results.get(key, (None, None))
+            if (checked is None or time.time() - checked > self.ttl) and key not in self._checking:
+                self._checking.add(key)
+                thread = threading.Thread(target=self._probe, args=(key,), name='talkey-prober')
+                thread.daemon = True
+                thread.start()
+        return available
+
+    def _probe(self, key):
+        try:
+            available = bool(self.checker(*key))
+        except Exception:  # pylint: disable=W0703
+            available = False
+        with self._lock:
+            previous = self._results.get(key, (None, None))[0]
+            self._results[key] = (available, time.time())
+            self._checking.discard(key)
+            listeners = self._listeners.get(key, {})
+            for ref in [ref for ref, get in listeners.items() if get() is None]:
+                del listeners[ref]
+            listeners = [get() for get in listeners.values()] if available != previous else []
+        for listener in listeners:
+            if listener is not None:
+                listener(available)
+
+    def wait(self, server, port, timeout=None):
+        '''
+        Blocks until the server has been checked, returns its availability.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        available = self.check(server, port)
+        while (server, port) in self._checking or available is None:
+            if deadline is not None and time.time() > deadline:
+                break
+            time.sleep(0.01)
+            available = self._results.get((server, port), (None, None))[0]
+        return available
+
+
+PROBER = AvailabilityProber()
+'The shared background availability prober'
+
+
 def check_python_import(package_or_module):
     '''
     Checks if a python package or module is importable.
@@ -0,0 +1,170 @@
+'''
+Immutable registry of engine voices, indexed for lookups.
+'''
+import sys
+
+if sys.version_info[0] == 2:  # pragma: no cover
+    _intern = intern  # noqa: F821 pylint: disable=E0602
+else:
+    _intern = sys.intern
+
+GENDERS = {
+    'm': 'male', 'male': 'male',
+    'f': 'female', 'female': 'female',
+}
+
+
+def normalize_gender(gender):
+    '''
+    Returns ``male``, ``female`` or None for the gender as reported by an engine, e.g. ``M`` or ``female``.
+    '''
+    return GENDERS.get(str(gender).lower()) if gender else None
+
+
+def normalize_locale(locale):
+    '''
+    Returns a locale in ``en_US`` form, e.g. for ``en-us``, or None.
+    '''
+    if not locale:
+        return None
+    parts = locale.replace('-', '_').split('_')
+    return _intern('_'.join([parts[0].lower()] + [part.upper() for part in parts[1:2]]))
+
+
+class Voice(object):
+    '''
+    An immutable record of a voice of an engine.
+
+    :engine: The engine SLUG
+    :name: The voice name, as passed to the engine
+    :language: The language code
+    :locale: The locale, e.g. ``en_US``, if known
+    :gender: ``male``, ``female``, or None if not known
+    :default: Boolean on if it is the default voice of the language
+    :info: The engine-specific data about the voice
+    '''
+    __slots__ = ('engine', 'name', 'language', 'locale', 'gender', 'default', 'info')
+
+    def __init__(self, engine, name, language, locale=None, gender=None, default=False, info=None):
+        # Codes are interned, so the many records share their strings
+        for attr, val in [
+            ('engine', _intern(str(engine))),
+            ('name', name),
+            ('language', _intern(str(language))),
+            ('locale', normalize_locale(locale)),
+            ('gender', normalize_gender(gender)),
+            ('default', default),
+            ('info', info if info is not None else {}),
+        ]:
+            object.__setattr__(self, attr, val)
+
+    def __setattr__(self, attr, val):
+        raise AttributeError('Voice is immutable')
+
+    def __delattr__(self, attr):
+        raise AttributeError('Voice is immutable')
+
+    @property
+    def key(self):
+        return (self.engine, self.language, self.name)
+
+    def __eq__(self, other):
+        return isinstance(other, Voice) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return '<Voice %s:%s:%s %s %s>' % (self.engine, self.language, self.name, self.locale, self.gender)
+
+
+_EMPTY = ()
+
+
+class VoiceRegistry(object):
+    '''
+    An immutable set of voices, indexed by language, locale, gender and engine.
+
+    :voices: Iterable of ``Voice``
+    '''
+    __slots__ = ('voices', '_by_key', '_indexes')
+
+    def __init__(self, voices=()):
+        self.voices = tuple(voices)
+        self._by_key = dict((voice.key, voice) for voice in self.voices)
+        self._indexes = {}
+        for attr in ['language', 'locale', 'gender', 'engine']:
+            index = {}
+            for voice in self.voices:
+                index.setdefault(getattr(voice, attr), []).append(voice)
+            self._indexes[attr] = dict((key, tuple(vals)) for key, vals in index.items())
+
+    @classmethod
+    def from_languages(cls, engine, languages):
+        '''
+        Builds the registry of an engine, from its dict of languages and voices as returned by ``_get_languages()``.
+        '''
+        return cls(
+            Voice(
+                engine, name, lang, info.get('locale'), info.get('gender'), name == langinfo['default'], info
+            )
+            for lang, langinfo in languages.items()
+            for name, info in langinfo['voices'].items()
+        )
+
+    @classmethod
+    def merge(cls, registries):
+        '''
+        Returns a registry of the voices of all the registries.
+        '''
+        return cls(voice for registry in registries for voice in registry.voices)
+
+    def get(self, engine, language, name):
+        '''
+        Returns the voice, or None.
+        '''
+        return self._by_key.get((engine, language, name))
+
+    def languages(self):
+        '''
+        Returns the set of languages.
+        '''
+        return set(self._indexes['language'].keys())
+
+    def find(self, language=None, locale=None, gender=None, engine=None, default=None):
+        '''
+        Returns a tuple of the voices matching all given criteria, in registry order.
+        '''
+        criteria = [
+            (attr, val)
+            for attr, val in [
+                ('language', language), ('locale', normalize_locale(locale)),
+                ('gender', normalize_gender(gender)), ('engine', engine),
+            ]
+            if val is not None
+        ]
+        if gender is not None and normalize_gender(gender) is None:
+            # An unknown gender matches nothing
+            return _EMPTY
+        if criteria:
+            # Filter the smallest of the matching index entries
+            candidates = [self._indexes[attr].get(val, _EMPTY) for attr, val in criteria]
+            voices = min(candidates, key=len)
+            voices = [voice for voice in voices if all(getattr(voice, attr) == val for attr, val in criteria)]
+        else:
+            voices = self.voices
+        if default is not None:
+            voices = [voice for voice in voices if voice.default == default]
+        return tuple(voices)
+
+    def __len__(self):
+        return len(self.voices)
+
+    def __iter__(self):
+        return iter(self.voices)
+
+    def __contains__(self, voice):
+        return voice.key in self._by_key